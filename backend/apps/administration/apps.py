@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AdministrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.apps.administration'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .search import search_index
+        search_index.connect()
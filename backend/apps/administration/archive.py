@@ -0,0 +1,183 @@
+import os
+import gzip
+import json
+import logging
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog, AuditLogArchive
+from backend.apps.users.models import User
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'action', 'table_name', 'record_id', 'old_values',
+    'new_values', 'ip_address', 'user_agent', 'created_at',
+)
+
+
+def archive_dir():
+    return Path(getattr(settings, 'AUDIT_LOG_ARCHIVE_DIR', settings.BASE_DIR / 'var' / 'audit_archive'))
+
+
+def _month_bounds(moment):
+    """Start of ``moment``'s local month and of the month after it"""
+    start = timezone.localtime(moment).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    following = (start.replace(tzinfo=None) + timedelta(days=32)).replace(day=1)
+    return start, timezone.make_aware(following)
+
+
+class AuditArchiver:
+    """Moves audit log rows older than the retention period into monthly archives.
+
+    Each chunk of up to ``chunk_size`` rows from a single month is written
+    to its own gzip NDJSON file under ``YYYY/MM/``; the file is renamed into
+    place before its index row is created and the rows are deleted in one
+    transaction. An interrupted run leaves at most an unindexed file, which
+    the next run overwrites, so archiving can simply be restarted.
+    """
+
+    def __init__(self, retention_days=None, chunk_size=5000):
+        if retention_days is None:
+            retention_days = getattr(settings, 'AUDIT_LOG_RETENTION_DAYS', 180)
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+
+    def cutoff(self):
+        return timezone.now() - timedelta(days=self.retention_days)
+
+    def run(self, max_chunks=None):
+        """Archive until nothing is older than the cutoff; returns rows archived"""
+        cutoff = self.cutoff()
+        archived = chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            count = self.archive_chunk(cutoff)
+            if not count:
+                break
+            archived += count
+            chunks += 1
+        return archived
+
+    def archive_chunk(self, cutoff):
+        oldest = AuditLog.objects.filter(created_at__lt=cutoff).order_by(
+            'created_at', 'id'
+        ).values_list('created_at', flat=True).first()
+        if oldest is None:
+            return 0
+
+        month_start, next_month = _month_bounds(oldest)
+        rows = list(
+            AuditLog.objects.filter(created_at__gte=month_start, created_at__lt=min(cutoff, next_month))
+            .order_by('created_at', 'id').values(*ARCHIVE_FIELDS)[:self.chunk_size]
+        )
+        first, last = rows[0], rows[-1]
+        file_name = (
+            f"{month_start:%Y/%m}/audit-{month_start:%Y-%m}-{first['id']}-{last['id']}.ndjson.gz"
+        )
+        size = self._write_file(file_name, rows)
+
+        with transaction.atomic():
+            AuditLogArchive.objects.update_or_create(file_name=file_name, defaults={
+                'month': month_start.date(),
+                'first_created_at': first['created_at'],
+                'last_created_at': last['created_at'],
+                'first_log_id': first['id'],
+                'last_log_id': last['id'],
+                'row_count': len(rows),
+                'size_bytes': size,
+            })
+            AuditLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        logger.info('Archived %d audit log rows to %s', len(rows), file_name)
+        return len(rows)
+
+    def _write_file(self, file_name, rows):
+        path = archive_dir() / file_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + '.partial')
+        with gzip.open(partial, 'wt', encoding='utf-8') as archive_file:
+            for row in rows:
+                archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        with open(partial, 'rb') as archive_file:
+            os.fsync(archive_file.fileno())
+        os.replace(partial, path)
+        return path.stat().st_size
+
+
+def _archives(start=None, end=None):
+    archives = AuditLogArchive.objects.all()
+    if start is not None:
+        archives = archives.filter(last_created_at__gte=start)
+    if end is not None:
+        archives = archives.filter(first_created_at__lt=end)
+    return archives
+
+
+def _read_archive(archive, start=None, end=None):
+    """Rows of one archive file with ``start <= created_at < end``, oldest first"""
+    path = archive_dir() / archive.file_name
+    if not path.exists():
+        logger.error('Audit archive %s is indexed but missing', archive.file_name)
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+        for line in archive_file:
+            row = json.loads(line)
+            row['created_at'] = parse_datetime(row['created_at'])
+            if start is not None and row['created_at'] < start:
+                continue
+            if end is not None and row['created_at'] >= end:
+                continue
+            yield row
+
+
+def iter_archived_rows(start=None, end=None):
+    """Yield archived row dicts with ``start <= created_at < end``, file by file"""
+    for archive in _archives(start, end).order_by('first_created_at'):
+        yield from _read_archive(archive, start, end)
+
+
+def load_archived_logs(start=None, end=None, user_id=None, table_name=None, action=None, before=None, limit=None):
+    """Unsaved AuditLog instances (users attached) for archived rows matching the filters.
+
+    Logs come newest first. ``before`` is a ``(created_at, id)`` position
+    that every log must precede, and at most ``limit`` logs are returned.
+    Each archive holds a contiguous run of positions, so files are read
+    newest first and reading stops once ``limit`` logs are found; only the
+    files a page actually reaches are decompressed.
+    """
+    archives = _archives(start, end)
+    if before is not None:
+        archives = archives.filter(first_created_at__lte=before[0])
+
+    logs = []
+    for archive in archives.order_by('-last_created_at', '-last_log_id'):
+        # Files run oldest first, so only the newest matches still needed are kept
+        matches = deque(maxlen=None if limit is None else limit - len(logs))
+        for row in _read_archive(archive, start, end):
+            if before is not None and (row['created_at'], row['id']) >= before:
+                continue
+            if user_id is not None and str(row['user_id']) != str(user_id):
+                continue
+            if table_name and row['table_name'] != table_name:
+                continue
+            if action and row['action'] != action:
+                continue
+            matches.append(row)
+        logs.extend(AuditLog(**row) for row in reversed(matches))
+        if limit is not None and len(logs) >= limit:
+            break
+
+    users = User.objects.in_bulk({log.user_id for log in logs if log.user_id})
+    for log in logs:
+        if log.user_id:
+            # Rows can outlive their user; those show as System, as SET_NULL would
+            log.user = users.get(log.user_id)
+    return logs
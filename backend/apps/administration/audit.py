@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+from .rollups import apply_rollups
+
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AuditSink:
+    """Buffers audit entries in-process and writes them with bulk inserts.
+
+    In ``async`` mode entries are queued and flushed by a background thread
+    once ``AUDIT_LOG_BATCH_SIZE`` entries are waiting or
+    ``AUDIT_LOG_FLUSH_INTERVAL`` seconds have passed. In ``sync`` mode (used
+    by tests) each call writes straight away. Entries that cannot be written
+    are appended to ``AUDIT_LOG_SPOOL_PATH`` and replayed when the writer
+    next starts; entries the database rejects outright are logged and
+    dropped, so one bad entry never holds up the rest of its batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    # Public API
+
+    def record(self, action, table_name, record_id, user=None, old_values=None,
+               new_values=None, request=None):
+        self.record_many([self.entry(
+            action, table_name, record_id, user=user, old_values=old_values,
+            new_values=new_values, request=request
+        )])
+
+    def record_many(self, entries):
+        if not entries:
+            return
+        if _setting('AUDIT_LOG_MODE', 'async') == 'sync':
+            self.write(entries)
+            return
+
+        self._ensure_worker()
+        for entry in entries:
+            self._queue.put(entry)
+
+    @staticmethod
+    def entry(action, table_name, record_id, user=None, old_values=None,
+              new_values=None, request=None):
+        """Build a queued entry; values are captured at call time"""
+        meta = request.META if request is not None else {}
+        return {
+            'user_id': user.id if user else None,
+            'action': action,
+            'table_name': table_name,
+            'record_id': record_id,
+            'old_values': old_values,
+            'new_values': new_values,
+            'ip_address': meta.get('REMOTE_ADDR') or None,
+            'user_agent': meta.get('HTTP_USER_AGENT', ''),
+            'created_at': timezone.now(),
+        }
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        if timeout is None:
+            self._queue.join()
+        else:
+            self._wait(timeout)
+
+    def insert(self, entries):
+        """Insert entries and their rollups atomically; errors propagate to the caller"""
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(
+                [AuditLog(**entry) for entry in entries],
+                batch_size=_setting('AUDIT_LOG_BATCH_SIZE', 100)
+            )
+            apply_rollups(entries)
+
+    def write(self, entries):
+        """Insert entries now, spooling them to disk if the database is unavailable"""
+        try:
+            self.insert(entries)
+        except IntegrityError:
+            # Spooling would replay the bad entry forever; find it instead
+            self._write_each(entries)
+        except DatabaseError:
+            logger.exception('Audit log write failed; spooling %d entries', len(entries))
+            self.spool(entries)
+
+    def _write_each(self, entries):
+        unwritten = []
+        for entry in entries:
+            try:
+                self.insert([entry])
+            except IntegrityError:
+                logger.exception(
+                    'Dropping audit entry the database rejects: %s', json.dumps(entry, cls=DjangoJSONEncoder)
+                )
+            except DatabaseError:
+                unwritten.append(entry)
+        if unwritten:
+            logger.error('Audit log write failed; spooling %d entries', len(unwritten))
+            self.spool(unwritten)
+
+    # Spool file
+
+    def spool_path(self):
+        return Path(_setting('AUDIT_LOG_SPOOL_PATH', settings.BASE_DIR / 'var' / 'audit_spool.ndjson'))
+
+    def spool(self, entries):
+        path = self.spool_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(path, 'a', encoding='utf-8') as spool_file:
+            for entry in entries:
+                spool_file.write(json.dumps(entry, cls=DjangoJSONEncoder) + '\n')
+            spool_file.flush()
+            os.fsync(spool_file.fileno())
+
+    def replay_spool(self):
+        """Re-insert spooled entries; returns the number replayed"""
+        path = self.spool_path()
+        replaying = path.with_suffix(path.suffix + '.replaying')
+        with self._lock:
+            if not path.exists():
+                return 0
+            os.replace(path, replaying)
+
+        entries = []
+        with open(replaying, encoding='utf-8') as spool_file:
+            for line in spool_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    entry['created_at'] = parse_datetime(entry['created_at'])
+                    entries.append(entry)
+
+        self.write(entries)
+        os.remove(replaying)
+        return len(entries)
+
+    # Background writer
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            # Fresh queue per process so forked workers never share one
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.replay_spool()
+        except Exception:
+            logger.exception('Audit spool replay failed')
+
+        batch_size = _setting('AUDIT_LOG_BATCH_SIZE', 100)
+        interval = _setting('AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+        pending = []
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                pending.append(self._queue.get(timeout=timeout))
+                if deadline is None:
+                    deadline = time.monotonic() + interval
+            except queue.Empty:
+                pass
+
+            if pending and (len(pending) >= batch_size or time.monotonic() >= deadline):
+                try:
+                    self.write(pending)
+                except Exception:
+                    # Whatever went wrong, keep the entries and keep the writer alive
+                    logger.exception('Audit log write failed; spooling %d entries', len(pending))
+                    try:
+                        self.spool(pending)
+                    except Exception:
+                        logger.exception('Audit spool failed; dropping %d entries', len(pending))
+                finally:
+                    for _ in pending:
+                        self._queue.task_done()
+                    pending = []
+                    deadline = None
+                    connection.close()
+
+    def _wait(self, timeout):
+        end = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < end:
+            time.sleep(0.01)
+
+
+audit_sink = AuditSink()
+
+
+def record_audit(action, table_name, record_id, user=None, old_values=None,
+                 new_values=None, request=None):
+    """Queue an audit log entry"""
+    audit_sink.record(
+        action, table_name, record_id, user=user, old_values=old_values,
+        new_values=new_values, request=request
+    )
+
+
+@atexit.register
+def _flush_on_exit():
+    audit_sink.flush(timeout=5)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Unread counters and stream change markers need a cache every worker shares"""
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint=(
+            'Set REDIS_URL so all workers share it. Until then unread counts can be stale for '
+            'NOTIFICATION_UNREAD_CACHE_TTL seconds, and notification streams only see notifications '
+            'from other processes every NOTIFICATION_STREAM_DB_INTERVAL seconds.'
+        ),
+        id='administration.W001',
+    )]
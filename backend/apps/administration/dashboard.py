@@ -0,0 +1,106 @@
+import time
+import json
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Func, Max, Subquery
+from django.utils import timezone
+
+from .models import AuditLog, Notification
+from backend.apps.users.models import User
+from backend.apps.customers.models import Customer
+from backend.apps.products.models import Product
+from backend.apps.reports.models import DailySalesSummary
+
+
+SNAPSHOT_CACHE_KEY = 'dashboard:snapshot'
+REFRESH_LOCK_KEY = 'dashboard:refresh-lock'
+
+
+def _counters():
+    """Name -> (queryset, aggregate, field) for every dashboard counter"""
+    # Today's takings are one row, kept current as sales commit
+    today = DailySalesSummary.objects.filter(summary_date=timezone.localdate())
+    return {
+        'total_users': (User.objects.all(), Count, 'id'),
+        'active_users': (User.objects.filter(is_active=True), Count, 'id'),
+        'today_sales': (today, Max, 'total_transactions'),
+        'today_revenue': (today, Max, 'total_sales'),
+        'total_customers': (Customer.objects.all(), Count, 'id'),
+        'total_products': (Product.objects.filter(is_active=True), Count, 'id'),
+        'unread_notifications': (Notification.objects.filter(is_read=False), Count, 'id'),
+    }
+
+
+def compute_dashboard():
+    """Dashboard data in a single query.
+
+    The counters ride along as uncorrelated scalar subqueries on the recent
+    activity query, which the database evaluates once. Only an empty audit
+    log needs the fallback queries.
+    """
+    counters = _counters()
+    recent_logs = list(AuditLog.objects.select_related('user').annotate(**{
+        name: Subquery(queryset.order_by().values(value=Func(F(field), function=aggregate.function)))
+        for name, (queryset, aggregate, field) in counters.items()
+    }).order_by('-created_at', '-id')[:10])
+
+    if recent_logs:
+        values = {name: getattr(recent_logs[0], name) for name in counters}
+    else:
+        values = {
+            name: queryset.aggregate(value=aggregate(field))['value']
+            for name, (queryset, aggregate, field) in counters.items()
+        }
+
+    return {
+        'users': {
+            'total': values['total_users'],
+            'active': values['active_users']
+        },
+        'today': {
+            'sales': values['today_sales'] or 0,
+            'revenue': float(values['today_revenue'] or 0)
+        },
+        'system': {
+            'customers': values['total_customers'],
+            'products': values['total_products'],
+            'unread_notifications': values['unread_notifications']
+        },
+        'recent_activity': [{
+            'user': f"{log.user.first_name} {log.user.last_name}" if log.user else 'System',
+            'action': log.action,
+            'table': log.table_name,
+            'timestamp': log.created_at
+        } for log in recent_logs]
+    }
+
+
+def refresh_dashboard_snapshot():
+    data = json.loads(json.dumps(compute_dashboard(), cls=DjangoJSONEncoder))
+    snapshot = {
+        'data': data,
+        'etag': hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest(),
+        'computed_at': time.time(),
+    }
+    cache.set(SNAPSHOT_CACHE_KEY, snapshot, None)
+    return snapshot
+
+
+def get_dashboard_snapshot():
+    """Current snapshot: ``{'data', 'etag', 'computed_at'}``.
+
+    Once a snapshot is older than ``DASHBOARD_REFRESH_INTERVAL``, the one
+    process that wins the refresh lock recomputes it; everyone else keeps
+    serving the previous snapshot meanwhile.
+    """
+    interval = settings.DASHBOARD_REFRESH_INTERVAL
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is None:
+        return refresh_dashboard_snapshot()
+
+    if time.time() - snapshot['computed_at'] >= interval and cache.add(REFRESH_LOCK_KEY, 1, interval):
+        snapshot = refresh_dashboard_snapshot()
+    return snapshot
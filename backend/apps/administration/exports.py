@@ -0,0 +1,114 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .archive import iter_archived_rows
+from backend.apps.users.models import User
+
+
+EXPORT_COLUMNS = (
+    'id', 'created_at', 'user_id', 'user_name', 'user_email', 'action', 'table_name',
+    'record_id', 'old_values', 'new_values', 'ip_address', 'user_agent',
+)
+
+_QUERY_FIELDS = (
+    'id', 'created_at', 'user_id', 'user__first_name', 'user__last_name', 'user__email',
+    'action', 'table_name', 'record_id', 'old_values', 'new_values', 'ip_address', 'user_agent',
+)
+
+
+def iter_export_rows(queryset, chunk_size=2000):
+    """Export-ready dicts from an AuditLog queryset, user name joined in the same query"""
+    for (log_id, created_at, user_id, first_name, last_name, email, action, table_name,
+         record_id, old_values, new_values, ip_address, user_agent) in queryset.values_list(
+            *_QUERY_FIELDS).iterator(chunk_size=chunk_size):
+        yield {
+            'id': log_id,
+            'created_at': created_at,
+            'user_id': user_id,
+            'user_name': f'{first_name} {last_name}' if user_id else 'System',
+            'user_email': email,
+            'action': action,
+            'table_name': table_name,
+            'record_id': record_id,
+            'old_values': old_values,
+            'new_values': new_values,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+        }
+
+
+def iter_archived_export_rows(start=None, end=None, user_id=None, table_name=None, action=None):
+    """Archived rows in export form; user names are looked up once per user"""
+    users = {}
+    for row in iter_archived_rows(start, end):
+        if user_id is not None and str(row['user_id']) != str(user_id):
+            continue
+        if table_name and row['table_name'] != table_name:
+            continue
+        if action and row['action'] != action:
+            continue
+
+        if row['user_id'] and row['user_id'] not in users:
+            users[row['user_id']] = User.objects.filter(id=row['user_id']).values_list(
+                'first_name', 'last_name', 'email'
+            ).first()
+        user = users.get(row['user_id'])
+        row['user_name'] = f'{user[0]} {user[1]}' if user else 'System'
+        row['user_email'] = user[2] if user else None
+        if not user:
+            row['user_id'] = None
+        yield row
+
+
+class _Line:
+    """File-like target for csv.writer that hands back each formatted line"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([
+            json.dumps(row[column], cls=DjangoJSONEncoder)
+            if column in ('old_values', 'new_values') and row[column] is not None
+            else row[column]
+            for column in EXPORT_COLUMNS
+        ])
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps({column: row[column] for column in EXPORT_COLUMNS}, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(rows, file_format='csv', compress=False, block_size=64 * 1024):
+    """Yield the export as byte blocks of roughly ``block_size``, gzip-compressed if asked.
+
+    Only one block is held in memory at a time, whatever the number of rows.
+    """
+    lines = _csv_lines(rows) if file_format == 'csv' else _ndjson_lines(rows)
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= block_size:
+            block = b''.join(buffer)
+            buffer, size = [], 0
+            block = compressor.compress(block) if compressor else block
+            if block:
+                yield block
+
+    block = b''.join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from backend.apps.administration.archive import AuditArchiver
+
+
+class Command(BaseCommand):
+    help = 'Move audit log rows older than the retention period into gzip NDJSON archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention in days (default: AUDIT_LOG_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per archive file')
+        parser.add_argument('--max-chunks', type=int, help='Stop after this many chunks; rerun to resume')
+
+    def handle(self, *args, **options):
+        archiver = AuditArchiver(retention_days=options['days'], chunk_size=options['chunk_size'])
+        archived = archiver.run(max_chunks=options['max_chunks'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} audit log rows'))
@@ -0,0 +1,107 @@
+import time
+import random
+import statistics
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.apps.administration.models import AuditLog
+from backend.apps.administration.pagination import KeysetPagination
+from backend.apps.administration.views import AuditLogViewSet
+from backend.apps.users.models import User, Role
+
+
+BENCH_TABLE = 'bench_audit'
+BENCH_EMAIL = 'audit-bench@bench.pharmerp.local'
+
+
+class Command(BaseCommand):
+    help = 'Seed audit_logs and compare keyset page latency with OFFSET paging at increasing depth'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help='Benchmark rows to have in audit_logs')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--samples', type=int, default=20, help='Requests timed per depth')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows for the next run')
+
+    def handle(self, *args, **options):
+        admin = self._seed(options['rows'])
+        total = AuditLog.objects.filter(table_name=BENCH_TABLE).count()
+        page_size = options['page_size']
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        view = AuditLogViewSet.as_view({'get': 'list'})
+        paginator = KeysetPagination(page_size)
+
+        self.stdout.write(f'Rows: {total}, page size: {page_size}')
+        self.stdout.write(f"{'depth':>12} {'keyset p50':>12} {'offset p50':>12}")
+        depth = 0
+        while depth < total:
+            # Position of the row just above the page at this depth (untimed)
+            anchor = AuditLog.objects.filter(table_name=BENCH_TABLE).order_by(
+                '-created_at', '-id'
+            ).only('id', 'created_at')[depth - 1] if depth else None
+            params = {'table': BENCH_TABLE, 'page_size': page_size}
+            if anchor is not None:
+                params['cursor'] = paginator.encode_cursor(anchor)
+
+            keyset = []
+            for _ in range(options['samples']):
+                request = factory.get('/api/administration/audit-logs/', params)
+                force_authenticate(request, user=admin)
+                started = time.perf_counter()
+                response = view(request)
+                keyset.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.data
+
+            offset = []
+            for _ in range(options['samples']):
+                started = time.perf_counter()
+                list(AuditLog.objects.filter(table_name=BENCH_TABLE).select_related('user').order_by(
+                    '-created_at', '-id'
+                )[depth:depth + page_size])
+                offset.append(time.perf_counter() - started)
+
+            self.stdout.write(
+                f'{depth:>12} {statistics.median(keyset) * 1000:>10.2f}ms '
+                f'{statistics.median(offset) * 1000:>10.2f}ms'
+            )
+            depth = depth * 10 if depth else 1000
+
+        if not options['keep']:
+            self._cleanup()
+
+    def _seed(self, rows, batch_size=20_000):
+        role, _ = Role.objects.get_or_create(name='Admin')
+        admin, _ = User.objects.get_or_create(email=BENCH_EMAIL, defaults={
+            'first_name': 'Audit', 'last_name': 'Bench', 'role': role, 'password_hash': '!'
+        })
+        existing = AuditLog.objects.filter(table_name=BENCH_TABLE).count()
+        missing = rows - existing
+        if missing <= 0:
+            return admin
+
+        self.stdout.write(f'Seeding {missing} audit rows...')
+        # Raw executemany: the ORM would spend longer building objects than inserting
+        sql = (
+            'INSERT INTO audit_logs (user_id, action, table_name, record_id, old_values, '
+            'new_values, ip_address, user_agent, created_at) VALUES (%s, %s, %s, %s, NULL, NULL, NULL, %s, %s)'
+        )
+        start = timezone.now() - timedelta(days=365)
+        step = timedelta(days=365) / max(rows, 1)
+        actions = ['login', 'logout', 'create', 'update', 'delete']
+        adapt = connection.ops.adapt_datetimefield_value
+        for offset in range(existing, rows, batch_size):
+            batch = [
+                (admin.id, random.choice(actions), BENCH_TABLE, index, '', adapt(start + step * index))
+                for index in range(offset, min(offset + batch_size, rows))
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        return admin
+
+    def _cleanup(self):
+        AuditLog.objects.filter(table_name=BENCH_TABLE).delete()
+        User.objects.filter(email=BENCH_EMAIL).delete()
@@ -0,0 +1,114 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from backend.apps.administration.models import AuditLog, EmailMessage
+from backend.apps.administration.readers import AuditLogReader, EmailMessageReader
+from backend.apps.administration.serializers import AuditLogSerializer, EmailMessageSerializer
+from backend.apps.users.models import User, Role, UserPermission, UserSession
+from backend.apps.users.readers import UserReader, UserSessionReader
+from backend.apps.users.serializers import UserSerializer, UserSessionSerializer
+
+
+BENCH_DOMAIN = 'list-bench.pharmerp.local'
+MODULES = ('sales', 'inventory', 'customers', 'reports')
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the values() list readers with the ModelSerializers they replace'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Rows seeded per list')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per serializer; the best is reported')
+
+    def handle(self, *args, **options):
+        # Seeded rows are rolled back, so the database is left as it was
+        try:
+            with transaction.atomic():
+                self._seed(options['rows'])
+                self._report(options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _report(self, repeat):
+        users = User.objects.filter(email__endswith=BENCH_DOMAIN).order_by('-created_at')
+        sessions = UserSession.objects.filter(user__email__endswith=BENCH_DOMAIN).order_by('-created_at')
+        logs = AuditLog.objects.filter(user__email__endswith=BENCH_DOMAIN).order_by('-created_at', '-id')
+        emails = EmailMessage.objects.filter(sender__email__endswith=BENCH_DOMAIN).order_by('-sent_at')
+        cases = [
+            ('users', users, UserSerializer, UserReader),
+            ('sessions', sessions, UserSessionSerializer, UserSessionReader),
+            ('audit logs', logs, AuditLogSerializer, AuditLogReader),
+            ('emails', emails, EmailMessageSerializer, EmailMessageReader),
+        ]
+
+        self.stdout.write(f"{'list':<12} {'serializer rows/s':>18} {'queries':>8} {'reader rows/s':>14} {'queries':>8}")
+        for name, queryset, serializer_class, reader_class in cases:
+            old_rate, old_queries, old_json = self._measure(
+                lambda: serializer_class(queryset.all(), many=True).data, repeat
+            )
+            new_rate, new_queries, new_json = self._measure(
+                lambda: reader_class().serialize(queryset.all()), repeat
+            )
+            assert old_json == new_json, f'{name}: reader output differs from {serializer_class.__name__}'
+            self.stdout.write(
+                f'{name:<12} {old_rate:>18,.0f} {old_queries:>8} {new_rate:>14,.0f} {new_queries:>8}'
+            )
+
+    def _measure(self, serialize, repeat):
+        best, query_count = None, None
+        for _ in range(repeat):
+            # Counted with a wrapper: the debug query log stops at 9000 entries
+            executed = []
+
+            def count(execute, *args):
+                executed.append(args[0])
+                return execute(*args)
+
+            with connection.execute_wrapper(count):
+                started = time.perf_counter()
+                data = serialize()
+                rendered = JSONRenderer().render(data)
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            if query_count is None:
+                query_count = len(executed)
+        return len(data) / best, query_count, rendered
+
+    def _seed(self, rows):
+        self.stdout.write(f'Seeding {rows} rows per list...')
+        role, _ = Role.objects.get_or_create(name='Cashier')
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(first_name='Bench', last_name=str(i), email=f'user{i}@{BENCH_DOMAIN}',
+                 password_hash='!', role=role, last_login=now)
+            for i in range(rows)
+        ])
+        UserPermission.objects.bulk_create([
+            UserPermission(user=user, module=module, can_view=True)
+            for user in users for module in MODULES
+        ])
+        UserSession.objects.bulk_create([
+            UserSession(user=user, token_id=f'bench-{user.id}', ip_address='10.0.0.1',
+                        user_agent='bench', expires_at=now + timedelta(hours=1))
+            for user in users
+        ])
+        AuditLog.objects.bulk_create([
+            AuditLog(user=user, action='update', table_name='products', record_id=user.id,
+                     new_values={'price': '10.00'}, ip_address='10.0.0.1')
+            for user in users
+        ])
+        EmailMessage.objects.bulk_create([
+            EmailMessage(sender=user, recipient_email=f'customer{user.id}@example.com',
+                         subject='Receipt', body='Thank you', email_type='general', status='sent')
+            for user in users
+        ])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.apps.administration.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute audit log rollups from the audit_logs table and its archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-archives', action='store_true', help='Only count rows still in audit_logs')
+
+    def handle(self, *args, **options):
+        buckets = rebuild_rollups(include_archives=not options['skip_archives'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} audit log rollups'))
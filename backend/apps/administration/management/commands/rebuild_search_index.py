@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from backend.apps.administration.search import SEARCH_INDEXES, search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate search documents for users, customers and products from their tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('doc_types', nargs='*', help=f"Any of {', '.join(SEARCH_INDEXES)}; defaults to all")
+
+    def handle(self, *args, **options):
+        unknown = set(options['doc_types']) - set(SEARCH_INDEXES)
+        if unknown:
+            raise CommandError(f"Unknown document types: {', '.join(sorted(unknown))}")
+
+        for doc_type in options['doc_types'] or SEARCH_INDEXES:
+            with transaction.atomic():
+                count = search_index.rebuild(doc_type)
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {doc_type}'))
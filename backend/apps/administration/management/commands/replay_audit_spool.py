@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from backend.apps.administration.audit import audit_sink
+
+
+class Command(BaseCommand):
+    help = 'Insert audit entries spooled to disk while the database was unavailable'
+
+    def handle(self, *args, **options):
+        replayed = audit_sink.replay_spool()
+        self.stdout.write(self.style.SUCCESS(f'Replayed {replayed} audit entries'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.apps.administration.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox over a pool of reused SMTP connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, help='Concurrent SMTP connections (default: EMAIL_OUTBOX_CONNECTIONS)')
+        parser.add_argument('--batch-size', type=int, help='Emails claimed per round (default: EMAIL_OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Attempts before an email is marked failed')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when the queue is empty')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(
+            connections=options['connections'],
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts'],
+        )
+        try:
+            while True:
+                sent, failed = worker.drain()
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} emails, {failed} failed attempts')
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            worker.close()
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+def seed_version(apps, schema_editor):
+    SystemSettingVersion = apps.get_model('administration', 'SystemSettingVersion')
+    SystemSettingVersion.objects.get_or_create(id=1, defaults={'version': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0005_systemsettingversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_session_token_id_revokedtoken'),
+        ('administration', '0007_auditlogarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(max_length=255)),
+                ('table_name', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_rollups', to='users.user')),
+            ],
+            options={
+                'db_table': 'audit_log_rollups',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='auditlogrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'action', 'table_name', 'user'), name='unique_audit_rollup'),
+        ),
+    ]
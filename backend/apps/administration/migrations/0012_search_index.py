@@ -0,0 +1,65 @@
+from django.db import migrations
+
+from backend.apps.administration.search import SEARCH_INDEXES, document_body
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE search_documents_fts USING fts5("
+    "body, content='search_documents', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, body) VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO search_documents_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS search_documents_au",
+    "DROP TRIGGER IF EXISTS search_documents_ad",
+    "DROP TRIGGER IF EXISTS search_documents_ai",
+    "DROP TABLE IF EXISTS search_documents_fts",
+]
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX search_documents_body_trgm ON search_documents USING gin (body gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS search_documents_body_trgm",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+
+    # Index the rows that already exist
+    SearchDocument = apps.get_model('administration', 'SearchDocument')
+    for doc_type, (label, fields) in SEARCH_INDEXES.items():
+        model = apps.get_model(label)
+        SearchDocument.objects.bulk_create([
+            SearchDocument(doc_type=doc_type, object_id=values['pk'], body=document_body(values, fields))
+            for values in model.objects.values('pk', *fields).iterator()
+        ], batch_size=2000)
+
+
+def drop_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0011_searchdocument'),
+        ('users', '0003_session_token_id_revokedtoken'),
+        ('customers', '0002_initial'),
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:57
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_system_rollups(apps, schema_editor):
+    """Fold duplicate user-less rollup rows into one before they become unique"""
+    AuditLogRollup = apps.get_model('administration', 'AuditLogRollup')
+    duplicates = AuditLogRollup.objects.filter(user__isnull=True).values('day', 'action', 'table_name').annotate(
+        rows=Count('id'), keep=Min('id'), total=Sum('count')
+    ).filter(rows__gt=1).order_by()
+    for group in duplicates:
+        AuditLogRollup.objects.filter(id=group['keep']).update(count=group['total'])
+        AuditLogRollup.objects.filter(
+            user__isnull=True, day=group['day'], action=group['action'], table_name=group['table_name']
+        ).exclude(id=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_system_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='auditlogrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('day', 'action', 'table_name'), name='unique_system_audit_rollup'),
+        ),
+    ]
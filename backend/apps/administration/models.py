@@ -17,6 +17,17 @@ class SystemSetting(models.Model):
     def __str__(self):
         return f"{self.setting_key}: {self.setting_value}"
 
+class SystemSettingVersion(models.Model):
+    """Single row bumped on every settings write so other processes know to reload"""
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "system_setting_versions"
+
+    def __str__(self):
+        return f"settings v{self.version}"
+
 class AuditLog(models.Model):
     user = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name="audit_logs")
     action = models.CharField(max_length=255)
@@ -31,10 +42,60 @@ class AuditLog(models.Model):
     class Meta:
         db_table = "audit_logs"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["user", "created_at"]),
+            models.Index(fields=["table_name", "created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.user.email if self.user else 'System'} - {self.action} on {self.table_name}.{self.record_id}"
 
+class AuditLogRollup(models.Model):
+    """Audit log counts per local day, action, table and user, kept up to date on write"""
+    day = models.DateField()
+    action = models.CharField(max_length=255)
+    table_name = models.CharField(max_length=100)
+    user = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name="audit_rollups")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "audit_log_rollups"
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "action", "table_name", "user"], name="unique_audit_rollup"),
+            # NULLs never collide in the constraint above, so system rows need their own
+            models.UniqueConstraint(
+                fields=["day", "action", "table_name"], condition=models.Q(user__isnull=True),
+                name="unique_system_audit_rollup"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.action} on {self.table_name}: {self.count}"
+
+class AuditLogArchive(models.Model):
+    """Index of gzip NDJSON files holding audit log rows moved out of ``audit_logs``"""
+    file_name = models.CharField(max_length=255, unique=True)
+    month = models.DateField()
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    first_log_id = models.BigIntegerField()
+    last_log_id = models.BigIntegerField()
+    row_count = models.PositiveIntegerField()
+    size_bytes = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "audit_log_archives"
+        ordering = ["first_created_at"]
+        indexes = [
+            models.Index(fields=["first_created_at", "last_created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.row_count} rows)"
+
 class Notification(models.Model):
     user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name="notifications")
     title = models.CharField(max_length=255)
@@ -51,18 +112,115 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification to {self.user.email}: {self.title}"
 
+class BroadcastNotification(models.Model):
+    """One row per announcement; each user's read/dismiss state lives in BroadcastReceipt"""
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    type = models.CharField(max_length=50)
+    action_url = models.CharField(max_length=500, null=True, blank=True)
+    created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name="broadcasts")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = "broadcast_notifications"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Broadcast: {self.title}"
+
+class BroadcastReceipt(models.Model):
+    """Created lazily, the first time a user reads or dismisses a broadcast"""
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name="receipts")
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name="broadcast_receipts")
+    is_read = models.BooleanField(default=False)
+    is_dismissed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "broadcast_receipts"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "broadcast"], name="unique_broadcast_receipt"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.broadcast_id}"
+
+class EmailJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('completed', 'Completed'),
+    ]
+
+    created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name="email_jobs")
+    subject = models.CharField(max_length=255)
+    email_type = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "email_jobs"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.subject} ({self.sent_count}/{self.total})"
+
 class EmailMessage(models.Model):
-    sender = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name="sent_emails")
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    sender = models.ForeignKey('users.User', on_delete=models.CASCADE, null=True, blank=True, related_name="sent_emails")
     recipient_email = models.EmailField()
     subject = models.CharField(max_length=255)
     body = models.TextField()
     sent_at = models.DateTimeField(default=timezone.now)
-    status = models.CharField(max_length=20, default='sent')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='sent')
     email_type = models.CharField(max_length=50) 
+    error_message = models.TextField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    job = models.ForeignKey(EmailJob, on_delete=models.SET_NULL, null=True, blank=True, related_name="messages")
 
     class Meta:
         db_table = "email_messages"
         ordering = ["-sent_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient_email}"
+
+class DocumentSequence(models.Model):
+    sequence_key = models.CharField(max_length=100, unique=True)
+    last_value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "document_sequences"
+        ordering = ["sequence_key"]
+
+    def __str__(self):
+        return f"{self.sequence_key}: {self.last_value}"
+
+class SearchDocument(models.Model):
+    """Searchable text of one record, kept in sync by search.py and indexed per database backend"""
+    doc_type = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    body = models.TextField()
+
+    class Meta:
+        db_table = "search_documents"
+        constraints = [
+            models.UniqueConstraint(fields=["doc_type", "object_id"], name="unique_search_document"),
+        ]
 
     def __str__(self):
-        return f"{self.subject} to {self.recipient_email}"
\ No newline at end of file
+        return f"{self.doc_type} #{self.object_id}"
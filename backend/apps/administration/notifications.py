@@ -0,0 +1,211 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, CharField, Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Notification, BroadcastNotification, BroadcastReceipt
+
+
+FEED_COLUMNS = ('id', 'title', 'message', 'type', 'action_url', 'created_at', 'kind', 'read')
+
+UNREAD_CACHE_PREFIX = 'notifications:unread:'
+VERSION_CACHE_PREFIX = 'notifications:version:'
+BROADCAST_GENERATION_KEY = 'notifications:broadcast-generation'
+
+
+def visible_broadcasts(user):
+    """Broadcasts sent since the user joined that they have not dismissed"""
+    dismissed = BroadcastReceipt.objects.filter(
+        broadcast=OuterRef('pk'), user=user, is_dismissed=True
+    )
+    return BroadcastNotification.objects.filter(created_at__gte=user.created_at).exclude(
+        Exists(dismissed)
+    )
+
+
+def notification_feed(user, is_read=None, notification_type=None, since=None):
+    """Personal and broadcast notifications as one UNION ALL query, newest first.
+
+    Rows are ``FEED_COLUMNS`` tuples; ``kind`` is ``'personal'`` or
+    ``'broadcast'`` and ``read`` is the user's read state for either.
+    """
+    personal = Notification.objects.filter(user=user).annotate(
+        kind=Value('personal', output_field=CharField()),
+        read=F('is_read')
+    )
+    broadcasts = visible_broadcasts(user).annotate(
+        kind=Value('broadcast', output_field=CharField()),
+        read=Coalesce(
+            Subquery(BroadcastReceipt.objects.filter(
+                broadcast=OuterRef('pk'), user=user
+            ).values('is_read')[:1]),
+            Value(False),
+            output_field=BooleanField()
+        )
+    )
+
+    if is_read is not None:
+        personal = personal.filter(read=is_read)
+        broadcasts = broadcasts.filter(read=is_read)
+    if notification_type:
+        personal = personal.filter(type=notification_type)
+        broadcasts = broadcasts.filter(type=notification_type)
+    if since is not None:
+        personal = personal.filter(created_at__gt=since)
+        broadcasts = broadcasts.filter(created_at__gt=since)
+
+    # Model default ordering is cleared: SQLite rejects ORDER BY inside a compound query
+    return personal.order_by().values_list(*FEED_COLUMNS).union(
+        broadcasts.order_by().values_list(*FEED_COLUMNS), all=True
+    ).order_by('-created_at', '-id')
+
+
+def feed_items(rows):
+    """Dicts ready for ``NotificationFeedSerializer`` from ``notification_feed`` rows"""
+    items = [dict(zip(FEED_COLUMNS, row)) for row in rows]
+    for item in items:
+        item['is_read'] = bool(item.pop('read'))
+    return items
+
+
+def unread_broadcasts(user):
+    return visible_broadcasts(user).exclude(
+        Exists(BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user=user, is_read=True))
+    )
+
+
+def unread_count(user):
+    return Notification.objects.filter(user=user, is_read=False).count() + unread_broadcasts(user).count()
+
+
+def mark_read(user, notification_id):
+    """Mark one personal notification read; returns whether it was unread"""
+    changed = Notification.objects.filter(id=notification_id, user=user, is_read=False).update(is_read=True)
+    if changed:
+        _on_commit(adjust_unread_count, user.id, -changed)
+    return bool(changed)
+
+
+def mark_broadcast(user, broadcast_id, **state):
+    """Record ``is_read``/``is_dismissed`` for one broadcast, creating the receipt if needed"""
+    with transaction.atomic():
+        receipt, created = BroadcastReceipt.objects.select_for_update().get_or_create(
+            broadcast_id=broadcast_id, user=user, defaults=state
+        )
+        was_unread = created or not (receipt.is_read or receipt.is_dismissed)
+        if not created:
+            for field, value in state.items():
+                setattr(receipt, field, value)
+            BroadcastReceipt.objects.filter(id=receipt.id).update(**state)
+
+    delta = int(not (receipt.is_read or receipt.is_dismissed)) - int(was_unread)
+    if delta:
+        _on_commit(adjust_unread_count, user.id, delta)
+    return receipt
+
+
+def mark_all_read(user):
+    """Mark every personal and visible broadcast notification read; returns how many changed"""
+    with transaction.atomic():
+        changed = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+
+        unread = list(unread_broadcasts(user).values_list('id', flat=True))
+        if unread:
+            # Receipts exist only for broadcasts the user already touched
+            BroadcastReceipt.objects.filter(user=user, broadcast_id__in=unread).update(is_read=True)
+            BroadcastReceipt.objects.bulk_create([
+                BroadcastReceipt(broadcast_id=broadcast_id, user=user, is_read=True)
+                for broadcast_id in unread
+            ], ignore_conflicts=True)
+            changed += len(unread)
+
+    _on_commit(set_unread_count, user.id, 0)
+    return changed
+
+
+# Unread counters
+#
+# Each user's unread count is cached under a key that includes the broadcast
+# generation. Personal changes adjust the cached value in place; a new
+# broadcast bumps the generation, so every user recounts once on next read
+# instead of the broadcast fanning out to every counter. Every change also
+# bumps the user's version, which is what notification streams watch.
+
+def _on_commit(func, *args):
+    transaction.on_commit(lambda: func(*args))
+
+
+def _unread_key(user_id):
+    return f'{UNREAD_CACHE_PREFIX}{broadcast_generation()}:{user_id}'
+
+
+def _touch(user_id):
+    key = f'{VERSION_CACHE_PREFIX}{user_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def broadcast_generation():
+    generation = cache.get(BROADCAST_GENERATION_KEY)
+    if generation is None:
+        cache.add(BROADCAST_GENERATION_KEY, 1, None)
+        generation = cache.get(BROADCAST_GENERATION_KEY, 1)
+    return generation
+
+
+def bump_broadcast_generation():
+    try:
+        cache.incr(BROADCAST_GENERATION_KEY)
+    except ValueError:
+        cache.set(BROADCAST_GENERATION_KEY, 2, None)
+
+
+def cached_unread_count(user):
+    """Unread count served from the cache, counted from the database on a miss"""
+    key = _unread_key(user.id)
+    count = cache.get(key)
+    if count is None:
+        count = unread_count(user)
+        # add, not set: a concurrent adjustment already holds the fresher value
+        if not cache.add(key, count, settings.NOTIFICATION_UNREAD_CACHE_TTL):
+            count = cache.get(key, count)
+    return count
+
+
+def adjust_unread_count(user_id, delta):
+    """Shift a cached count by ``delta``; an uncached count is left to be recounted"""
+    try:
+        cache.incr(_unread_key(user_id), delta)
+    except ValueError:
+        pass
+    _touch(user_id)
+
+
+def set_unread_count(user_id, count):
+    cache.set(_unread_key(user_id), count, settings.NOTIFICATION_UNREAD_CACHE_TTL)
+    _touch(user_id)
+
+
+def change_marker(user_id):
+    """Cheap value that changes whenever the user's feed or unread count may have"""
+    version_key = f'{VERSION_CACHE_PREFIX}{user_id}'
+    values = cache.get_many([BROADCAST_GENERATION_KEY, version_key])
+    return values.get(BROADCAST_GENERATION_KEY), values.get(version_key)
+
+
+def pending_changes(user, since, recount=False):
+    """Feed items newer than ``since`` (newest first) and the current unread count.
+
+    With ``recount`` the count comes from the database and replaces the
+    cached one, catching up on writes this process's cache never saw.
+    """
+    items = feed_items(notification_feed(user, since=since))
+    if not recount:
+        return items, cached_unread_count(user)
+
+    count = unread_count(user)
+    cache.set(_unread_key(user.id), count, settings.NOTIFICATION_UNREAD_CACHE_TTL)
+    return items, count
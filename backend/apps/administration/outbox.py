@@ -0,0 +1,226 @@
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EmailJob, EmailMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(recipient_email, subject, body, sender=None, email_type='general'):
+    """Queue an email for the outbox worker and return its EmailMessage row"""
+    return EmailMessage.objects.create(
+        sender=sender,
+        recipient_email=recipient_email,
+        subject=subject,
+        body=body,
+        email_type=email_type,
+        status='queued',
+        next_attempt_at=timezone.now()
+    )
+
+
+def enqueue_emails(messages, sender=None, email_type='general', job=None):
+    """Queue many ``(recipient_email, subject, body)`` emails with one insert"""
+    now = timezone.now()
+    return EmailMessage.objects.bulk_create([
+        EmailMessage(
+            job=job,
+            sender=sender,
+            recipient_email=recipient_email,
+            subject=subject,
+            body=body,
+            email_type=email_type,
+            status='queued',
+            next_attempt_at=now
+        ) for recipient_email, subject, body in messages
+    ], batch_size=500)
+
+
+def create_email_job(recipients, subject, body, sender=None, email_type='bulk'):
+    """Queue one email per distinct recipient under an EmailJob that tracks progress"""
+    recipients = list(dict.fromkeys(recipients))
+    with transaction.atomic():
+        job = EmailJob.objects.create(
+            created_by=sender,
+            subject=subject,
+            email_type=email_type,
+            total=len(recipients)
+        )
+        enqueue_emails(
+            [(recipient, subject, body) for recipient in recipients],
+            sender=sender,
+            email_type=email_type,
+            job=job
+        )
+    return job
+
+
+class OutboxWorker:
+    """Drains queued EmailMessage rows over a pool of reused SMTP connections.
+
+    Rows are claimed by flipping them to ``sending`` with a lease; a row whose
+    lease runs out (e.g. the worker died) becomes claimable again. Each claimed
+    batch is split across ``connections`` pool threads, and each thread hands
+    its share to ``send_messages`` on one long-lived connection. Failed sends
+    are retried with exponential backoff until ``max_attempts``, and the
+    counters of any EmailJob involved are updated once per batch.
+    Database work stays on the calling thread; pool threads only talk SMTP.
+    """
+
+    def __init__(self, connections=None, batch_size=None, max_attempts=5,
+                 backoff_seconds=60, lease_seconds=300):
+        if connections is None:
+            connections = getattr(settings, 'EMAIL_OUTBOX_CONNECTIONS', 2)
+        if batch_size is None:
+            batch_size = getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 100)
+        self.connections = connections
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._open_connections = []
+        self._pool = ThreadPoolExecutor(max_workers=connections, thread_name_prefix='outbox')
+
+    def drain(self):
+        """Send everything currently due; returns ``(sent, failed attempts)``"""
+        sent = failed = 0
+        while True:
+            messages = self.claim()
+            if not messages:
+                return sent, failed
+            batch_sent, batch_failed = self.send(messages)
+            sent += batch_sent
+            failed += batch_failed
+
+    def claim(self):
+        now = timezone.now()
+        due = Q(status='queued', next_attempt_at__lte=now) | Q(status='sending', next_attempt_at__lte=now)
+        with transaction.atomic():
+            ids = list(
+                EmailMessage.objects.filter(due).order_by('next_attempt_at', 'id')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return []
+            # Only rows still due are ours; the exact lease time marks them
+            # apart from rows a concurrent worker claimed
+            lease_until = now + timedelta(seconds=self.lease_seconds)
+            EmailMessage.objects.filter(due, id__in=ids).update(
+                status='sending', next_attempt_at=lease_until
+            )
+        return list(EmailMessage.objects.filter(
+            id__in=ids, status='sending', next_attempt_at=lease_until
+        ))
+
+    def send(self, messages):
+        chunks = [messages[i::self.connections] for i in range(self.connections)]
+        results = []
+        for chunk_results in self._pool.map(self._send_chunk, [chunk for chunk in chunks if chunk]):
+            results.extend(chunk_results)
+
+        now = timezone.now()
+        sent_ids = [message.id for message, error in results if error is None]
+        if sent_ids:
+            EmailMessage.objects.filter(id__in=sent_ids).update(
+                status='sent', sent_at=now, error_message=None, next_attempt_at=None
+            )
+
+        failures = [(message, error) for message, error in results if error is not None]
+        for message, error in failures:
+            message.attempts += 1
+            message.error_message = error
+            if message.attempts >= self.max_attempts:
+                message.status = 'failed'
+                message.next_attempt_at = None
+            else:
+                message.status = 'queued'
+                message.next_attempt_at = now + timedelta(
+                    seconds=self.backoff_seconds * 2 ** (message.attempts - 1)
+                )
+        if failures:
+            EmailMessage.objects.bulk_update(
+                [message for message, _ in failures],
+                ['attempts', 'error_message', 'status', 'next_attempt_at']
+            )
+
+        self._update_jobs(results)
+        return len(sent_ids), len(failures)
+
+    def _update_jobs(self, results):
+        """Add this batch's final outcomes to the counters of their jobs"""
+        counts = {}
+        for message, error in results:
+            if message.job_id is None or (error is not None and message.status != 'failed'):
+                continue
+            sent, failed = counts.get(message.job_id, (0, 0))
+            counts[message.job_id] = (sent + (error is None), failed + (error is not None))
+
+        for job_id, (sent, failed) in counts.items():
+            EmailJob.objects.filter(id=job_id).update(
+                sent_count=F('sent_count') + sent,
+                failed_count=F('failed_count') + failed
+            )
+        if counts:
+            EmailJob.objects.filter(
+                id__in=list(counts), status='queued',
+                total__lte=F('sent_count') + F('failed_count')
+            ).update(status='completed', completed_at=timezone.now())
+
+    def _send_chunk(self, messages):
+        # One send_messages call per email on the thread's shared connection:
+        # a failing batch call would not say which emails already went out,
+        # and retrying those would deliver duplicates
+        results = []
+        for message in messages:
+            email = mail.EmailMessage(
+                subject=message.subject,
+                body=message.body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[message.recipient_email]
+            )
+            try:
+                self._connection().send_messages([email])
+                results.append((message, None))
+            except Exception as e:
+                logger.warning('Sending email %s failed: %s', message.id, e)
+                self._reset_connection()
+                results.append((message, str(e)))
+        return results
+
+    def _connection(self):
+        # One long-lived connection per pool thread, reopened after errors
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = mail.get_connection(fail_silently=False)
+            connection.open()
+            self._local.connection = connection
+            self._open_connections.append(connection)
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self._local.connection = None
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for connection in self._open_connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self._open_connections = []
@@ -0,0 +1,171 @@
+import json
+import base64
+import binascii
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def local_date_bounds(start_date=None, end_date=None):
+    """Half-open ``[start, end)`` datetimes covering whole local days.
+
+    Filtering ``created_at__gte=start, created_at__lt=end`` keeps the column
+    bare so an index on it can be used, unlike ``created_at__date``. Days are
+    taken in the project time zone (Africa/Nairobi). Either bound may be
+    omitted; raises ``ValidationError`` for malformed dates.
+    """
+    bounds = []
+    for value, days in ((start_date, 0), (end_date, 1)):
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({'error': 'Dates must be in YYYY-MM-DD format'})
+        bounds.append(timezone.make_aware(
+            datetime.combine(day + timedelta(days=days), time.min),
+            timezone.get_default_timezone()
+        ))
+    return tuple(bounds)
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first cursor pagination over ``(created_at, id)``.
+
+    Each page is one index range scan from the cursor position, so page
+    cost stays flat however deep the client scrolls, and rows inserted
+    meanwhile never shift later pages. The cursor is the opaque position of
+    the last row served.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def __init__(self, page_size=None):
+        if page_size is not None:
+            self.page_size = page_size
+
+    @staticmethod
+    def position(row):
+        if isinstance(row, dict):
+            return (row['created_at'], row['id'])
+        return (row.created_at, row.id)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor:
+            created_at, row_id = self.cursor
+            # The redundant created_at <= bound gives the planner an index
+            # seek; the OR alone makes it scan down from the newest row
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=row_id),
+                created_at__lte=created_at
+            )
+        rows = list(queryset.order_by('-created_at', '-id')[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.page = rows[:self.limit]
+        return self.page
+
+    def remaining(self):
+        """Position the page continues after, and how many more rows it takes"""
+        last = self.position(self.page[-1]) if self.page else self.cursor
+        return last, self.limit - len(self.page)
+
+    def extend(self, rows):
+        """Fill the rest of the page from ``rows`` (newest first), e.g. archived logs"""
+        last = self.position(self.page[-1]) if self.page else self.cursor
+        rows = [row for row in rows if last is None or self.position(row) < last]
+        room = self.limit - len(self.page)
+        self.has_next = len(rows) > room
+        self.page = self.page + rows[:room]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, row_id = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError
+            return created_at, int(row_id)
+        except (ValueError, TypeError, binascii.Error):
+            raise ValidationError({'error': 'Invalid cursor'})
+
+    def encode_cursor(self, row):
+        # Full isoformat: DjangoJSONEncoder would drop the microseconds
+        created_at, row_id = self.position(row)
+        return base64.urlsafe_b64encode(
+            json.dumps([created_at.isoformat(), row_id]).encode()
+        ).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+
+class RankedPagination(BasePagination):
+    """Offset pages over an already ranked list, such as search hits.
+
+    The list holds only IDs, so slicing it is cheap at any offset; only the
+    page itself is then loaded.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    offset_query_param = 'offset'
+
+    get_page_size = KeysetPagination.get_page_size
+
+    def paginate_list(self, items, request):
+        self.request = request
+        self.limit = self.get_page_size(request)
+        try:
+            self.offset = max(0, int(request.query_params.get(self.offset_query_param, 0)))
+        except ValueError:
+            raise ValidationError({'error': 'Invalid offset'})
+        self.has_next = len(items) > self.offset + self.limit
+        return items[self.offset:self.offset + self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
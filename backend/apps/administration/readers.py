@@ -0,0 +1,92 @@
+from rest_framework import serializers
+
+from .serializers import AuditLogSerializer, EmailMessageSerializer
+
+
+# Fields whose database value is already what the serializer would emit
+_PASSTHROUGH = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.JSONField, serializers.PrimaryKeyRelatedField,
+)
+
+
+class ValuesReader:
+    """List-only stand-in for a ModelSerializer, built on one ``values()`` query.
+
+    The output matches ``serializer_class`` key for key and in the same
+    order. Each plain field is read through its source as a ``values()``
+    lookup (``source='user.email'`` becomes ``user__email``) and converted
+    with the field's own ``to_representation`` only where the raw value
+    differs from the JSON (dates, decimals). As in DRF, a field reached
+    through a null relation is left out. Method fields and nested
+    serializers are answered by ``get_<field>(row)`` on the reader, with any
+    columns they need listed in ``extra_lookups``. ``prefetch(rows)`` runs
+    once per list for related data.
+    """
+
+    serializer_class = None
+    extra_lookups = ()
+
+    def __init__(self):
+        self.plan = []
+        lookups = list(self.extra_lookups)
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+                self.plan.append((name, None, getattr(self, f'get_{name}'), None))
+                continue
+
+            lookup = '__'.join(field.source_attrs)
+            relation = '__'.join(field.source_attrs[:-1]) or None
+            convert = None if isinstance(field, _PASSTHROUGH) else field.to_representation
+            self.plan.append((name, lookup, convert, relation))
+            lookups.extend(path for path in (lookup, relation) if path)
+        self.lookups = list(dict.fromkeys(lookups))
+
+    def serialize(self, queryset):
+        return self.represent(list(queryset.values(*self.lookups)))
+
+    def represent(self, rows):
+        self.prefetch(rows)
+        return [self.to_representation(row) for row in rows]
+
+    def prefetch(self, rows):
+        pass
+
+    def to_representation(self, row):
+        data = {}
+        for name, lookup, convert, relation in self.plan:
+            if lookup is None:
+                data[name] = convert(row)
+            elif relation and row[relation] is None:
+                continue
+            else:
+                value = row[lookup]
+                data[name] = convert(value) if convert and value is not None else value
+        return data
+
+
+def _full_name(row, relation):
+    return f"{row[f'{relation}__first_name']} {row[f'{relation}__last_name']}"
+
+
+class AuditLogReader(ValuesReader):
+    serializer_class = AuditLogSerializer
+    extra_lookups = ('user__first_name', 'user__last_name')
+
+    def get_user_name(self, row):
+        if row['user'] is not None:
+            return _full_name(row, 'user')
+        return 'System'
+
+
+class EmailMessageReader(ValuesReader):
+    serializer_class = EmailMessageSerializer
+    extra_lookups = ('sender', 'sender__first_name', 'sender__last_name')
+
+    def get_sender_name(self, row):
+        # System emails (e.g. password resets) have no sender
+        if row['sender'] is None:
+            return None
+        return _full_name(row, 'sender')
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AuditLog, AuditLogRollup
+from .archive import iter_archived_rows
+
+
+def rollup_key(entry):
+    """(local day, action, table_name, user_id) bucket of an audit entry dict"""
+    return (
+        timezone.localtime(entry['created_at']).date(),
+        entry['action'],
+        entry['table_name'],
+        entry['user_id'],
+    )
+
+
+def _add(key, count):
+    if AuditLogRollup.objects.filter(**key).update(count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            AuditLogRollup.objects.create(count=count, **key)
+    except IntegrityError:
+        # Another writer created the row first
+        AuditLogRollup.objects.filter(**key).update(count=F('count') + count)
+
+
+def apply_rollups(entries):
+    """Add audit entries to their rollup rows; call in the transaction inserting them"""
+    for (day, action, table_name, user_id), count in Counter(map(rollup_key, entries)).items():
+        _add({'day': day, 'action': action, 'table_name': table_name, 'user_id': user_id}, count)
+
+
+def fold_user_rollups(user_id):
+    """Move a user's rollup counts onto the user-less rows, as SET_NULL would without colliding"""
+    rows = AuditLogRollup.objects.filter(user_id=user_id)
+    counts = list(rows.values_list('day', 'action', 'table_name', 'count'))
+    rows.delete()
+    for day, action, table_name, count in counts:
+        _add({'day': day, 'action': action, 'table_name': table_name, 'user_id': None}, count)
+
+
+def rebuild_rollups(include_archives=True):
+    """Recompute every rollup from the hot table and, optionally, the archives"""
+    counts = Counter()
+    hot = AuditLog.objects.annotate(
+        day=TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    ).values_list('day', 'action', 'table_name', 'user_id').annotate(count=Count('id')).order_by()
+    for day, action, table_name, user_id, count in hot:
+        counts[(day, action, table_name, user_id)] += count
+
+    if include_archives:
+        counts.update(map(rollup_key, iter_archived_rows()))
+
+    with transaction.atomic():
+        AuditLogRollup.objects.all().delete()
+        AuditLogRollup.objects.bulk_create([
+            AuditLogRollup(day=day, action=action, table_name=table_name, user_id=user_id, count=count)
+            for (day, action, table_name, user_id), count in counts.items()
+        ], batch_size=1000)
+    return len(counts)
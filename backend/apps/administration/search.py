@@ -0,0 +1,177 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_save, post_delete
+
+from .models import SearchDocument
+
+
+# doc_type -> (model label, fields whose text is searchable)
+SEARCH_INDEXES = {
+    'users': ('users.User', ('first_name', 'last_name', 'email', 'employee_id')),
+    'customers': ('customers.Customer', (
+        'customer_code', 'first_name', 'last_name', 'company_name', 'email', 'phone', 'id_number'
+    )),
+    'products': ('products.Product', ('sku', 'name', 'generic_name', 'manufacturer')),
+}
+
+# Trigram indexes cannot answer terms shorter than this
+MIN_INDEXED_TERM = 3
+
+
+def document_body(values, fields):
+    return ' '.join(str(values[field]) for field in fields if values.get(field))
+
+
+def search_terms(query):
+    return [term for term in query.split() if term]
+
+
+class SearchBackend:
+    """Substring search over ``search_documents`` with no special index.
+
+    Works on any database, scanning the narrow document table; the
+    subclasses answer the same query from a real index.
+    """
+
+    def search(self, doc_type, query, limit):
+        """Object IDs whose document contains every term of ``query``, best first"""
+        terms = search_terms(query)
+        if not terms:
+            return []
+        documents = SearchDocument.objects.filter(doc_type=doc_type)
+        for term in terms:
+            documents = documents.filter(body__icontains=term)
+        return list(documents.order_by('object_id').values_list('object_id', flat=True)[:limit])
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 trigram index (``search_documents_fts``), ranked by bm25"""
+
+    def search(self, doc_type, query, limit):
+        terms = search_terms(query)
+        indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM]
+        if not indexed:
+            return super().search(doc_type, query, limit)
+
+        # Each term is a quoted phrase: substring match, no FTS query syntax
+        match = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in indexed)
+        short = [term for term in terms if len(term) < MIN_INDEXED_TERM]
+        sql = (
+            'SELECT d.object_id FROM search_documents_fts f '
+            'JOIN search_documents d ON d.id = f.rowid '
+            'WHERE search_documents_fts MATCH %s AND d.doc_type = %s'
+            + ' AND d.body LIKE %s' * len(short)
+            + ' ORDER BY bm25(search_documents_fts), d.object_id LIMIT %s'
+        )
+        params = [match, doc_type] + [f'%{term}%' for term in short] + [limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO search_documents_fts(search_documents_fts) VALUES ('rebuild')")
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """``pg_trgm`` GIN index on the document body, ranked by similarity"""
+
+    def search(self, doc_type, query, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        sql = (
+            'SELECT object_id FROM search_documents WHERE doc_type = %s'
+            + ' AND body ILIKE %s' * len(terms)
+            + ' ORDER BY similarity(body, %s) DESC, object_id LIMIT %s'
+        )
+        params = [doc_type] + [f'%{term}%' for term in terms] + [query, limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+class SearchIndex:
+    """Keeps ``search_documents`` in step with the models in ``SEARCH_INDEXES``"""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = BACKENDS.get(connection.vendor, SearchBackend)()
+        return self._backend
+
+    def model(self, doc_type):
+        return apps.get_model(self.indexes[doc_type][0])
+
+    def search(self, doc_type, query, limit=None):
+        return self.backend.search(doc_type, query, limit or settings.SEARCH_MAX_RESULTS)
+
+    def index_objects(self, doc_type, objects):
+        """Add or refresh the documents for ``objects`` (e.g. after a bulk_create)"""
+        fields = self.indexes[doc_type][1]
+        documents = {
+            obj.pk: document_body({field: getattr(obj, field) for field in fields}, fields)
+            for obj in objects
+        }
+        SearchDocument.objects.filter(doc_type=doc_type, object_id__in=list(documents)).delete()
+        SearchDocument.objects.bulk_create([
+            SearchDocument(doc_type=doc_type, object_id=object_id, body=body)
+            for object_id, body in documents.items()
+        ])
+
+    def remove(self, doc_type, object_id):
+        SearchDocument.objects.filter(doc_type=doc_type, object_id=object_id).delete()
+
+    def rebuild(self, doc_type, chunk_size=2000):
+        """Recreate every document of ``doc_type`` from its table; returns the count"""
+        fields = self.indexes[doc_type][1]
+        SearchDocument.objects.filter(doc_type=doc_type).delete()
+        batch, total = [], 0
+        for values in self.model(doc_type).objects.values('pk', *fields).iterator(chunk_size=chunk_size):
+            batch.append(SearchDocument(doc_type=doc_type, object_id=values['pk'], body=document_body(values, fields)))
+            if len(batch) >= chunk_size:
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        self.backend.rebuild()
+        return total + len(batch)
+
+    def connect(self):
+        """Index on save and delete; call once from ``AppConfig.ready``"""
+        for doc_type, (label, fields) in self.indexes.items():
+            model = apps.get_model(label)
+            post_save.connect(self._saved(doc_type, fields), sender=model, weak=False,
+                              dispatch_uid=f'search-index-save-{doc_type}')
+            post_delete.connect(self._deleted(doc_type), sender=model, weak=False,
+                                dispatch_uid=f'search-index-delete-{doc_type}')
+
+    def _saved(self, doc_type, fields):
+        def handler(sender, instance, update_fields=None, **kwargs):
+            # Saves that touch no indexed field (e.g. last_login) cost nothing
+            if update_fields is not None and not set(update_fields) & set(fields):
+                return
+            self.index_objects(doc_type, [instance])
+        return handler
+
+    def _deleted(self, doc_type):
+        def handler(sender, instance, **kwargs):
+            self.remove(doc_type, instance.pk)
+        return handler
+
+
+search_index = SearchIndex(SEARCH_INDEXES)
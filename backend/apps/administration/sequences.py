@@ -0,0 +1,185 @@
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DocumentSequence
+
+
+# Override or extend with the DOCUMENT_SEQUENCES setting. ``format`` may use
+# {seq}, {year} and {month}; a counter restarts whenever its formatted prefix
+# changes (e.g. every year). ``seed`` names an existing model field whose
+# highest number the counter starts after.
+DEFAULT_SEQUENCES = {
+    'employee': {'format': 'EMP-{seq:05d}', 'gap_free': True, 'seed': ('users.User', 'employee_id')},
+    'sale': {'format': 'S-{year}-{seq:06d}', 'block_size': 50, 'seed': ('sales.Sale', 'sale_number')},
+    'receipt': {'format': 'RCT-{year}-{seq:06d}', 'block_size': 50, 'seed': ('sales.Receipt', 'receipt_number')},
+    'sale_return': {'format': 'RET-{year}-{seq:06d}', 'block_size': 20, 'seed': ('sales.SaleReturn', 'return_number')},
+    'purchase_order': {'format': 'PO-{year}-{seq:05d}', 'gap_free': True, 'seed': ('suppliers.PurchaseOrder', 'po_number')},
+    'credit_note': {'format': 'CN-{year}-{seq:05d}', 'gap_free': True, 'seed': ('customers.CreditNote', 'credit_note_number')},
+    'expense': {'format': 'EXP-{year}-{seq:05d}', 'block_size': 20, 'seed': ('finance.Expense', 'expense_number')},
+    'journal_entry': {'format': 'JE-{year}-{seq:06d}', 'gap_free': True, 'seed': ('finance.JournalEntry', 'reference_number')},
+}
+
+
+class SequenceAllocator:
+    """Allocates formatted document numbers from DB-backed counters.
+
+    Gap-free sequences reserve exactly the numbers requested inside the
+    caller's transaction, so a rollback hands them back; allocations are
+    serialized on the counter row until that transaction commits.
+
+    Gapped sequences lease ``block_size`` numbers per round trip and serve
+    the rest from memory. A block leased inside a transaction is only shared
+    with other callers once that transaction commits, so a rollback can
+    never lead to the same number being handed out twice; unused numbers
+    are lost when the process exits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}
+
+    def config(self, name):
+        sequences = {**DEFAULT_SEQUENCES, **getattr(settings, 'DOCUMENT_SEQUENCES', {})}
+        try:
+            return sequences[name]
+        except KeyError:
+            raise ValueError(f'Unknown document sequence: {name}')
+
+    def next_number(self, name):
+        return self.next_numbers(name, 1)[0]
+
+    def next_numbers(self, name, count):
+        """Return ``count`` formatted numbers, in increasing order"""
+        config = self.config(name)
+        fmt, context, prefix, key = self._current(name, config)
+
+        if config.get('gap_free'):
+            values = self._reserve(key, count, config, prefix)
+        else:
+            values = self._take_gapped(key, count, config, prefix)
+
+        return [fmt.format(seq=value, **context) for value in values]
+
+    def advance(self, name, numbers):
+        """Move the counter past ``numbers`` issued outside the allocator, e.g. typed in by hand.
+
+        Numbers not under the sequence's current prefix are ignored. Call in
+        the transaction that stores them, so a rollback undoes the advance.
+        """
+        config = self.config(name)
+        _, _, prefix, key = self._current(name, config)
+        values = [
+            int(number[len(prefix):]) for number in numbers
+            if number and number.startswith(prefix) and number[len(prefix):].isdigit()
+        ]
+        if not values:
+            return
+
+        with transaction.atomic():
+            if not DocumentSequence.objects.filter(sequence_key=key).exists():
+                self._create_counter(key, config, prefix)
+            DocumentSequence.objects.filter(sequence_key=key, last_value__lt=max(values)).update(
+                last_value=max(values)
+            )
+        with self._lock:
+            # A block leased earlier may now overlap the numbers
+            self._blocks.pop(key, None)
+
+    def reset(self):
+        """Forget leased blocks (tests)"""
+        with self._lock:
+            self._blocks.clear()
+
+    def _current(self, name, config):
+        """Format, format context, prefix and counter key as of now"""
+        now = timezone.localtime()
+        fmt = config['format']
+        context = {'year': now.year, 'month': f'{now.month:02d}'}
+        prefix = fmt.split('{seq')[0].format(**context)
+        return fmt, context, prefix, f'{name}:{prefix}'
+
+    def _take_gapped(self, key, count, config, prefix):
+        with self._lock:
+            block = self._blocks.get(key)
+            if block and block[1] - block[0] + 1 >= count:
+                start = block[0]
+                block[0] += count
+                return range(start, start + count)
+
+        lease = max(count, config.get('block_size', 1))
+        in_transaction = transaction.get_connection().in_atomic_block
+        values = self._reserve(key, lease, config, prefix)
+        spare = [values[count], values[-1]] if lease > count else None
+
+        if spare:
+            if in_transaction:
+                transaction.on_commit(lambda: self._publish(key, spare))
+            else:
+                self._publish(key, spare)
+        return values[:count]
+
+    def _publish(self, key, block):
+        with self._lock:
+            current = self._blocks.get(key)
+            # Keep whichever block has more numbers left
+            if not current or current[1] - current[0] < block[1] - block[0]:
+                self._blocks[key] = block
+
+    def _reserve(self, key, count, config, prefix):
+        with transaction.atomic():
+            updated = DocumentSequence.objects.filter(sequence_key=key).update(
+                last_value=F('last_value') + count
+            )
+            if not updated:
+                self._create_counter(key, config, prefix)
+                DocumentSequence.objects.filter(sequence_key=key).update(
+                    last_value=F('last_value') + count
+                )
+            last_value = DocumentSequence.objects.filter(sequence_key=key).values_list(
+                'last_value', flat=True
+            ).get()
+        return range(last_value - count + 1, last_value + 1)
+
+    def _create_counter(self, key, config, prefix):
+        try:
+            with transaction.atomic():
+                DocumentSequence.objects.create(
+                    sequence_key=key, last_value=self._seed_value(config, prefix)
+                )
+        except IntegrityError:
+            # Another process created it first
+            pass
+
+    def _seed_value(self, config, prefix):
+        """Highest number already issued under ``prefix`` before the counter existed"""
+        if not config.get('seed'):
+            return 0
+        model_label, field = config['seed']
+        model = apps.get_model(model_label)
+        latest = model.objects.filter(**{f'{field}__startswith': prefix}).order_by(
+            f'-{field}'
+        ).values_list(field, flat=True).first()
+        suffix = latest[len(prefix):] if latest else ''
+        return int(suffix) if suffix.isdigit() else 0
+
+
+sequence_allocator = SequenceAllocator()
+
+
+def next_document_number(name):
+    """Allocate the next formatted number for a document sequence, e.g. ``'sale'``"""
+    return sequence_allocator.next_number(name)
+
+
+def next_document_numbers(name, count):
+    return sequence_allocator.next_numbers(name, count)
+
+
+def advance_document_sequence(name, numbers):
+    """Keep a sequence from later issuing any of ``numbers``, which were assigned by hand"""
+    sequence_allocator.advance(name, numbers)
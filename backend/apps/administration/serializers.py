@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import SystemSetting, AuditLog, Notification, EmailMessage
+from .models import (
+    SystemSetting, AuditLog, Notification, BroadcastNotification, EmailMessage, EmailJob
+)
 
 class SystemSettingSerializer(serializers.ModelSerializer):
     updated_by_name = serializers.SerializerMethodField()
@@ -15,6 +17,13 @@ class SystemSettingSerializer(serializers.ModelSerializer):
         return None
 
 
+class SettingSnapshotItemSerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=255)
+    value = serializers.CharField(allow_blank=True, trim_whitespace=False)
+    type = serializers.CharField(max_length=50, default='string')
+    description = serializers.CharField(allow_null=True, allow_blank=True, required=False)
+
+
 class AuditLogSerializer(serializers.ModelSerializer):
     user_name = serializers.SerializerMethodField()
     user_email = serializers.CharField(source='user.email', read_only=True)
@@ -37,6 +46,25 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
+class NotificationFeedSerializer(serializers.Serializer):
+    """A personal or broadcast notification in the merged feed"""
+    id = serializers.IntegerField()
+    kind = serializers.CharField()
+    title = serializers.CharField()
+    message = serializers.CharField()
+    type = serializers.CharField()
+    is_read = serializers.BooleanField()
+    action_url = serializers.CharField(allow_null=True)
+    created_at = serializers.DateTimeField()
+
+
+class BroadcastNotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BroadcastNotification
+        fields = '__all__'
+        read_only_fields = ['created_by', 'created_at']
+
+
 class EmailMessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.SerializerMethodField()
     sender_email = serializers.CharField(source='sender.email', read_only=True)
@@ -47,4 +75,25 @@ class EmailMessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['sent_at']
     
     def get_sender_name(self, obj):
-        return f"{obj.sender.first_name} {obj.sender.last_name}"
\ No newline at end of file
+        # System emails (e.g. password resets) have no sender
+        if obj.sender is None:
+            return None
+        return f"{obj.sender.first_name} {obj.sender.last_name}"
+
+
+class EmailJobSerializer(serializers.ModelSerializer):
+    created_by_name = serializers.SerializerMethodField()
+    pending = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = EmailJob
+        fields = '__all__'
+        read_only_fields = ['status', 'total', 'sent_count', 'failed_count', 'created_at', 'completed_at']
+    
+    def get_created_by_name(self, obj):
+        if obj.created_by:
+            return f"{obj.created_by.first_name} {obj.created_by.last_name}"
+        return None
+    
+    def get_pending(self, obj):
+        return obj.total - obj.sent_count - obj.failed_count
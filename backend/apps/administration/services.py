@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .audit import audit_sink
+from .models import SystemSetting, SystemSettingVersion
+from .settings_registry import VERSION_ROW_ID, settings_registry
+
+
+SNAPSHOT_FORMAT = 1
+
+
+def update_settings(values, user=None, request=None, action='bulk_update'):
+    """Set ``{setting_key: value}`` in one transaction.
+
+    Raises ``SystemSetting.DoesNotExist`` listing the missing keys, before
+    anything is written, if any key is unknown. Returns the updated keys.
+    """
+    with transaction.atomic():
+        settings_by_key = SystemSetting.objects.in_bulk(list(values), field_name='setting_key')
+        missing = sorted(set(values) - set(settings_by_key))
+        if missing:
+            raise SystemSetting.DoesNotExist(missing)
+
+        now = timezone.now()
+        entries = []
+        for key, value in values.items():
+            setting = settings_by_key[key]
+            old_value = setting.setting_value
+            setting.setting_value = str(value)
+            setting.updated_by = user
+            setting.updated_at = now
+            entries.append(audit_sink.entry(
+                user=user,
+                action=action,
+                table_name='system_settings',
+                record_id=setting.id,
+                old_values={'setting_value': old_value},
+                new_values={'setting_value': setting.setting_value},
+                request=request
+            ))
+
+        SystemSetting.objects.bulk_update(
+            settings_by_key.values(), ['setting_value', 'updated_by', 'updated_at']
+        )
+        audit_sink.insert(entries)
+        settings_registry.bump()
+    return list(values)
+
+
+def export_settings():
+    """Every setting as a portable snapshot"""
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': SystemSettingVersion.objects.filter(id=VERSION_ROW_ID).values_list(
+            'version', flat=True
+        ).first() or 0,
+        'exported_at': timezone.now(),
+        'settings': [
+            {'key': key, 'value': value, 'type': setting_type, 'description': description}
+            for key, value, setting_type, description in SystemSetting.objects.order_by(
+                'setting_key'
+            ).values_list('setting_key', 'setting_value', 'setting_type', 'description')
+        ],
+    }
+
+
+def import_settings(items, user=None, request=None, replace=False):
+    """Apply a snapshot's ``settings`` list atomically.
+
+    New keys are created, changed ones updated and, with ``replace``, keys
+    absent from the snapshot deleted. Returns the keys in each group.
+    """
+    items = {item['key']: item for item in items}
+    result = {'created': [], 'updated': [], 'deleted': [], 'unchanged': []}
+    fields = ('setting_value', 'setting_type', 'description')
+
+    with transaction.atomic():
+        existing = SystemSetting.objects.in_bulk(field_name='setting_key')
+        now = timezone.now()
+        to_create, to_update, entries = [], [], []
+
+        for key, item in items.items():
+            values = {
+                'setting_value': str(item['value']),
+                'setting_type': item.get('type') or 'string',
+                'description': item.get('description'),
+            }
+            setting = existing.get(key)
+            if setting is None:
+                to_create.append(SystemSetting(setting_key=key, updated_by=user, **values))
+                result['created'].append(key)
+                continue
+
+            old_values = {field: getattr(setting, field) for field in fields}
+            if old_values == values:
+                result['unchanged'].append(key)
+                continue
+            for field, value in values.items():
+                setattr(setting, field, value)
+            setting.updated_by = user
+            setting.updated_at = now
+            to_update.append(setting)
+            result['updated'].append(key)
+            entries.append(audit_sink.entry(
+                user=user, action='import', table_name='system_settings', record_id=setting.id,
+                old_values=old_values, new_values=values, request=request
+            ))
+
+        if replace:
+            stale = [setting for key, setting in existing.items() if key not in items]
+            if stale:
+                SystemSetting.objects.filter(id__in=[setting.id for setting in stale]).delete()
+                for setting in stale:
+                    result['deleted'].append(setting.setting_key)
+                    entries.append(audit_sink.entry(
+                        user=user, action='delete', table_name='system_settings',
+                        record_id=setting.id,
+                        old_values={field: getattr(setting, field) for field in fields},
+                        request=request
+                    ))
+
+        if to_create:
+            for setting in SystemSetting.objects.bulk_create(to_create):
+                entries.append(audit_sink.entry(
+                    user=user, action='import', table_name='system_settings',
+                    record_id=setting.id,
+                    new_values={field: getattr(setting, field) for field in fields},
+                    request=request
+                ))
+        if to_update:
+            SystemSetting.objects.bulk_update(to_update, [*fields, 'updated_by', 'updated_at'])
+
+        if entries:
+            audit_sink.insert(entries)
+            settings_registry.bump()
+    return result
@@ -0,0 +1,144 @@
+import json
+import time
+import logging
+import threading
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import SystemSetting, SystemSettingVersion
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_ROW_ID = 1
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def _to_bool(value):
+    return value.strip().lower() in _TRUE_VALUES
+
+
+# setting_type -> parser for the stored text value
+PARSERS = {
+    'string': str,
+    'text': str,
+    'integer': int,
+    'int': int,
+    'number': Decimal,
+    'decimal': Decimal,
+    'float': float,
+    'boolean': _to_bool,
+    'bool': _to_bool,
+    'json': json.loads,
+}
+
+
+def parse_setting_value(value, setting_type):
+    """Convert a stored setting value to its Python type; unknown types stay strings"""
+    parser = PARSERS.get((setting_type or '').lower(), str)
+    try:
+        return parser(value.strip() if parser in (int, float, Decimal) else value)
+    except (ValueError, TypeError, InvalidOperation, json.JSONDecodeError):
+        logger.warning('Setting value %r is not a valid %s', value, setting_type)
+        return value
+
+
+class SettingsRegistry:
+    """Process-local snapshot of SystemSetting rows with typed values.
+
+    Reads are served from memory. At most once per
+    ``SYSTEM_SETTINGS_POLL_INTERVAL`` seconds a read checks the version row
+    (one small query) and reloads the snapshot if another process bumped it.
+    Writers call ``bump()`` inside their transaction; the writing process
+    refreshes as soon as that transaction commits, and several bumps in one
+    transaction still cost a single reload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settings = None
+        self._values = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self, key, default=None):
+        """Typed value of ``key``, or ``default`` when it is not set"""
+        self._ensure_fresh()
+        return self._values.get(key, default)
+
+    def get_setting(self, key):
+        """The cached SystemSetting row for ``key`` (with ``updated_by``), or None"""
+        self._ensure_fresh()
+        return self._settings.get(key)
+
+    def all(self):
+        """Mapping of every setting key to its typed value"""
+        self._ensure_fresh()
+        return dict(self._values)
+
+    def bump(self):
+        """Record a settings change; call inside the transaction that made it"""
+        updated = SystemSettingVersion.objects.filter(id=VERSION_ROW_ID).update(
+            version=F('version') + 1
+        )
+        if not updated:
+            SystemSettingVersion.objects.get_or_create(id=VERSION_ROW_ID, defaults={'version': 1})
+        transaction.on_commit(self.refresh)
+
+    def refresh(self):
+        """Reload only if the version row moved since the last load"""
+        with self._lock:
+            version = self._current_version()
+            if self._settings is None or version != self._version:
+                self._load(version)
+            else:
+                self._checked_at = time.monotonic()
+
+    def reload(self):
+        with self._lock:
+            self._load(self._current_version())
+
+    def clear(self):
+        """Drop the snapshot so the next read reloads (tests)"""
+        with self._lock:
+            self._settings = None
+            self._values = {}
+            self._version = None
+            self._checked_at = 0.0
+
+    def _ensure_fresh(self):
+        interval = getattr(settings, 'SYSTEM_SETTINGS_POLL_INTERVAL', 5.0)
+        if self._settings is None or time.monotonic() - self._checked_at >= interval:
+            self.refresh()
+
+    def _current_version(self):
+        return SystemSettingVersion.objects.filter(id=VERSION_ROW_ID).values_list(
+            'version', flat=True
+        ).first() or 0
+
+    def _load(self, version):
+        # The version is read before the rows: a write racing the load leaves
+        # us on the older version, so the next poll reloads again
+        rows = {
+            setting.setting_key: setting
+            for setting in SystemSetting.objects.select_related('updated_by')
+        }
+        self._values = {
+            key: parse_setting_value(setting.setting_value, setting.setting_type)
+            for key, setting in rows.items()
+        }
+        self._settings = rows
+        self._version = version
+        self._checked_at = time.monotonic()
+
+
+settings_registry = SettingsRegistry()
+
+
+def get_setting(key, default=None):
+    """Typed value of a system setting, e.g. ``get_setting('tax_rate', Decimal('0'))``"""
+    return settings_registry.get(key, default)
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import SystemSetting, Notification, BroadcastNotification
+from .rollups import fold_user_rollups
+from .settings_registry import settings_registry
+from .notifications import adjust_unread_count, bump_broadcast_generation
+from backend.apps.users.models import User
+
+
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+def bump_settings_version(sender, instance, **kwargs):
+    settings_registry.bump()
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        transaction.on_commit(lambda: adjust_unread_count(instance.user_id, 1))
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        transaction.on_commit(lambda: adjust_unread_count(instance.user_id, -1))
+
+
+@receiver(post_save, sender=BroadcastNotification)
+def invalidate_unread_counts(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(bump_broadcast_generation)
+
+
+@receiver(pre_delete, sender=User)
+def fold_deleted_user_rollups(sender, instance, **kwargs):
+    # Runs inside the deletion's transaction, before SET_NULL would collide
+    fold_user_rollups(instance.id)
@@ -1,3 +1,1094 @@
-from django.test import TestCase
+import io
+import time
+import asyncio
+import csv
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+import threading
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from django.core.cache import cache
+from asgiref.sync import sync_to_async
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend.apps.products.models import Product
+from backend.apps.users.models import User, Role
+from backend.apps.users.permissions import clear_compiled_permissions
+from backend.apps.users.views import JWTAuthentication
+from .audit import AuditSink
+from .checks import check_shared_cache
+from .archive import AuditArchiver
+from .rollups import rebuild_rollups
+from .models import (
+    AuditLog, AuditLogArchive, AuditLogRollup, BroadcastNotification, DocumentSequence, EmailJob, EmailMessage,
+    Notification, SearchDocument, SystemSetting, SystemSettingVersion
+)
+from .search import search_index
+from .readers import AuditLogReader, EmailMessageReader
+from .serializers import AuditLogSerializer, EmailMessageSerializer
+from .notifications import cached_unread_count, notification_feed, unread_count
+from .outbox import OutboxWorker, enqueue_email, enqueue_emails
+from .settings_registry import get_setting, parse_setting_value, settings_registry
+from .sequences import advance_document_sequence, next_document_number, next_document_numbers, sequence_allocator
+from .views import _next_changes
+
+
+class AuditSinkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com', password_hash='x'
+        )
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool_dir.cleanup)
+        self.spool_path = Path(self.spool_dir.name) / 'audit_spool.ndjson'
+
+    def test_sync_mode_writes_inline(self):
+        sink = AuditSink()
+        sink.record('login', 'users', self.user.id, user=self.user)
+
+        log = AuditLog.objects.get()
+        self.assertEqual(log.action, 'login')
+        self.assertEqual(log.user, self.user)
+
+    def test_record_many_is_one_insert(self):
+        sink = AuditSink()
+        entries = [sink.entry('bulk_update', 'system_settings', i, user=self.user) for i in range(5)]
+
+        with CaptureQueriesContext(connection) as queries:
+            sink.record_many(entries)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "audit_logs"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_unavailable_database_spools_then_replays(self):
+        sink = AuditSink()
+        with override_settings(AUDIT_LOG_SPOOL_PATH=self.spool_path):
+            with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=DatabaseError), \
+                    self.assertLogs('backend.apps.administration.audit', 'ERROR'):
+                sink.record('logout', 'users', self.user.id, user=self.user)
+
+            self.assertFalse(AuditLog.objects.exists())
+            self.assertTrue(self.spool_path.exists())
+
+            self.assertEqual(sink.replay_spool(), 1)
+
+        self.assertFalse(self.spool_path.exists())
+        self.assertEqual(AuditLog.objects.get().action, 'logout')
+
+    def test_rejected_entry_is_dropped_and_the_rest_of_the_batch_written(self):
+        sink = AuditSink()
+        entries = [sink.entry('login', 'users', i, user=self.user) for i in range(3)]
+        entries[1]['action'] = None
+
+        with override_settings(AUDIT_LOG_SPOOL_PATH=self.spool_path), \
+                self.assertLogs('backend.apps.administration.audit', 'ERROR'):
+            sink.record_many(entries)
+
+        self.assertEqual(sorted(AuditLog.objects.values_list('record_id', flat=True)), [0, 2])
+        self.assertFalse(self.spool_path.exists())
+
+    @override_settings(AUDIT_LOG_MODE='async', AUDIT_LOG_FLUSH_INTERVAL=0)
+    def test_writer_survives_unexpected_errors(self):
+        sink = AuditSink()
+        batches = []
+
+        def write(entries):
+            batches.append(list(entries))
+            if len(batches) == 1:
+                raise RuntimeError('boom')
+
+        with override_settings(AUDIT_LOG_SPOOL_PATH=self.spool_path), \
+                mock.patch.object(sink, 'write', side_effect=write), \
+                mock.patch.object(sink, 'replay_spool', return_value=0), \
+                mock.patch('backend.apps.administration.audit.connection'), \
+                self.assertLogs('backend.apps.administration.audit', 'ERROR'):
+            sink.record('login', 'users', 1)
+            sink.flush(timeout=5)
+            sink.record('logout', 'users', 2)
+            sink.flush(timeout=5)
+
+        self.assertTrue(sink._thread.is_alive())
+        self.assertEqual([batch[0]['action'] for batch in batches], ['login', 'logout'])
+        self.assertIn('"login"', self.spool_path.read_text())
+
+    @override_settings(AUDIT_LOG_MODE='async', AUDIT_LOG_BATCH_SIZE=3, AUDIT_LOG_FLUSH_INTERVAL=60)
+    def test_async_mode_flushes_on_batch_size(self):
+        sink = AuditSink()
+        batches = []
+        with mock.patch.object(sink, 'write', side_effect=lambda entries: batches.append(list(entries))), \
+                mock.patch.object(sink, 'replay_spool', return_value=0), \
+                mock.patch('backend.apps.administration.audit.connection'):
+            for i in range(3):
+                sink.record('login', 'users', i)
+            sink.flush(timeout=5)
+
+        self.assertEqual([len(batch) for batch in batches], [3])
+
+
+class OutboxTests(TestCase):
+    def test_enqueue_does_not_send(self):
+        message = enqueue_email('bob@pharmerp.com', 'Hi', 'Body', email_type='welcome')
+
+        self.assertEqual(message.status, 'queued')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_sends_and_marks_rows(self):
+        enqueue_emails([(f'user{i}@pharmerp.com', 'Notice', 'Body') for i in range(5)])
+
+        worker = OutboxWorker(connections=2)
+        try:
+            self.assertEqual(worker.drain(), (5, 0))
+        finally:
+            worker.close()
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(EmailMessage.objects.exclude(status='sent').exists())
+
+    def test_failed_send_is_retried_then_marked_failed(self):
+        message = enqueue_email('bob@pharmerp.com', 'Hi', 'Body')
+        worker = OutboxWorker(connections=1, max_attempts=2, backoff_seconds=0)
+        try:
+            with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+                with self.assertLogs('backend.apps.administration.outbox', 'WARNING'):
+                    self.assertEqual(worker.drain(), (0, 2))
+        finally:
+            worker.close()
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'failed')
+        self.assertEqual(message.attempts, 2)
+        self.assertEqual(message.error_message, 'refused')
+
+
+class EmailJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_send_bulk_queues_a_job_and_worker_updates_counters(self):
+        recipients = [f'customer{i}@example.com' for i in range(7)] + ['customer0@example.com']
+        response = self.client.post('/api/administration/emails/send_bulk/', {
+            'recipients': recipients, 'subject': 'Circular', 'body': 'Price update'
+        }, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(mail.outbox), 0)
+        job_id = response.data['job']['id']
+        self.assertEqual(EmailMessage.objects.filter(job_id=job_id, status='queued').count(), 7)
+
+        worker = OutboxWorker(connections=3, batch_size=4)
+        try:
+            worker.drain()
+        finally:
+            worker.close()
+
+        response = self.client.get(f'/api/administration/email-jobs/{job_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['sent_count'], 7)
+        self.assertEqual(response.data['pending'], 0)
+        self.assertEqual(len(mail.outbox), 7)
+
+    def test_permanent_failures_count_against_the_job(self):
+        job = EmailJob.objects.create(subject='Circular', email_type='bulk', total=1)
+        enqueue_emails([('bad@example.com', 'Circular', 'Body')], job=job)
+        worker = OutboxWorker(connections=1, max_attempts=1)
+        try:
+            with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+                with self.assertLogs('backend.apps.administration.outbox', 'WARNING'):
+                    worker.drain()
+        finally:
+            worker.close()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('completed', 0, 1))
+
+
+@override_settings(SYSTEM_SETTINGS_POLL_INTERVAL=60)
+class SettingsRegistryTests(TestCase):
+    def setUp(self):
+        settings_registry.clear()
+        SystemSetting.objects.create(setting_key='tax_rate', setting_value='16.00', setting_type='decimal')
+        SystemSetting.objects.create(setting_key='tax_inclusive', setting_value='true', setting_type='boolean')
+        SystemSetting.objects.create(setting_key='receipt_footer', setting_value='Thank you', setting_type='string')
+
+    def test_values_are_typed(self):
+        self.assertEqual(get_setting('tax_rate'), Decimal('16.00'))
+        self.assertIs(get_setting('tax_inclusive'), True)
+        self.assertEqual(get_setting('receipt_footer'), 'Thank you')
+        self.assertEqual(get_setting('missing', 5), 5)
+        self.assertEqual(parse_setting_value('{"a": 1}', 'json'), {'a': 1})
+
+    def test_warm_reads_run_no_queries(self):
+        get_setting('tax_rate')
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                get_setting('tax_rate')
+
+    def test_write_reloads_on_commit(self):
+        get_setting('tax_rate')
+        with self.captureOnCommitCallbacks(execute=True):
+            SystemSetting.objects.filter(setting_key='tax_rate').update(setting_value='8')
+            settings_registry.bump()
+
+        self.assertEqual(get_setting('tax_rate'), Decimal('8'))
+
+    def test_other_process_writes_are_picked_up_on_poll(self):
+        get_setting('tax_rate')
+        # Another process changes the row and bumps the version
+        SystemSetting.objects.filter(setting_key='tax_rate').update(setting_value='8')
+        SystemSettingVersion.objects.update(version=F('version') + 1)
+
+        self.assertEqual(get_setting('tax_rate'), Decimal('16.00'))
+        with override_settings(SYSTEM_SETTINGS_POLL_INTERVAL=0):
+            self.assertEqual(get_setting('tax_rate'), Decimal('8'))
+
+
+class SettingsBulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        settings_registry.clear()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        SystemSetting.objects.bulk_create([
+            SystemSetting(setting_key=f'key_{i}', setting_value=str(i), setting_type='integer')
+            for i in range(20)
+        ])
+
+    def test_bulk_update_query_count_is_flat(self):
+        self.client.get('/api/administration/settings/export/')
+        payload = {'settings': [{'key': f'key_{i}', 'value': i * 10} for i in range(20)]}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/administration/settings/bulk_update/', payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['updated_keys']), 20)
+        # in_bulk, bulk_update, audit insert, version bump (plus savepoints and rollups)
+        statements = [
+            q for q in queries.captured_queries
+            if 'SAVEPOINT' not in q['sql'] and 'audit_log_rollups' not in q['sql']
+        ]
+        self.assertEqual(len(statements), 4)
+        self.assertEqual(SystemSetting.objects.get(setting_key='key_3').setting_value, '30')
+        self.assertEqual(AuditLog.objects.filter(action='bulk_update').count(), 20)
+
+    def test_bulk_update_reports_missing_keys_and_writes_nothing(self):
+        response = self.client.post('/api/administration/settings/bulk_update/', {
+            'settings': [{'key': 'key_1', 'value': 'x'}, {'key': 'nope', 'value': 'y'}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing_keys'], ['nope'])
+        self.assertEqual(SystemSetting.objects.get(setting_key='key_1').setting_value, '1')
+
+    def test_snapshot_round_trip(self):
+        snapshot = self.client.get('/api/administration/settings/export/').data
+        self.assertEqual(len(snapshot['settings']), 20)
+
+        SystemSetting.objects.all().delete()
+        SystemSetting.objects.create(setting_key='stale', setting_value='1', setting_type='integer')
+        snapshot['settings'][0]['value'] = '99'
+
+        response = self.client.post('/api/administration/settings/import/', {
+            'settings': snapshot['settings'], 'replace': True
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['created']), 20)
+        self.assertEqual(response.data['deleted'], ['stale'])
+        self.assertEqual(SystemSetting.objects.get(setting_key='key_0').setting_value, '99')
+        self.assertFalse(SystemSetting.objects.filter(setting_key='stale').exists())
+
+
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        overrider = override_settings(AUDIT_LOG_ARCHIVE_DIR=self.archive_dir.name)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        tz = timezone.get_current_timezone()
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.admin, action='login', table_name='users', record_id=self.admin.id,
+                     created_at=datetime(2025, month, day, 9, tzinfo=tz))
+            for month in (1, 2) for day in range(1, 6)
+        ])
+
+    def test_old_rows_move_to_monthly_archives_in_chunks(self):
+        # Chunks never span months: January goes out as 3 + 2 rows
+        archived = AuditArchiver(retention_days=30, chunk_size=3).run(max_chunks=2)
+        self.assertEqual(archived, 5)
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+        # Resuming finishes the job
+        self.assertEqual(AuditArchiver(retention_days=30, chunk_size=3).run(), 5)
+        self.assertFalse(AuditLog.objects.exists())
+        archives = list(AuditLogArchive.objects.order_by('first_created_at'))
+        self.assertEqual([archive.row_count for archive in archives], [3, 2, 3, 2])
+        self.assertEqual({str(archive.month) for archive in archives}, {'2025-01-01', '2025-02-01'})
+        for archive in archives:
+            self.assertTrue((Path(self.archive_dir.name) / archive.file_name).exists())
+
+    def test_list_merges_archives_overlapping_the_range(self):
+        AuditArchiver(retention_days=30, chunk_size=100).run()
+        AuditLog.objects.create(user=self.admin, action='logout', table_name='users', record_id=1)
+
+        response = self.client.get('/api/administration/audit-logs/', {
+            'start_date': '2025-01-04', 'end_date': '2025-02-02'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(response.data['results'][0]['user_name'], 'Ann Admin')
+        self.assertTrue(response.data['results'][0]['created_at'].startswith('2025-02-02'))
+
+        # Without a range only the hot table is read
+        response = self.client.get('/api/administration/audit-logs/')
+        self.assertEqual([log['action'] for log in response.data['results']], ['logout'])
+
+    def test_cursor_pages_continue_from_hot_rows_into_archives(self):
+        AuditArchiver(retention_days=30, chunk_size=100).run()
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.admin, action='logout', table_name='users', record_id=1,
+                     created_at=timezone.now() - timedelta(days=1))
+            for _ in range(3)
+        ])
+
+        seen = []
+        params = {'start_date': '2025-01-01', 'end_date': timezone.localdate().isoformat(), 'page_size': 4}
+        url = '/api/administration/audit-logs/'
+        while url:
+            response = self.client.get(url, params)
+            seen.extend(log['id'] for log in response.data['results'])
+            url, params = response.data['next'], None
+
+        self.assertEqual(len(seen), 13)
+        self.assertEqual(len(set(seen)), 13)
+
+    def test_pages_read_only_the_newest_archives_they_reach(self):
+        # Six files: each month as 2 + 2 + 1 rows
+        AuditArchiver(retention_days=30, chunk_size=2).run()
+        params = {'start_date': '2025-01-01', 'end_date': '2025-02-28', 'page_size': 2}
+
+        with mock.patch('backend.apps.administration.archive.gzip.open', wraps=gzip.open) as opened:
+            response = self.client.get('/api/administration/audit-logs/', params)
+        self.assertEqual(opened.call_count, 2)
+        self.assertEqual([log['created_at'][:10] for log in response.data['results']], ['2025-02-05', '2025-02-04'])
+
+        days, url = [], '/api/administration/audit-logs/'
+        while url:
+            response = self.client.get(url, params)
+            days.extend(log['created_at'][:10] for log in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(days, sorted(days, reverse=True))
+        self.assertEqual(len(days), 10)
+
+
+class AuditLogPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_pages_follow_created_at_then_id(self):
+        # Identical timestamps are ordered by id, so no row is skipped or repeated
+        moment = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.admin, action='login', table_name='users', record_id=i, created_at=moment)
+            for i in range(7)
+        ])
+
+        pages, url, params = [], '/api/administration/audit-logs/', {'page_size': 3}
+        while url:
+            response = self.client.get(url, params)
+            pages.append([log['record_id'] for log in response.data['results']])
+            url, params = response.data['next'], None
+
+        self.assertEqual(pages, [[6, 5, 4], [3, 2, 1], [0]])
+
+    def test_date_filter_uses_local_day_bounds(self):
+        tz = timezone.get_current_timezone()
+        for hour in (23, 24, 47, 48):
+            AuditLog.objects.create(
+                action='login', table_name='users', record_id=hour,
+                created_at=datetime(2025, 3, 1, tzinfo=tz) + timedelta(hours=hour)
+            )
+
+        response = self.client.get('/api/administration/audit-logs/', {
+            'start_date': '2025-03-02', 'end_date': '2025-03-02'
+        })
+        self.assertEqual([log['record_id'] for log in response.data['results']], [47, 24])
+
+        response = self.client.get('/api/administration/audit-logs/', {'start_date': '2025-13-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_activity_logs_are_paginated(self):
+        for i in range(60):
+            AuditLog.objects.create(user=self.admin, action='login', table_name='users', record_id=i)
+
+        response = self.client.get(f'/api/users/users/{self.admin.id}/activity_logs/')
+        self.assertEqual(len(response.data['results']), 50)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNone(response.data['next'])
+
+
+class AuditLogExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.admin if i % 2 else None, action='update', table_name='products',
+                     record_id=i, new_values={'price': i})
+            for i in range(30)
+        ])
+
+    def test_csv_export_streams_rows_with_user_names(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/administration/audit-logs/export/', {'table': 'products'})
+            content = b''.join(response.streaming_content).decode()
+
+        # Rows and user names come from a single joined query
+        selects = [q for q in queries.captured_queries if q['sql'].startswith('SELECT "audit_logs"')]
+        self.assertEqual(len(selects), 1)
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0]['user_name'], 'System')
+        self.assertEqual(rows[1]['user_name'], 'Ann Admin')
+        self.assertEqual(json.loads(rows[2]['new_values']), {'price': 2})
+        self.assertIn('attachment;', response['Content-Disposition'])
+
+    def test_gzip_ndjson_export(self):
+        response = self.client.get('/api/administration/audit-logs/export/', {
+            'file_format': 'ndjson', 'compress': 'gzip', 'table': 'products'
+        })
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 30)
+        self.assertEqual(json.loads(lines[-1])['record_id'], 29)
+
+
+class AuditRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def record(self, action, created_at=None, user=True):
+        entry = AuditSink.entry(action, 'users', 1, user=self.admin if user is True else user)
+        if created_at:
+            entry['created_at'] = created_at
+        AuditSink().record_many([entry])
+
+    def test_writes_update_rollups(self):
+        for _ in range(3):
+            self.record('login')
+        self.record('logout')
+        self.record('login', user=None)
+
+        self.assertEqual(AuditLogRollup.objects.get(action='login', user=self.admin).count, 3)
+        self.assertEqual(AuditLogRollup.objects.count(), 3)
+
+    def test_statistics_reads_rollups_for_a_window(self):
+        tz = timezone.get_current_timezone()
+        self.record('login', datetime(2025, 3, 1, 23, 30, tzinfo=tz))
+        self.record('login', datetime(2025, 3, 2, 0, 30, tzinfo=tz))
+        self.record('logout', datetime(2025, 3, 2, 1, 0, tzinfo=tz))
+
+        self.client.get('/api/administration/audit-logs/statistics/')
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/administration/audit-logs/statistics/', {
+                'start_date': '2025-03-02', 'end_date': '2025-03-02'
+            })
+
+        self.assertEqual(response.data['total_logs'], 2)
+        self.assertEqual(
+            [(row['action'], row['count']) for row in response.data['actions']],
+            [('login', 1), ('logout', 1)]
+        )
+        self.assertEqual(response.data['most_active_users'][0]['count'], 2)
+
+    def test_rebuild_matches_incremental_counts(self):
+        for action in ('login', 'login', 'create'):
+            self.record(action)
+        before = set(AuditLogRollup.objects.values_list('day', 'action', 'table_name', 'user_id', 'count'))
+
+        AuditLogRollup.objects.all().delete()
+        rebuild_rollups()
+
+        after = set(AuditLogRollup.objects.values_list('day', 'action', 'table_name', 'user_id', 'count'))
+        self.assertEqual(before, after)
+
+    def test_user_less_entries_share_one_row(self):
+        for _ in range(3):
+            self.record('login', user=None)
+
+        self.assertEqual(AuditLogRollup.objects.get(user__isnull=True).count, 3)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AuditLogRollup.objects.create(
+                day=timezone.localdate(), action='login', table_name='users', user=None, count=1
+            )
+
+    def test_deleting_a_user_folds_their_rollups_into_the_system_rows(self):
+        user = User.objects.create(first_name='Tom', last_name='Temp', email='tom@pharmerp.com', password_hash='x')
+        self.record('login', user=None)
+        self.record('login', user=user)
+        self.record('login', user=user)
+        self.record('logout', user=user)
+
+        user.delete()
+
+        self.assertEqual(
+            set(AuditLogRollup.objects.filter(user__isnull=True).values_list('action', 'count')),
+            {('login', 3), ('logout', 1)}
+        )
+
+
+
+class BroadcastNotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def broadcast(self, title='Stock take'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/administration/notifications/broadcast/', {
+                'title': title, 'message': 'Friday 6pm'
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['broadcast']['id']
+
+    def test_broadcast_is_one_row_whatever_the_user_count(self):
+        for i in range(20):
+            User.objects.create(first_name='U', last_name=str(i), email=f'u{i}@pharmerp.com', password_hash='x')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.broadcast()
+
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "broadcast_notifications"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(BroadcastNotification.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_feed_merges_personal_and_broadcast_in_one_query(self):
+        Notification.objects.create(user=self.admin, title='Personal', message='Hi')
+        self.broadcast()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/administration/notifications/')
+
+        feed = [q for q in queries.captured_queries if 'UNION ALL' in q['sql']]
+        self.assertEqual(len(feed), 1)
+        self.assertEqual([item['kind'] for item in response.data], ['broadcast', 'personal'])
+        self.assertFalse(any(item['is_read'] for item in response.data))
+
+    def test_read_state_is_per_user(self):
+        broadcast_id = self.broadcast()
+        Notification.objects.create(user=self.admin, title='Personal', message='Hi')
+        self.assertEqual(self.client.get('/api/administration/notifications/unread_count/').data['unread_count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/administration/notifications/{broadcast_id}/mark_as_read/', {'kind': 'broadcast'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/administration/notifications/unread_count/').data['unread_count'], 1)
+
+        other = User.objects.create(first_name='Bo', last_name='B', email='bo@pharmerp.com', password_hash='x')
+        other.created_at = self.admin.created_at
+        other.save(update_fields=['created_at'])
+        self.assertEqual(unread_count(other), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/administration/notifications/mark_all_read/')
+        self.assertEqual(self.client.get('/api/administration/notifications/unread_count/').data['unread_count'], 0)
+        self.assertEqual(
+            self.client.get('/api/administration/notifications/', {'is_read': 'false'}).data, []
+        )
+
+    def test_dismissed_broadcasts_are_hidden(self):
+        broadcast_id = self.broadcast()
+
+        self.client.post(
+            f'/api/administration/notifications/{broadcast_id}/dismiss/', {'kind': 'broadcast'}, format='json'
+        )
+
+        self.assertEqual(self.client.get('/api/administration/notifications/').data, [])
+        self.assertEqual(unread_count(self.admin), 0)
+
+    def test_users_do_not_see_broadcasts_from_before_they_joined(self):
+        self.broadcast()
+        newcomer = User.objects.create(first_name='Cy', last_name='C', email='cy@pharmerp.com', password_hash='x')
+
+        self.assertEqual(list(notification_feed(newcomer)), [])
+        self.assertEqual(unread_count(newcomer), 0)
+
+
+@override_settings(NOTIFICATION_STREAM_POLL_INTERVAL=0.01)
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def notify(self, title='Low stock'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=self.admin, title=title, message='Reorder', type='warning')
+
+    def test_warm_unread_count_runs_no_queries(self):
+        self.notify()
+        self.client.get('/api/administration/notifications/unread_count/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/administration/notifications/unread_count/')
+
+        self.assertEqual(response.data['unread_count'], 1)
+
+    def test_counter_follows_writes_without_recounting(self):
+        first = self.notify()
+        self.assertEqual(cached_unread_count(self.admin), 1)
+
+        second = self.notify()
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_unread_count(self.admin), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/administration/notifications/{first.id}/mark_as_read/')
+            # Marking twice must not count twice
+            self.client.post(f'/api/administration/notifications/{first.id}/mark_as_read/')
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_unread_count(self.admin), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(cached_unread_count(self.admin), 0)
+
+    def test_broadcast_invalidates_every_counter(self):
+        self.assertEqual(cached_unread_count(self.admin), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BroadcastNotification.objects.create(title='Audit', message='Monday', type='info')
+
+        self.assertEqual(cached_unread_count(self.admin), 1)
+
+    def test_long_poll_returns_new_notifications(self):
+        since = timezone.now() - timedelta(seconds=1)
+        self.notify()
+
+        response = self.client.get('/api/administration/notifications/stream/', {'since': since.isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['unread_count'], 1)
+        self.assertEqual([item['title'] for item in body['notifications']], ['Low stock'])
+
+    @override_settings(NOTIFICATION_LONG_POLL_TIMEOUT=0.05)
+    def test_long_poll_times_out_when_nothing_changes(self):
+        self.notify()
+
+        response = self.client.get('/api/administration/notifications/stream/', {'unread_count': 1})
+
+        self.assertEqual(response.json()['notifications'], [])
+        self.assertEqual(response.json()['unread_count'], 1)
+
+    def test_stream_requires_a_valid_token(self):
+        response = APIClient().get('/api/administration/notifications/stream/', {'token': 'nope'})
+
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(NOTIFICATION_STREAM_TIMEOUT=0.05)
+    async def test_event_stream_pushes_notifications_and_counts(self):
+        since = timezone.now() - timedelta(seconds=1)
+        await sync_to_async(self.notify)()
+
+        response = await self.async_client.get(
+            '/api/administration/notifications/stream/',
+            {'token': self.token, 'since': since.isoformat()},
+            headers={'Accept': 'text/event-stream'}
+        )
+        body = ''.join([chunk.decode() if isinstance(chunk, bytes) else chunk
+                        async for chunk in response.streaming_content])
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [block.splitlines() for block in body.split('\n\n') if block.startswith('event:')]
+        self.assertEqual([lines[0] for lines in events], ['event: notification', 'event: unread_count'])
+        self.assertEqual(json.loads(events[0][1][len('data: '):])['title'], 'Low stock')
+        self.assertEqual(json.loads(events[1][1][len('data: '):]), {'unread_count': 1})
+
+    @override_settings(NOTIFICATION_STREAM_DB_INTERVAL=0.05)
+    async def test_stream_sees_notifications_written_by_another_process(self):
+        since = timezone.now() - timedelta(seconds=1)
+        self.assertEqual(await sync_to_async(cached_unread_count)(self.admin), 0)
+
+        async def write_elsewhere():
+            await asyncio.sleep(0.1)
+            # bulk_create sends no signals, so neither the cached count nor the
+            # change marker hears of it, as with a write from another worker
+            await sync_to_async(Notification.objects.bulk_create)([
+                Notification(user=self.admin, title='Expiring batch', message='PN-24', type='warning')
+            ])
+
+        writer = asyncio.ensure_future(write_elsewhere())
+        items, unread = await _next_changes(self.admin, since, 0, timeout=2)
+        await writer
+
+        self.assertEqual([item['title'] for item in items], ['Expiring batch'])
+        self.assertEqual(unread, 1)
+        self.assertEqual(await sync_to_async(cached_unread_count)(self.admin), 1)
+
+    def test_deploy_check_warns_about_process_local_caches(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['administration.W001'])
+
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+@override_settings(DASHBOARD_REFRESH_INTERVAL=30)
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        AuditLog.objects.create(user=self.admin, action='login', table_name='users', record_id=self.admin.id)
+        Notification.objects.create(user=self.admin, title='Hi', message='Hi', type='info')
+        # Warm the principal and permission caches
+        self.client.get('/api/administration/notifications/unread_count/')
+
+    def test_snapshot_is_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/administration/dashboard/')
+
+        self.assertEqual(response.data['users'], {'total': 1, 'active': 1})
+        self.assertEqual(response.data['system']['unread_notifications'], 1)
+        self.assertEqual(response.data['recent_activity'][0]['user'], 'Ann Admin')
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/administration/dashboard/')
+
+    def test_unchanged_dashboard_returns_304(self):
+        etag = self.client.get('/api/administration/dashboard/')['ETag']
+
+        response = self.client.get('/api/administration/dashboard/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_stale_snapshot_is_recomputed(self):
+        etag = self.client.get('/api/administration/dashboard/')['ETag']
+        User.objects.create(first_name='Bo', last_name='B', email='bo@pharmerp.com', password_hash='x')
+
+        # Still fresh: the new user is not visible yet
+        self.assertEqual(self.client.get('/api/administration/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with mock.patch('backend.apps.administration.dashboard.time.time', return_value=time.time() + 60):
+            response = self.client.get('/api/administration/dashboard/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['users']['total'], 2)
+
+    def test_counters_without_audit_rows(self):
+        AuditLog.objects.all().delete()
+
+        response = self.client.get('/api/administration/dashboard/')
+
+        self.assertEqual(response.data['users']['total'], 1)
+        self.assertEqual(response.data['today'], {'sales': 0, 'revenue': 0.0})
+        self.assertEqual(response.data['recent_activity'], [])
+
+
+class ListReaderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        for i in range(6):
+            AuditLog.objects.create(
+                user=self.admin if i % 2 else None, action='update', table_name='products', record_id=i,
+                new_values={'price': str(Decimal('1.50') * i)}, ip_address='10.0.0.1' if i % 3 else None
+            )
+            EmailMessage.objects.create(
+                sender=self.admin if i % 2 else None, recipient_email=f'c{i}@example.com',
+                subject='Hi', body='Hello', email_type='general', status='queued'
+            )
+
+    def assertSameJson(self, reader_data, serializer_data):
+        self.assertEqual(JSONRenderer().render(reader_data), JSONRenderer().render(serializer_data))
+
+    def test_audit_log_reader_matches_model_serializer(self):
+        queryset = AuditLog.objects.select_related('user').order_by('-created_at', '-id')
+        self.assertSameJson(AuditLogReader().serialize(queryset), AuditLogSerializer(queryset, many=True).data)
+
+        response = self.client.get('/api/administration/audit-logs/', {'table': 'products'})
+        self.assertSameJson(response.data['results'], AuditLogSerializer(queryset, many=True).data)
+
+    def test_email_list_matches_model_serializer_in_one_query(self):
+        queryset = EmailMessage.objects.order_by('-sent_at')
+        self.assertSameJson(EmailMessageReader().serialize(queryset), EmailMessageSerializer(queryset, many=True).data)
+
+        self.client.get('/api/administration/emails/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/administration/emails/')
+        self.assertEqual(len(response.data), 6)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.ann = User.objects.create(
+            first_name='Ann', last_name='Wanjiku', email='ann.w@pharmerp.com', employee_id='EMP-0042', password_hash='x'
+        )
+        self.bob = User.objects.create(first_name='Bob', last_name='Otieno', email='bob@pharmerp.com', password_hash='x')
+
+    def test_saves_keep_documents_in_sync(self):
+        self.assertEqual(search_index.search('users', 'wanj'), [self.ann.id])
+        self.assertEqual(search_index.search('users', '0042'), [self.ann.id])
+
+        self.ann.last_name = 'Kamau'
+        self.ann.save()
+        self.assertEqual(search_index.search('users', 'wanj'), [])
+        self.assertEqual(search_index.search('users', 'kamau'), [self.ann.id])
+
+        self.bob.delete()
+        self.assertEqual(search_index.search('users', 'otieno'), [])
+
+    def test_saves_of_unindexed_fields_skip_the_index(self):
+        with self.assertNumQueries(1):
+            self.ann.save(update_fields=['last_login'])
+
+    def test_every_term_must_match_and_short_terms_still_filter(self):
+        self.assertEqual(search_index.search('users', 'pharmerp ann'), [self.ann.id])
+        self.assertEqual(sorted(search_index.search('users', 'pharmerp')), sorted([self.ann.id, self.bob.id]))
+        self.assertEqual(search_index.search('users', 'pharmerp bo'), [self.bob.id])
+        self.assertEqual(search_index.search('users', 'bo'), [self.bob.id])
+        self.assertEqual(search_index.search('users', '"bob'), [])
+
+    def test_other_models_are_indexed_by_type(self):
+        product = Product.objects.create(
+            sku='AMX-500', name='Amoxicillin 500mg', manufacturer='Cosmos', unit_of_measure='capsule'
+        )
+
+        self.assertEqual(search_index.search('products', 'amoxi'), [product.id])
+        self.assertEqual(search_index.search('users', 'amoxi'), [])
+
+    def test_rebuild_restores_documents(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(search_index.search('users', 'otieno'), [])
+
+        call_command('rebuild_search_index', 'users', stdout=io.StringIO())
+
+        self.assertEqual(search_index.search('users', 'otieno'), [self.bob.id])
+
+class SequenceAllocatorTests(TestCase):
+    def setUp(self):
+        sequence_allocator.reset()
+
+    def test_employee_numbers_are_formatted_and_seeded(self):
+        User.objects.create(
+            first_name='Old', last_name='Hand', email='old@pharmerp.com',
+            employee_id='EMP-00007', password_hash='x'
+        )
+        self.assertEqual(next_document_number('employee'), 'EMP-00008')
+        self.assertEqual(next_document_number('employee'), 'EMP-00009')
+
+    def test_year_is_part_of_the_prefix(self):
+        year = timezone.localtime().year
+        self.assertEqual(next_document_numbers('sale', 2), [f'S-{year}-000001', f'S-{year}-000002'])
+
+    def test_gap_free_rollback_returns_the_number(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                next_document_number('purchase_order')
+                raise RuntimeError
+        year = timezone.localtime().year
+        self.assertEqual(next_document_number('purchase_order'), f'PO-{year}-00001')
+
+    def test_advance_skips_numbers_assigned_by_hand(self):
+        year = timezone.localtime().year
+        self.assertEqual(next_document_number('purchase_order'), f'PO-{year}-00001')
+
+        advance_document_sequence('purchase_order', [f'PO-{year}-00120', 'PO-1999-00500', 'not-a-number', None])
+        self.assertEqual(next_document_number('purchase_order'), f'PO-{year}-00121')
+
+        # Never moves backwards
+        advance_document_sequence('purchase_order', [f'PO-{year}-00003'])
+        self.assertEqual(next_document_number('purchase_order'), f'PO-{year}-00122')
+
+
+class SequenceAllocatorThreadTests(TransactionTestCase):
+    """Threads sharing one allocator, with their transactions taken in turn.
+
+    Serializing the transactions lets this run on SQLite, while still
+    interleaving leases, shared blocks and rollbacks across threads.
+    """
+
+    workers = 6
+    per_worker = 40
+
+    def setUp(self):
+        sequence_allocator.reset()
+
+    def test_committed_numbers_are_unique_across_threads_and_rollbacks(self):
+        turn = threading.Lock()
+        committed, errors = [], []
+
+        def worker(offset):
+            try:
+                for i in range(self.per_worker):
+                    with turn:
+                        try:
+                            with transaction.atomic():
+                                numbers = next_document_numbers('sale', 1 + (i + offset) % 3)
+                                if (i + offset) % 5 == 0:
+                                    raise RuntimeError
+                            committed.extend(numbers)
+                        except RuntimeError:
+                            pass
+                    # Let another thread take the next transaction
+                    time.sleep(0)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(committed)), len(committed))
+        # Blocks leased in rolled back transactions were never shared
+        year = timezone.localtime().year
+        counter = DocumentSequence.objects.get(sequence_key=f'sale:S-{year}-').last_value
+        self.assertTrue(all(int(number.rsplit('-', 1)[1]) <= counter for number in committed))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class SequenceAllocatorConcurrencyTests(TransactionTestCase):
+    """Stress test: concurrent allocators never hand out the same number.
+
+    Needs a database with real row locking (PostgreSQL); SQLite's shared
+    in-memory test database rejects concurrent writers outright.
+    """
+
+    workers = 8
+    per_worker = 200
+
+    def setUp(self):
+        sequence_allocator.reset()
+
+    def _run(self, name):
+        results = []
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(self.per_worker):
+                    with transaction.atomic():
+                        results.append(next_document_number(name))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), self.workers * self.per_worker)
+        self.assertEqual(len(set(results)), len(results))
+        return results
+
+    def test_gapped_sequence_is_unique_under_concurrency(self):
+        self._run('sale')
+
+    def test_gap_free_sequence_is_dense_under_concurrency(self):
+        results = self._run('purchase_order')
+        numbers = sorted(int(number.rsplit('-', 1)[1]) for number in results)
+        self.assertEqual(numbers, list(range(1, len(results) + 1)))
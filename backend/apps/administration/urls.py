@@ -8,8 +8,11 @@ router.register(r'settings', views.SystemSettingViewSet, basename='system-settin
 router.register(r'audit-logs', views.AuditLogViewSet, basename='audit-logs')
 router.register(r'notifications', views.NotificationViewSet, basename='notifications')
 router.register(r'emails', views.EmailMessageViewSet, basename='emails')
+router.register(r'email-jobs', views.EmailJobViewSet, basename='email-jobs')
 
 urlpatterns = [
     path('dashboard/', views.system_dashboard, name='system-dashboard'),
+    # Before the router, which would read "stream" as a notification id
+    path('notifications/stream/', views.notification_stream, name='notification-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,24 +1,49 @@
+import json
+import asyncio
+import itertools
+
+from asgiref.sync import sync_to_async
+
 from django.db.models import Q, Count, Sum
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
+from django.utils.http import parse_etags, quote_etag
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from .models import SystemSetting, AuditLog, Notification, EmailMessage
+from .models import (
+    SystemSetting, AuditLog, AuditLogRollup, Notification, BroadcastNotification,
+    EmailMessage, EmailJob
+)
 from .serializers import (
     SystemSettingSerializer, AuditLogSerializer,
-    NotificationSerializer, EmailMessageSerializer
+    NotificationSerializer, NotificationFeedSerializer, BroadcastNotificationSerializer,
+    EmailMessageSerializer, EmailJobSerializer, SettingSnapshotItemSerializer
+)
+from .audit import record_audit
+from .outbox import enqueue_email, create_email_job
+from .settings_registry import settings_registry
+from .services import update_settings, export_settings, import_settings
+from .archive import load_archived_logs
+from .pagination import KeysetPagination, local_date_bounds
+from .exports import iter_export_rows, iter_archived_export_rows, stream_export
+from .dashboard import get_dashboard_snapshot
+from .readers import AuditLogReader, EmailMessageReader
+from .notifications import (
+    notification_feed, feed_items, visible_broadcasts, mark_broadcast, cached_unread_count,
+    change_marker, pending_changes, mark_read as mark_notification_read,
+    mark_all_read as mark_all_notifications_read
 )
 
 from backend.apps.users.models import User
 from backend.apps.users.views import JWTAuthentication, IsAdmin
-from backend.apps.sales.models import Sale
-from backend.apps.customers.models import Customer
-from backend.apps.products.models import Product
+from backend.apps.users.permissions import has_full_access
 
 
 
@@ -53,14 +78,13 @@ class SystemSettingViewSet(viewsets.ModelViewSet):
         setting = serializer.save(updated_by=user)
         
         # Log audit
-        AuditLog.objects.create(
+        record_audit(
             user=user,
             action='create',
             table_name='system_settings',
             record_id=setting.id,
             new_values=serializer.data,
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            request=request
         )
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -77,15 +101,14 @@ class SystemSettingViewSet(viewsets.ModelViewSet):
         setting = serializer.save(updated_by=user)
         
         # Log audit
-        AuditLog.objects.create(
+        record_audit(
             user=user,
             action='update',
             table_name='system_settings',
             record_id=setting.id,
             old_values={'setting_value': old_value},
             new_values={'setting_value': setting.setting_value},
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            request=request
         )
         
         return Response(serializer.data)
@@ -100,13 +123,14 @@ class SystemSettingViewSet(viewsets.ModelViewSet):
                 'error': 'Setting key is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            setting = SystemSetting.objects.get(setting_key=key)
-            return Response(SystemSettingSerializer(setting).data)
-        except SystemSetting.DoesNotExist:
+        # Served from the process-local snapshot
+        setting = settings_registry.get_setting(key)
+        if setting is None:
             return Response({
                 'error': 'Setting not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(SystemSettingSerializer(setting).data)
     
     @action(detail=False, methods=['post'])
     def bulk_update(self, request):
@@ -114,36 +138,57 @@ class SystemSettingViewSet(viewsets.ModelViewSet):
         user = JWTAuthentication.get_user_from_token(request)
         settings_data = request.data.get('settings', [])
         
-        updated = []
-        for setting_data in settings_data:
-            try:
-                setting = SystemSetting.objects.get(setting_key=setting_data['key'])
-                old_value = setting.setting_value
-                setting.setting_value = setting_data['value']
-                setting.updated_by = user
-                setting.save()
-                
-                # Log audit
-                AuditLog.objects.create(
-                    user=user,
-                    action='bulk_update',
-                    table_name='system_settings',
-                    record_id=setting.id,
-                    old_values={'setting_value': old_value},
-                    new_values={'setting_value': setting.setting_value},
-                    ip_address=request.META.get('REMOTE_ADDR', ''),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
-                )
-                
-                updated.append(setting.setting_key)
-            except SystemSetting.DoesNotExist:
-                continue
+        if not isinstance(settings_data, list) or not all(
+            isinstance(item, dict) and 'key' in item and 'value' in item for item in settings_data
+        ):
+            return Response({
+                'error': 'Settings must be a list of {"key", "value"} objects'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            updated = update_settings(
+                {item['key']: item['value'] for item in settings_data},
+                user=user,
+                request=request
+            )
+        except SystemSetting.DoesNotExist as e:
+            return Response({
+                'error': 'Unknown setting keys; nothing was updated',
+                'missing_keys': e.args[0]
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'success': True,
             'message': f'{len(updated)} settings updated',
             'updated_keys': updated
         })
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Export every setting as a snapshot"""
+        return Response(export_settings())
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_snapshot(self, request):
+        """Apply a settings snapshot in one transaction"""
+        user = JWTAuthentication.get_user_from_token(request)
+        
+        serializer = SettingSnapshotItemSerializer(data=request.data.get('settings'), many=True)
+        serializer.is_valid(raise_exception=True)
+        
+        result = import_settings(
+            serializer.validated_data,
+            user=user,
+            request=request,
+            replace=bool(request.data.get('replace', False))
+        )
+        
+        return Response({
+            'success': True,
+            'message': f"{len(result['created'])} created, {len(result['updated'])} updated, "
+                       f"{len(result['deleted'])} deleted",
+            **result
+        })
 
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
@@ -151,6 +196,7 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdmin]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         queryset = AuditLog.objects.all()
@@ -170,29 +216,133 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         if action:
             queryset = queryset.filter(action=action)
         
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        if start_date and end_date:
-            queryset = queryset.filter(created_at__date__range=[start_date, end_date])
+        # Filter by date range, as half-open local-day bounds on the bare column
+        start, end = local_date_bounds(
+            self.request.query_params.get('start_date'),
+            self.request.query_params.get('end_date')
+        )
+        if start:
+            queryset = queryset.filter(created_at__gte=start)
+        if end:
+            queryset = queryset.filter(created_at__lt=end)
         
-        return queryset.order_by('-created_at')
+        return queryset.select_related('user').order_by('-created_at', '-id')
+    
+    def list(self, request):
+        """Hot rows, continued into the archives when a date range reaches them"""
+        paginator = self.paginator
+        reader = AuditLogReader()
+        logs = paginator.paginate_queryset(self.get_queryset().values(*reader.lookups), request, view=self)
+        
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        if start_date and end_date and not paginator.has_next:
+            start, end = local_date_bounds(start_date, end_date)
+            before, room = paginator.remaining()
+            # One row beyond the page tells whether there is a next page
+            archived = load_archived_logs(
+                start=start,
+                end=end,
+                user_id=request.query_params.get('user_id'),
+                table_name=request.query_params.get('table'),
+                action=request.query_params.get('action'),
+                before=before,
+                limit=room + 1
+            )
+            logs = paginator.extend(archived)
+        
+        # Hot rows are values() dicts; archived ones are unsaved AuditLog instances
+        return paginator.get_paginated_response([
+            reader.to_representation(log) if isinstance(log, dict) else AuditLogSerializer(log).data
+            for log in logs
+        ])
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered audit trail as CSV or NDJSON, optionally gzipped"""
+        user = JWTAuthentication.get_user_from_token(request)
+        
+        # Not "format": DRF reserves that query parameter for renderer selection
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ('csv', 'ndjson'):
+            return Response({
+                'error': 'file_format must be csv or ndjson'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        compress = request.query_params.get('compress') in ('1', 'true', 'gzip')
+        
+        params = request.query_params
+        queryset = self.get_queryset().order_by('created_at', 'id')
+        rows = iter_export_rows(queryset)
+        if params.get('start_date') and params.get('end_date'):
+            # Oldest first, so archived rows precede the hot table
+            start, end = local_date_bounds(params['start_date'], params['end_date'])
+            rows = itertools.chain(iter_archived_export_rows(
+                start=start,
+                end=end,
+                user_id=params.get('user_id'),
+                table_name=params.get('table'),
+                action=params.get('action')
+            ), rows)
+        
+        # Log audit
+        record_audit(
+            user=user,
+            action='export',
+            table_name='audit_logs',
+            record_id=0,
+            new_values={
+                key: params[key]
+                for key in ('user_id', 'table', 'action', 'start_date', 'end_date') if params.get(key)
+            },
+            request=request
+        )
+        
+        filename = 'audit-logs-{}-{}.{}'.format(
+            params.get('start_date', 'all'), params.get('end_date', 'now'), file_format
+        )
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        if compress:
+            filename += '.gz'
+            content_type = 'application/gzip'
+        
+        response = StreamingHttpResponse(
+            stream_export(rows, file_format=file_format, compress=compress),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Get audit log statistics"""
-        total_logs = AuditLog.objects.count()
+        """Get audit log statistics, optionally for a start_date/end_date window"""
+        rollups = AuditLogRollup.objects.all()
+        
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        for param, lookup in ((start_date, 'day__gte'), (end_date, 'day__lte')):
+            if param:
+                try:
+                    day = parse_date(param)
+                except ValueError:
+                    day = None
+                if day is None:
+                    return Response({
+                        'error': 'Dates must be in YYYY-MM-DD format'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                rollups = rollups.filter(**{lookup: day})
+        
+        total_logs = rollups.aggregate(total=Sum('count'))['total'] or 0
         
         # Actions breakdown
-        actions = AuditLog.objects.values('action').annotate(count=Count('id'))
+        actions = rollups.values('action').annotate(count=Sum('count')).order_by('action')
         
         # Tables breakdown
-        tables = AuditLog.objects.values('table_name').annotate(count=Count('id')).order_by('-count')[:10]
+        tables = rollups.values('table_name').annotate(count=Sum('count')).order_by('-count')[:10]
         
         # Most active users
-        users = AuditLog.objects.filter(user__isnull=False).values(
+        users = rollups.filter(user__isnull=False).values(
             'user__first_name', 'user__last_name', 'user__email'
-        ).annotate(count=Count('id')).order_by('-count')[:10]
+        ).annotate(count=Sum('count')).order_by('-count')[:10]
         
         return Response({
             'total_logs': total_logs,
@@ -245,6 +395,19 @@ class NotificationViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-created_at')
     
+    def list(self, request):
+        """Personal and broadcast notifications, merged in one query"""
+        user = JWTAuthentication.get_user_from_token(request)
+        
+        is_read = request.query_params.get('is_read')
+        rows = notification_feed(
+            user,
+            is_read=None if is_read is None else is_read.lower() == 'true',
+            notification_type=request.query_params.get('type')
+        )
+        
+        return Response(NotificationFeedSerializer(feed_items(rows), many=True).data)
+    
     def create(self, request):
         """Create notification - Admin only"""
         if not self._is_admin(request):
@@ -260,22 +423,37 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
-        """Mark notification as read"""
+        """Mark notification as read; pass kind=broadcast for a broadcast"""
+        if request.data.get('kind') == 'broadcast':
+            return self._mark_broadcast(request, pk, is_read=True)
+        
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        mark_notification_read(notification.user, notification.id)
         
         return Response({
             'success': True,
             'message': 'Notification marked as read'
         })
     
+    @action(detail=True, methods=['post'])
+    def dismiss(self, request, pk=None):
+        """Hide a notification; pass kind=broadcast for a broadcast"""
+        if request.data.get('kind') == 'broadcast':
+            return self._mark_broadcast(request, pk, is_dismissed=True)
+        
+        self.get_object().delete()
+        
+        return Response({
+            'success': True,
+            'message': 'Notification dismissed'
+        })
+    
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        """Mark all notifications as read"""
+        """Mark all notifications, personal and broadcast, as read"""
         user = JWTAuthentication.get_user_from_token(request)
         
-        Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        mark_all_notifications_read(user)
         
         return Response({
             'success': True,
@@ -290,6 +468,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 'error': 'Admin access required'
             }, status=status.HTTP_403_FORBIDDEN)
         
+        user = JWTAuthentication.get_user_from_token(request)
         title = request.data.get('title')
         message = request.data.get('message')
         notification_type = request.data.get('type', 'info')
@@ -299,23 +478,19 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 'error': 'Title and message are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get all active users
-        users = User.objects.filter(is_active=True)
-        
-        # Create notifications
-        notifications = []
-        for user in users:
-            notification = Notification.objects.create(
-                user=user,
-                title=title,
-                message=message,
-                type=notification_type
-            )
-            notifications.append(notification)
+        # One row for everyone; per-user state is created when they act on it
+        broadcast = BroadcastNotification.objects.create(
+            title=title,
+            message=message,
+            type=notification_type,
+            action_url=request.data.get('action_url'),
+            created_by=user
+        )
         
         return Response({
             'success': True,
-            'message': f'Notification sent to {len(notifications)} users'
+            'message': f'Notification sent to {User.objects.filter(is_active=True).count()} users',
+            'broadcast': BroadcastNotificationSerializer(broadcast).data
         })
     
     @action(detail=False, methods=['get'])
@@ -323,16 +498,147 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """Get unread notifications count"""
         user = JWTAuthentication.get_user_from_token(request)
         
-        count = Notification.objects.filter(user=user, is_read=False).count()
+        return Response({
+            'unread_count': cached_unread_count(user)
+        })
+    
+    def _mark_broadcast(self, request, pk, **state):
+        user = JWTAuthentication.get_user_from_token(request)
+        if not visible_broadcasts(user).filter(id=pk).exists():
+            return Response({
+                'error': 'Notification not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        mark_broadcast(user, pk, **state)
         
         return Response({
-            'unread_count': count
+            'success': True,
+            'message': 'Notification updated'
         })
     
     def _is_admin(self, request):
         """Check if user is admin"""
         user = JWTAuthentication.get_user_from_token(request)
-        return user and user.role and user.role.name in ['Admin', 'Manager', 'Pharmacist']
+        return has_full_access(user)
+
+
+async def notification_stream(request):
+    """Push new notifications and unread count changes to the client.
+    
+    Served as server-sent events when the client accepts
+    ``text/event-stream``; otherwise a long poll that answers as soon as
+    there are notifications newer than ``since`` or the unread count differs
+    from the client's ``unread_count``. Needs the ASGI application: each open
+    connection then costs a coroutine rather than a worker thread.
+    EventSource cannot send headers, so ``?token=`` is accepted as well as a
+    Bearer header.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header[7:] if auth_header.startswith('Bearer ') else request.GET.get('token')
+    user = await sync_to_async(JWTAuthentication.get_user_for_token)(token) if token else None
+    if user is None:
+        return JsonResponse({
+            'error': 'Authentication required'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    since = request.GET.get('since')
+    if since:
+        try:
+            since = parse_datetime(since)
+        except ValueError:
+            since = None
+        if since is None:
+            return JsonResponse({
+                'error': 'since must be an ISO 8601 datetime'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    else:
+        since = timezone.now()
+    
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        response = StreamingHttpResponse(
+            _notification_events(user, since, settings.NOTIFICATION_STREAM_TIMEOUT),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    try:
+        known_count = int(request.GET['unread_count'])
+    except (KeyError, ValueError):
+        known_count = None
+    
+    items, unread = await _next_changes(user, since, known_count, settings.NOTIFICATION_LONG_POLL_TIMEOUT)
+    return JsonResponse({
+        'unread_count': unread,
+        'notifications': NotificationFeedSerializer(items, many=True).data,
+        'since': (items[0]['created_at'] if items else since).isoformat()
+    })
+
+# Token-authenticated JSON API, same as the DRF views
+notification_stream.csrf_exempt = True
+
+
+async def _next_changes(user, since, known_count, timeout):
+    """Wait up to ``timeout`` seconds for new notifications or a different unread count.
+    
+    Between database reads only the cache is polled, and the database is
+    read when the user's change marker moves. It is also read every
+    ``NOTIFICATION_STREAM_DB_INTERVAL`` seconds regardless, since writes by
+    a process that does not share this cache never move the marker.
+    Returns ``(items, unread_count)``.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    marker = None
+    read_at = None
+    unread = known_count
+    while True:
+        current = await sync_to_async(change_marker)(user.id)
+        stale = read_at is not None and loop.time() - read_at >= settings.NOTIFICATION_STREAM_DB_INTERVAL
+        if current != marker or stale:
+            marker = current
+            read_at = loop.time()
+            items, unread = await sync_to_async(pending_changes)(user, since, recount=stale)
+            if items or unread != known_count:
+                return items, unread
+        
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return [], unread
+        await asyncio.sleep(min(settings.NOTIFICATION_STREAM_POLL_INTERVAL, remaining))
+
+
+async def _notification_events(user, since, timeout, heartbeat=15):
+    """Server-sent events until ``timeout``, after which the client reconnects"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    count = None
+    
+    yield 'retry: 3000\n\n'
+    while (remaining := deadline - loop.time()) > 0:
+        items, unread = await _next_changes(user, since, count, min(heartbeat, remaining))
+        if not items and unread == count:
+            # Comment line keeps proxies from closing an idle connection
+            yield ': keep-alive\n\n'
+            continue
+        
+        if items:
+            since = items[0]['created_at']
+        for item in reversed(items):
+            yield _sse('notification', NotificationFeedSerializer(item).data)
+        if unread != count:
+            count = unread
+            yield _sse('unread_count', {'unread_count': unread})
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
 
 
 class EmailMessageViewSet(viewsets.ModelViewSet):
@@ -343,7 +649,7 @@ class EmailMessageViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         """Only admins can create emails"""
-        if self.action == 'create':
+        if self.action in ['create', 'send_bulk']:
             return [IsAdmin()]
         return [IsAuthenticated()]
     
@@ -369,8 +675,12 @@ class EmailMessageViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-sent_at')
     
+    def list(self, request):
+        """List emails with sender details in a single query"""
+        return Response(EmailMessageReader().serialize(self.get_queryset()))
+    
     def create(self, request):
-        """Send email"""
+        """Queue an email for delivery"""
         sender = JWTAuthentication.get_user_from_token(request)
         
         recipient_email = request.data.get('recipient_email')
@@ -383,51 +693,24 @@ class EmailMessageViewSet(viewsets.ModelViewSet):
                 'error': 'Recipient, subject, and body are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Send email
-        try:
-            send_mail(
-                subject=subject,
-                message=body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient_email],
-                fail_silently=False,
-            )
-            
-            # Save email record
-            email_message = EmailMessage.objects.create(
-                sender=sender,
-                recipient_email=recipient_email,
-                subject=subject,
-                body=body,
-                email_type=email_type,
-                status='sent'
-            )
-            
-            return Response({
-                'success': True,
-                'message': 'Email sent successfully',
-                'email': EmailMessageSerializer(email_message).data
-            })
-        
-        except Exception as e:
-            # Save failed email
-            email_message = EmailMessage.objects.create(
-                sender=sender,
-                recipient_email=recipient_email,
-                subject=subject,
-                body=body,
-                email_type=email_type,
-                status='failed',
-                error_message=str(e)
-            )
-            
-            return Response({
-                'error': f'Failed to send email: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Queue email; the outbox worker delivers it
+        email_message = enqueue_email(
+            recipient_email=recipient_email,
+            subject=subject,
+            body=body,
+            sender=sender,
+            email_type=email_type
+        )
+        
+        return Response({
+            'success': True,
+            'message': 'Email queued for delivery',
+            'email': EmailMessageSerializer(email_message).data
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=False, methods=['post'])
     def send_bulk(self, request):
-        """Send bulk emails - Admin only"""
+        """Queue a bulk email job - Admin only"""
         sender = JWTAuthentication.get_user_from_token(request)
         
         recipients = request.data.get('recipients', [])
@@ -440,106 +723,52 @@ class EmailMessageViewSet(viewsets.ModelViewSet):
                 'error': 'Recipients, subject, and body are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        sent_count = 0
-        failed_count = 0
-        
-        for recipient in recipients:
-            try:
-                send_mail(
-                    subject=subject,
-                    message=body,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[recipient],
-                    fail_silently=False,
-                )
-                
-                EmailMessage.objects.create(
-                    sender=sender,
-                    recipient_email=recipient,
-                    subject=subject,
-                    body=body,
-                    email_type=email_type,
-                    status='sent'
-                )
-                
-                sent_count += 1
-            
-            except Exception as e:
-                EmailMessage.objects.create(
-                    sender=sender,
-                    recipient_email=recipient,
-                    subject=subject,
-                    body=body,
-                    email_type=email_type,
-                    status='failed',
-                    error_message=str(e)
-                )
-                
-                failed_count += 1
+        if not isinstance(recipients, list):
+            return Response({
+                'error': 'Recipients must be a list of email addresses'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Queue a job; the outbox worker sends it in batches
+        job = create_email_job(recipients, subject, body, sender=sender, email_type=email_type)
         
         return Response({
             'success': True,
-            'message': f'Sent {sent_count} emails, {failed_count} failed',
-            'sent': sent_count,
-            'failed': failed_count
-        })
+            'message': f'Queued {job.total} emails',
+            'job': EmailJobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class EmailJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress of bulk email jobs - Admin only"""
+    queryset = EmailJob.objects.select_related('created_by')
+    serializer_class = EmailJobSerializer
+    permission_classes = [IsAdmin]
+    
+    def get_queryset(self):
+        queryset = self.queryset
+        
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        
+        return queryset.order_by('-created_at')
 
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def system_dashboard(request):
-    """Get system dashboard statistics"""
-    # User statistics
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    
-    # Today's activity
-    today = timezone.now().date()
-    
-    # Initialize default values
-    today_sales = 0
-    today_revenue = 0
-    total_customers = 0
-    total_products = 0
-    
-    # Only calculate if models exist
-    if Sale:
-        today_sales = Sale.objects.filter(created_at__date=today, sale_status='completed').count()
-        today_revenue_result = Sale.objects.filter(created_at__date=today, sale_status='completed').aggregate(
-            total=Sum('total_amount')
-        )
-        today_revenue = today_revenue_result['total'] or 0
-    
-    if Customer:
-        total_customers = Customer.objects.count()
-    
-    if Product:
-        total_products = Product.objects.filter(is_active=True).count()
-    
-    # Recent audit logs
-    recent_logs = AuditLog.objects.select_related('user').order_by('-created_at')[:10]
-    
-    # Unread notifications
-    unread_notifications = Notification.objects.filter(is_read=False).count()
-    
-    return Response({
-        'users': {
-            'total': total_users,
-            'active': active_users
-        },
-        'today': {
-            'sales': today_sales,
-            'revenue': float(today_revenue) 
-        },
-        'system': {
-            'customers': total_customers,
-            'products': total_products,
-            'unread_notifications': unread_notifications
-        },
-        'recent_activity': [{
-            'user': f"{log.user.first_name} {log.user.last_name}" if log.user else 'System',
-            'action': log.action,
-            'table': log.table_name,
-            'timestamp': log.created_at
-        } for log in recent_logs]
-    })
\ No newline at end of file
+    """Get system dashboard statistics.
+    
+    Served from a snapshot refreshed at most every DASHBOARD_REFRESH_INTERVAL
+    seconds, with an ETag so unchanged dashboards answer 304.
+    """
+    snapshot = get_dashboard_snapshot()
+    etag = quote_etag(snapshot['etag'])
+    
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(snapshot['data'])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_alter_stockaudit_audited_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('sale', 'Sale'), ('purchase', 'Purchase'), ('audit', 'Audit'), ('adjustment', 'Adjustment'), ('return', 'Return')], max_length=50),
+        ),
+    ]
@@ -23,6 +23,7 @@ class StockMovement(models.Model):
         ('purchase', 'Purchase'),
         ('audit', 'Audit'),
         ('adjustment', 'Adjustment'),
+        ('return', 'Return'),
     ]
     product_variant = models.ForeignKey(
         'products.ProductVariant',
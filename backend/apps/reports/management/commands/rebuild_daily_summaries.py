@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from backend.apps.reports.summaries import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily sales summaries for a date range from sales and returns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='First day, YYYY-MM-DD (default: today)')
+        parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (default: the start date)')
+
+    def handle(self, *args, **options):
+        start = self._date(options['start_date']) or timezone.localdate()
+        end = self._date(options['end_date']) or start
+        if end < start:
+            raise CommandError('--end-date is before --start-date')
+
+        rows = rebuild_daily_summaries(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily sales summaries from {start} to {end}'))
+
+    @staticmethod
+    def _date(value):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+        return day
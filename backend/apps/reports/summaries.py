@@ -0,0 +1,171 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailySalesSummary
+from backend.apps.administration.pagination import local_date_bounds
+from backend.apps.sales.models import Sale, SaleItem, ReturnItem
+
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+# Payment methods with their own column; the rest count only in total_sales
+PAYMENT_COLUMNS = {'cash': 'cash_sales', 'mpesa': 'mpesa_sales', 'card': 'card_sales'}
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _delta(amount, cost, payment_method, transactions=0):
+    delta = {
+        'total_sales': amount,
+        'total_transactions': transactions,
+        'total_cost': cost,
+        'total_profit': amount - cost,
+    }
+    if payment_method in PAYMENT_COLUMNS:
+        delta[PAYMENT_COLUMNS[payment_method]] = amount
+    return delta
+
+
+def _customer_count(day):
+    """Distinct registered customers among the day's completed sales"""
+    start, end = local_date_bounds(day.isoformat(), day.isoformat())
+    return Coalesce(Subquery(
+        Sale.objects.filter(
+            sale_status='completed', customer__isnull=False, created_at__gte=start, created_at__lt=end
+        ).order_by().values(count=Count('customer_id', distinct=True))
+    ), 0)
+
+
+def apply_deltas(deltas, recount=()):
+    """Add ``deltas`` (day -> column -> amount) to the summary rows, creating missing ones.
+
+    A distinct customer count cannot be kept by adding to it, so days in
+    ``recount`` have theirs recounted from the committed sales instead.
+    """
+    with transaction.atomic():
+        for day in sorted(set(deltas) | set(recount)):
+            DailySalesSummary.objects.bulk_create([DailySalesSummary(summary_date=day)], ignore_conflicts=True)
+            updates = {column: F(column) + value for column, value in deltas.get(day, {}).items() if value}
+            if day in recount:
+                updates['total_customers'] = _customer_count(day)
+            if updates:
+                DailySalesSummary.objects.filter(summary_date=day).update(**updates)
+
+
+def _schedule(deltas, recount):
+    # Applied after commit: a rolled back sale never reaches the summary
+    transaction.on_commit(partial(apply_deltas, dict(deltas), recount=frozenset(recount)))
+
+
+def record_sales(sales, sale_items, sign=1):
+    """Count completed ``sales`` (``sign=-1``: uncount cancelled ones) in their days' summaries.
+
+    ``sale_items`` are the sales' items, which carry the cost. Call inside
+    the transaction that writes the sales.
+    """
+    costs = defaultdict(Decimal)
+    for item in sale_items:
+        costs[item.sale_id] += (item.cost_price or ZERO) * item.quantity
+
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    recount = set()
+    for sale in sales:
+        day = timezone.localdate(sale.created_at)
+        delta = _delta(sale.total_amount, costs[sale.id], sale.payment_method, transactions=1)
+        for column, value in delta.items():
+            deltas[day][column] += sign * value
+        if sale.customer_id:
+            recount.add(day)
+    _schedule(deltas, recount)
+
+
+def record_return(created_at, payment_method, refund_amount, cost):
+    """Take a refund, and the cost of the units coming back, off its day's summary"""
+    _schedule({timezone.localdate(created_at): _delta(-refund_amount, -cost, payment_method)}, ())
+
+
+def compute_daily_summaries(start_date, end_date):
+    """Summary columns for every day in ``[start_date, end_date]`` that had sales or returns.
+
+    Sales and returns are each read in one query grouped by local day.
+    """
+    start, end = local_date_bounds(start_date.isoformat(), end_date.isoformat())
+    tz = timezone.get_default_timezone()
+
+    item_cost = SaleItem.objects.filter(sale=OuterRef('pk')).order_by().values('sale').annotate(
+        cost=Sum(ExpressionWrapper(Coalesce('cost_price', Value(ZERO)) * F('quantity'), output_field=MONEY))
+    ).values('cost')
+    payments = {
+        column: Sum('total_amount', filter=Q(payment_method=method))
+        for method, column in PAYMENT_COLUMNS.items()
+    }
+    sales = Sale.objects.filter(
+        sale_status='completed', created_at__gte=start, created_at__lt=end
+    ).annotate(cost=Coalesce(Subquery(item_cost, output_field=MONEY), Value(ZERO))).annotate(
+        day=TruncDate('created_at', tzinfo=tz)
+    ).order_by().values('day').annotate(
+        total_sales=Sum('total_amount'),
+        total_transactions=Count('id'),
+        total_customers=Count('customer_id', distinct=True),
+        total_cost=Sum('cost'),
+        **payments
+    )
+
+    summaries = {}
+    for row in sales:
+        summary = {
+            column: Decimal(row[column] or 0).quantize(CENT)
+            for column in ('total_sales', 'total_cost', *PAYMENT_COLUMNS.values())
+        }
+        summary.update(total_transactions=row['total_transactions'], total_customers=row['total_customers'])
+        summaries[row['day']] = summary
+
+    returned = ReturnItem.objects.filter(
+        return_record__return_status='completed',
+        return_record__created_at__gte=start,
+        return_record__created_at__lt=end,
+    ).annotate(day=TruncDate('return_record__created_at', tzinfo=tz)).order_by().values(
+        'day', 'return_record__original_sale__payment_method'
+    ).annotate(
+        refund=Sum('refund_amount'),
+        cost=Sum(ExpressionWrapper(
+            Coalesce('sale_item__cost_price', Value(ZERO)) * F('quantity_returned'), output_field=MONEY
+        )),
+    )
+    for row in returned:
+        summary = summaries.setdefault(row['day'], {
+            'total_sales': ZERO, 'total_cost': ZERO, 'total_transactions': 0, 'total_customers': 0,
+            **{column: ZERO for column in PAYMENT_COLUMNS.values()}
+        })
+        delta = _delta(
+            -Decimal(row['refund'] or 0).quantize(CENT), -Decimal(row['cost'] or 0).quantize(CENT),
+            row['return_record__original_sale__payment_method']
+        )
+        for column in ('total_sales', 'total_cost', *PAYMENT_COLUMNS.values()):
+            summary[column] += delta.get(column, ZERO)
+
+    for summary in summaries.values():
+        summary['total_profit'] = summary['total_sales'] - summary['total_cost']
+    return summaries
+
+
+def rebuild_daily_summaries(start_date, end_date):
+    """Recompute the summaries of ``[start_date, end_date]`` from sales and returns.
+
+    Days without activity lose their row. Returns the number of rows written.
+    """
+    summaries = compute_daily_summaries(start_date, end_date)
+    with transaction.atomic():
+        DailySalesSummary.objects.filter(summary_date__gte=start_date, summary_date__lte=end_date).delete()
+        DailySalesSummary.objects.bulk_create([
+            DailySalesSummary(summary_date=day, **columns) for day, columns in sorted(summaries.items())
+        ])
+    return len(summaries)
+
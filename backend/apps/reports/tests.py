@@ -1,3 +1,157 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import DailySalesSummary
+from .summaries import compute_daily_summaries, record_return
+from backend.apps.administration.sequences import sequence_allocator
+from backend.apps.customers.models import Customer
+from backend.apps.inventory.models import Stock, StockMovement
+from backend.apps.products.models import Product, ProductVariant
+from backend.apps.sales.models import Sale, SaleReturn, ReturnItem
+from backend.apps.sales.services import checkout
+from backend.apps.users.models import User, Role
+from backend.apps.users.permissions import clear_compiled_permissions
+from backend.apps.users.views import JWTAuthentication
+
+
+class DailySalesSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        sequence_allocator.reset()
+        self.cashier = User.objects.create(
+            first_name='Cate', last_name='Cashier', email='cate@pharmerp.com', password_hash='x',
+            role=Role.objects.create(name='Cashier', permissions={'sales': ['view', 'create', 'edit']})
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.cashier)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.customer = Customer.objects.create(first_name='Paul', last_name='Patient', phone='0700000001')
+
+        product = Product.objects.create(sku='SKU-1', name='Panadol', manufacturer='GSK', unit_of_measure='tablet')
+        self.variant = ProductVariant.objects.create(
+            product=product, strength='500mg', pack_size='10', barcode='1001', purchase_price=Decimal('30.00'),
+            selling_price=Decimal('50.00'), wholesale_price=Decimal('45.00'), min_stock_level=1, max_stock_level=100
+        )
+        Stock.objects.create(product_variant=self.variant, quantity=20)
+        self.today = timezone.localdate()
+
+    def sell(self, quantity, payment_method='cash', customer=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale, items, _ = checkout(
+                self.cashier, [{'product_variant': self.variant.id, 'quantity': quantity}],
+                payment_method, Decimal('1000.00'), customer=customer
+            )
+        return sale, items
+
+    def summary(self):
+        return DailySalesSummary.objects.values(
+            'total_sales', 'total_transactions', 'total_customers', 'cash_sales', 'mpesa_sales',
+            'card_sales', 'total_cost', 'total_profit'
+        ).get(summary_date=self.today)
+
+    def test_sales_apply_deltas_to_the_days_row(self):
+        self.sell(2, customer=self.customer)
+        self.sell(1, 'mpesa', customer=self.customer)
+        self.sell(3, 'insurance')
+
+        self.assertEqual(self.summary(), {
+            'total_sales': Decimal('300.00'),
+            'total_transactions': 3,
+            'total_customers': 1,
+            'cash_sales': Decimal('100.00'),
+            'mpesa_sales': Decimal('50.00'),
+            'card_sales': Decimal('0.00'),
+            'total_cost': Decimal('180.00'),
+            'total_profit': Decimal('120.00'),
+        })
+        self.assertEqual(compute_daily_summaries(self.today, self.today)[self.today], self.summary())
+
+    def test_rolled_back_sales_are_not_counted(self):
+        self.sell(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                checkout(self.cashier, [{'product_variant': self.variant.id, 'quantity': 1}], 'cash', Decimal('100'))
+                raise RuntimeError
+
+        self.assertEqual(self.summary()['total_transactions'], 1)
+
+    def test_cancelling_a_sale_takes_it_back_off(self):
+        sale, _ = self.sell(2, customer=self.customer)
+        self.sell(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/sales/history/{sale.id}/cancel/', {'reason': 'Rung twice'})
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Sale.objects.get(id=sale.id).sale_status, 'cancelled')
+        self.assertEqual(Stock.objects.get().quantity, 19)
+        movement = StockMovement.objects.get(reference_type='sale_cancellation')
+        self.assertEqual((movement.previous_quantity, movement.quantity_change, movement.new_quantity), (17, 2, 19))
+        self.assertEqual(Customer.objects.get().total_spent, Decimal('0.00'))
+
+        summary = self.summary()
+        self.assertEqual((summary['total_sales'], summary['total_transactions']), (Decimal('50.00'), 1))
+        self.assertEqual((summary['total_customers'], summary['total_profit']), (0, Decimal('20.00')))
+
+        response = self.client.post(f'/api/sales/history/{sale.id}/cancel/')
+        self.assertEqual(response.status_code, 409)
+
+    def test_batch_uploads_are_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/sales/batch/', {'sales': [
+                {'idempotency_key': f'till:{n}', 'payment_method': 'card', 'amount_paid': '100.00',
+                 'items': [{'product_variant': self.variant.id, 'quantity': 1}]}
+                for n in range(4)
+            ]}, format='json')
+
+        self.assertEqual(response.data['summary']['created'], 4)
+        self.assertEqual(self.summary()['card_sales'], Decimal('200.00'))
+        self.assertEqual(self.summary()['total_transactions'], 4)
+
+    def test_rebuild_matches_the_incremental_row(self):
+        sale, items = self.sell(4, customer=self.customer)
+        self.sell(1, 'mpesa')
+
+        # A return of one unit the same day
+        sale_return = SaleReturn.objects.create(
+            original_sale=sale, return_number='RET-1', cashier=self.cashier,
+            total_refund_amount=Decimal('50.00'), reason='Damaged'
+        )
+        ReturnItem.objects.create(
+            return_record=sale_return, sale_item=items[0], quantity_returned=1, refund_amount=Decimal('50.00')
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            record_return(sale_return.created_at, 'cash', Decimal('50.00'), Decimal('30.00'))
+
+        incremental = self.summary()
+        self.assertEqual(incremental['total_sales'], Decimal('200.00'))
+        self.assertEqual(incremental['total_profit'], Decimal('80.00'))
+
+        DailySalesSummary.objects.update(total_sales=0, total_profit=0)
+        out = StringIO()
+        call_command('rebuild_daily_summaries', stdout=out)
+
+        self.assertIn('Rebuilt 1 daily sales summaries', out.getvalue())
+        self.assertEqual(self.summary(), incremental)
+
+    def test_dashboard_reads_todays_row(self):
+        self.sell(2)
+        admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        token = JWTAuthentication.generate_tokens(admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.get('/api/administration/dashboard/')
 
-# Create your tests here.
+        self.assertEqual(response.data['today'], {'sales': 1, 'revenue': 100.0})
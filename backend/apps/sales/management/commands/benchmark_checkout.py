@@ -0,0 +1,109 @@
+import time
+import random
+import threading
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from backend.apps.administration.audit import audit_sink
+from backend.apps.administration.models import AuditLog, AuditLogRollup
+from backend.apps.inventory.models import Stock
+from backend.apps.products.models import Product, ProductVariant
+from backend.apps.reports.summaries import rebuild_daily_summaries
+from backend.apps.sales.models import Sale
+from backend.apps.sales.services import checkout, InsufficientStock
+from backend.apps.users.models import User
+
+
+BENCH_EMAIL = 'checkout-bench@bench.pharmerp.local'
+BENCH_SKU = 'BENCH-CHECKOUT'
+
+
+class Command(BaseCommand):
+    help = 'Measure checkout throughput (sales/sec) with concurrent tills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tills', type=int, nargs='+', default=[1, 8, 32], help='Concurrency levels to run')
+        parser.add_argument('--sales', type=int, default=100, help='Sales per till at each level')
+        parser.add_argument('--lines', type=int, default=3, help='Items per sale')
+        parser.add_argument('--variants', type=int, default=50, help='Distinct products the tills sell from')
+
+    def handle(self, *args, **options):
+        cashier, variant_ids = self._seed(options['variants'])
+        try:
+            self.stdout.write(f"{'tills':>6} {'sales':>8} {'seconds':>9} {'sales/s':>9} {'refused':>8} {'errors':>7}")
+            for tills in options['tills']:
+                self._run(cashier, variant_ids, tills, options['sales'], options['lines'])
+        finally:
+            self._cleanup()
+
+    def _run(self, cashier, variant_ids, tills, sales, lines):
+        done, refused, errors = [], [], []
+        start = threading.Barrier(tills + 1)
+
+        def till():
+            rng = random.Random()
+            try:
+                start.wait()
+                for _ in range(sales):
+                    items = [
+                        {'product_variant': variant_id, 'quantity': rng.randint(1, 3)}
+                        for variant_id in rng.sample(variant_ids, lines)
+                    ]
+                    try:
+                        checkout(cashier, items, 'cash', Decimal('100000'))
+                        done.append(1)
+                    except InsufficientStock:
+                        refused.append(1)
+                    except Exception as exc:
+                        errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=till) for _ in range(tills)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{tills:>6} {len(done):>8} {elapsed:>9.2f} {len(done) / elapsed:>9.1f} {len(refused):>8} {len(errors):>7}'
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f'First error: {errors[0]!r}'))
+
+    def _seed(self, variants):
+        self._cleanup()
+        cashier = User.objects.create(
+            first_name='Checkout', last_name='Bench', email=BENCH_EMAIL, password_hash='!'
+        )
+        product = Product.objects.create(sku=BENCH_SKU, name='Bench product', manufacturer='Bench', unit_of_measure='unit')
+        created = ProductVariant.objects.bulk_create([
+            ProductVariant(
+                product=product, strength='1', pack_size='1', barcode=f'{BENCH_SKU}-{i}',
+                purchase_price=Decimal('5.00'), selling_price=Decimal('10.00'), wholesale_price=Decimal('8.00'),
+                min_stock_level=0, max_stock_level=10 ** 9
+            )
+            for i in range(variants)
+        ])
+        Stock.objects.bulk_create([Stock(product_variant=variant, quantity=10 ** 9) for variant in created])
+        return cashier, [variant.id for variant in created]
+
+    def _cleanup(self):
+        # The sales and refunds were counted into their days' summaries on commit
+        first_sale = Sale.objects.filter(cashier__email=BENCH_EMAIL).aggregate(first=Min('created_at'))['first']
+        Sale.objects.filter(cashier__email=BENCH_EMAIL).delete()
+        Product.objects.filter(sku=BENCH_SKU).delete()
+        # Before the user goes: its rollups would be folded into the system rows
+        audit_sink.flush(timeout=30)
+        AuditLog.objects.filter(user__email=BENCH_EMAIL).delete()
+        AuditLogRollup.objects.filter(user__email=BENCH_EMAIL).delete()
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        if first_sale:
+            rebuild_daily_summaries(timezone.localdate(first_sale), timezone.localdate())
@@ -0,0 +1,111 @@
+import time
+import statistics
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from backend.apps.administration.audit import audit_sink
+from backend.apps.administration.models import AuditLog, AuditLogRollup
+from backend.apps.inventory.models import Stock
+from backend.apps.products.models import Product, ProductVariant
+from backend.apps.reports.summaries import rebuild_daily_summaries
+from backend.apps.sales.models import Sale, SaleReturn, ReturnItem
+from backend.apps.sales.services import checkout, process_return
+from backend.apps.users.models import User
+
+
+BENCH_EMAIL = 'returns-bench@bench.pharmerp.local'
+BENCH_SKU = 'BENCH-RETURNS'
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Time multi-line returns against sales with 100+ lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[100, 250, 500], help='Lines per sale')
+        parser.add_argument('--sales', type=int, default=5, help='Sales timed at each size')
+        parser.add_argument('--returns', type=int, default=3, help='Returns (one unit per line) per sale')
+
+    def handle(self, *args, **options):
+        cashier, variant_ids = self._seed(max(options['lines']))
+        try:
+            self.stdout.write(
+                f"{'lines':>6} {'return p50':>11} {'queries':>8} {'per-line check p50':>19} {'queries':>8}"
+            )
+            for lines in options['lines']:
+                self._run(cashier, variant_ids[:lines], options['sales'], options['returns'])
+        finally:
+            self._cleanup()
+
+    def _run(self, cashier, variant_ids, sales, returns):
+        timings, queries, baseline, baseline_queries = [], [], [], []
+        for _ in range(sales):
+            sale, items, _ = checkout(cashier, [
+                {'product_variant': variant_id, 'quantity': returns + 1} for variant_id in variant_ids
+            ], 'cash', Decimal('10000000'))
+            lines = [{'sale_item': item.id, 'quantity': 1} for item in items]
+
+            for _ in range(returns):
+                # What validating a return cost before the counter: one aggregate per line
+                counter = QueryCounter()
+                started = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    for item in items:
+                        ReturnItem.objects.filter(sale_item=item).aggregate(returned=Sum('quantity_returned'))
+                baseline.append(time.perf_counter() - started)
+                baseline_queries.append(counter.count)
+
+                counter = QueryCounter()
+                started = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    process_return(sale, lines, 'Benchmark', cashier)
+                timings.append(time.perf_counter() - started)
+                queries.append(counter.count)
+
+        self.stdout.write(
+            f'{len(variant_ids):>6} {statistics.median(timings) * 1000:>9.1f}ms {max(queries):>8} '
+            f'{statistics.median(baseline) * 1000:>17.1f}ms {max(baseline_queries):>8}'
+        )
+
+    def _seed(self, variants):
+        self._cleanup()
+        cashier = User.objects.create(
+            first_name='Returns', last_name='Bench', email=BENCH_EMAIL, password_hash='!'
+        )
+        product = Product.objects.create(sku=BENCH_SKU, name='Bench product', manufacturer='Bench', unit_of_measure='unit')
+        created = ProductVariant.objects.bulk_create([
+            ProductVariant(
+                product=product, strength='1', pack_size='1', barcode=f'{BENCH_SKU}-{i}',
+                purchase_price=Decimal('5.00'), selling_price=Decimal('10.00'), wholesale_price=Decimal('8.00'),
+                min_stock_level=0, max_stock_level=10 ** 9
+            )
+            for i in range(variants)
+        ])
+        Stock.objects.bulk_create([Stock(product_variant=variant, quantity=10 ** 9) for variant in created])
+        return cashier, [variant.id for variant in created]
+
+    def _cleanup(self):
+        # The sales and refunds were counted into their days' summaries on commit
+        first_sale = Sale.objects.filter(cashier__email=BENCH_EMAIL).aggregate(first=Min('created_at'))['first']
+        SaleReturn.objects.filter(cashier__email=BENCH_EMAIL).delete()
+        Sale.objects.filter(cashier__email=BENCH_EMAIL).delete()
+        Product.objects.filter(sku=BENCH_SKU).delete()
+        # Before the user goes: its rollups would be folded into the system rows
+        audit_sink.flush(timeout=30)
+        AuditLog.objects.filter(user__email=BENCH_EMAIL).delete()
+        AuditLogRollup.objects.filter(user__email=BENCH_EMAIL).delete()
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        if first_sale:
+            rebuild_daily_summaries(timezone.localdate(first_sale), timezone.localdate())
@@ -0,0 +1,145 @@
+import time
+import random
+import statistics
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.apps.administration.pagination import KeysetPagination
+from backend.apps.customers.models import Customer
+from backend.apps.sales.models import Sale
+from backend.apps.sales.views import SaleViewSet
+from backend.apps.users.models import User, Role
+
+
+BENCH_PREFIX = 'BENCH-'
+BENCH_DOMAIN = 'sales-bench.pharmerp.local'
+
+
+class Command(BaseCommand):
+    help = 'Grow the sales table and time sales history pages, first and deep, for each filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10000,100000,1000000',
+            help='Comma-separated benchmark sale counts to grow the table through'
+        )
+        parser.add_argument('--cashiers', type=int, default=20)
+        parser.add_argument('--customers', type=int, default=2000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--samples', type=int, default=20, help='Requests timed per page')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows for the next run')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        cashiers, customers = self._people(options['cashiers'], options['customers'])
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        view = SaleViewSet.as_view({'get': 'list'})
+        paginator = KeysetPagination(options['page_size'])
+        today = timezone.localdate()
+        filters = {
+            'none': {},
+            'cashier': {'cashier': cashiers[0].id},
+            'customer': {'customer': customers[0].id},
+            'status+month': {
+                'status': 'cancelled',
+                'start_date': str(today - timedelta(days=30)),
+                'end_date': str(today),
+            },
+        }
+
+        self.stdout.write(f"{'sales':>10} {'filter':>14} {'rows':>9} {'first p50':>11} {'deep p50':>11}")
+        for size in sizes:
+            self._seed(size, cashiers, customers)
+            for name, params in filters.items():
+                viewset = SaleViewSet()
+                viewset.request = Request(factory.get('/api/sales/history/', params))
+                queryset = viewset.get_queryset()
+                rows = queryset.count()
+                # Cursor positioned 90% of the way down the filtered rows (untimed)
+                depth = rows * 9 // 10
+                anchor = queryset.only('id', 'created_at')[depth - 1] if depth else None
+
+                timings = []
+                for cursor in (None, anchor):
+                    query = {**params, 'page_size': options['page_size']}
+                    if cursor is not None:
+                        query['cursor'] = paginator.encode_cursor(cursor)
+                    samples = []
+                    for _ in range(options['samples']):
+                        request = factory.get('/api/sales/history/', query)
+                        force_authenticate(request, user=cashiers[0])
+                        started = time.perf_counter()
+                        response = view(request)
+                        samples.append(time.perf_counter() - started)
+                        assert response.status_code == 200, response.data
+                    timings.append(statistics.median(samples) * 1000)
+
+                self.stdout.write(
+                    f'{size:>10} {name:>14} {rows:>9} {timings[0]:>9.2f}ms {timings[1]:>9.2f}ms'
+                )
+
+        if not options['keep']:
+            self._cleanup()
+
+    def _people(self, cashier_count, customer_count):
+        role, _ = Role.objects.get_or_create(name='Admin')
+        User.objects.bulk_create([
+            User(first_name='Sales', last_name=f'Bench {n}', email=f'cashier{n}@{BENCH_DOMAIN}',
+                 role=role, password_hash='!')
+            for n in range(cashier_count)
+        ], ignore_conflicts=True)
+        Customer.objects.bulk_create([
+            Customer(customer_code=f'{BENCH_PREFIX}{n}', first_name='Bench', last_name=str(n), phone='0700000000')
+            for n in range(customer_count)
+        ], ignore_conflicts=True)
+        return (
+            list(User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').order_by('id')),
+            list(Customer.objects.filter(customer_code__startswith=BENCH_PREFIX).order_by('id')),
+        )
+
+    def _seed(self, rows, cashiers, customers, batch_size=20_000):
+        existing = Sale.objects.filter(sale_number__startswith=BENCH_PREFIX).count()
+        if rows <= existing:
+            return
+
+        self.stdout.write(f'Seeding {rows - existing} sales...')
+        # Raw executemany: the ORM would spend longer building objects than inserting
+        sql = (
+            'INSERT INTO sales (sale_number, customer_id, customer_type, cashier_id, total_items, '
+            'subtotal_amount, discount_amount, discount_percentage, tax_amount, total_amount, amount_paid, '
+            'change_amount, payment_method, payment_reference, sale_status, notes, created_at) '
+            "VALUES (%s, %s, %s, %s, 1, '100.00', '0.00', '0.00', '0.00', '100.00', '100.00', '0.00', "
+            "%s, '', %s, '', %s)"
+        )
+        # Two years of sales; a third to walk-in customers, 2% cancelled
+        now = timezone.now()
+        span = timedelta(days=730).total_seconds()
+        methods = [choice for choice, _ in Sale.PAYMENT_METHOD_CHOICES]
+        adapt = connection.ops.adapt_datetimefield_value
+        for offset in range(existing, rows, batch_size):
+            batch = []
+            for index in range(offset, min(offset + batch_size, rows)):
+                customer = random.choice(customers) if random.random() > 0.33 else None
+                batch.append((
+                    f'{BENCH_PREFIX}{index:09d}',
+                    customer.id if customer else None,
+                    'registered' if customer else 'walk-in',
+                    random.choice(cashiers).id,
+                    random.choice(methods),
+                    'cancelled' if random.random() < 0.02 else 'completed',
+                    adapt(now - timedelta(seconds=random.random() * span)),
+                ))
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+
+    def _cleanup(self):
+        # Benchmark sales have no items or receipts to cascade to
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM sales WHERE sale_number LIKE %s', [f'{BENCH_PREFIX}%'])
+        Customer.objects.filter(customer_code__startswith=BENCH_PREFIX).delete()
+        User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_sale_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='sale_status',
+            field=models.CharField(choices=[('completed', 'Completed'), ('pending', 'Pending'), ('cancelled', 'Cancelled')], default='completed', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['cashier', 'created_at'], name='sales_cashier_d2bce2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['customer', 'created_at'], name='sales_custome_5e5639_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sale_status', 'created_at'], name='sales_sale_st_69b59b_idx'),
+        ),
+    ]
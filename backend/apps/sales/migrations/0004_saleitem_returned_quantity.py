@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:52
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def count_returned(apps, schema_editor):
+    SaleItem = apps.get_model('sales', 'SaleItem')
+    ReturnItem = apps.get_model('sales', 'ReturnItem')
+    returned = ReturnItem.objects.filter(
+        sale_item=OuterRef('pk'), return_record__return_status='completed'
+    ).order_by().values('sale_item').annotate(total=Sum('quantity_returned')).values('total')
+    SaleItem.objects.filter(return_items__isnull=False).update(
+        returned_quantity=Coalesce(Subquery(returned), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_sale_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='returned_quantity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_returned, migrations.RunPython.noop),
+    ]
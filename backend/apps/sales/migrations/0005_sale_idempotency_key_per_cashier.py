@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_saleitem_returned_quantity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='sale',
+            constraint=models.UniqueConstraint(fields=('cashier', 'idempotency_key'), name='unique_sale_idempotency_key'),
+        ),
+    ]
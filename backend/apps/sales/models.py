@@ -20,6 +20,7 @@ class Sale(models.Model):
     ]
     
     sale_number = models.CharField(max_length=100, unique=True, db_index=True)
+    idempotency_key = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     customer = models.ForeignKey('customers.Customer', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales')
     customer_type = models.CharField(max_length=50, default='walk-in')
     cashier = models.ForeignKey('users.User', on_delete=models.PROTECT, related_name='processed_sales')
@@ -33,13 +34,22 @@ class Sale(models.Model):
     change_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     payment_method = models.CharField(max_length=50, choices=PAYMENT_METHOD_CHOICES)
     payment_reference = models.CharField(max_length=255, blank=True)
-    sale_status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='completed', db_index=True)
+    sale_status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='completed')
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     class Meta:
         db_table = 'sales'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['cashier', 'created_at']),
+            models.Index(fields=['customer', 'created_at']),
+            models.Index(fields=['sale_status', 'created_at']),
+        ]
+        constraints = [
+            # Keys come from each till, so they are only unique per cashier
+            models.UniqueConstraint(fields=['cashier', 'idempotency_key'], name='unique_sale_idempotency_key'),
+        ]
     
     def __str__(self):
         return f"{self.sale_number}"
@@ -54,6 +64,7 @@ class SaleItem(models.Model):
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    returned_quantity = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -0,0 +1,6 @@
+from .serializers import SaleSerializer
+from backend.apps.administration.readers import ValuesReader
+
+
+class SaleReader(ValuesReader):
+    serializer_class = SaleSerializer
@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from rest_framework import serializers
+
+from .models import Sale, SaleItem, Receipt, SaleReturn, ReturnItem
+from backend.apps.customers.models import Customer
+
+
+class SaleItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SaleItem
+        fields = '__all__'
+        read_only_fields = ['created_at']
+
+
+class ReceiptSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Receipt
+        fields = '__all__'
+        read_only_fields = ['created_at']
+
+
+class SaleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Sale
+        fields = '__all__'
+        read_only_fields = ['sale_number', 'created_at']
+
+
+class ReturnItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReturnItem
+        fields = '__all__'
+        read_only_fields = ['created_at']
+
+
+class SaleReturnSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SaleReturn
+        fields = '__all__'
+        read_only_fields = ['return_number', 'created_at']
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product_variant = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+    discount_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0'), default=Decimal('0.00')
+    )
+
+
+class CheckoutSerializer(serializers.Serializer):
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+    customer = serializers.PrimaryKeyRelatedField(
+        queryset=Customer.objects.all(), required=False, allow_null=True
+    )
+    payment_method = serializers.ChoiceField(choices=Sale.PAYMENT_METHOD_CHOICES)
+    payment_reference = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    amount_paid = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+    discount_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0'), default=Decimal('0.00')
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class BatchSaleSerializer(CheckoutSerializer):
+    """One offline sale in a batch upload; customers are resolved for the whole batch"""
+    idempotency_key = serializers.CharField(max_length=100)
+    customer = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+
+
+class SaleBatchSerializer(serializers.Serializer):
+    sales = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+
+class ReturnLineSerializer(serializers.Serializer):
+    sale_item = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class ReturnSerializer(serializers.Serializer):
+    items = ReturnLineSerializer(many=True, allow_empty=False)
+    reason = serializers.CharField()
@@ -0,0 +1,641 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .models import Sale, SaleItem, Receipt, SaleReturn, ReturnItem
+from backend.apps.administration.audit import AuditSink, audit_sink, record_audit
+from backend.apps.administration.sequences import next_document_number, next_document_numbers
+from backend.apps.customers.models import Customer
+from backend.apps.inventory.models import Stock, StockMovement
+from backend.apps.products.models import ProductVariant
+from backend.apps.reports.summaries import record_return, record_sales
+
+
+CENT = Decimal('0.01')
+
+
+class CheckoutError(Exception):
+    """A checkout that cannot go through; nothing has been written"""
+
+    status_code = 400
+
+    def __init__(self, message, **detail):
+        super().__init__(message)
+        self.message = message
+        self.detail = detail
+
+
+class InsufficientStock(CheckoutError):
+    status_code = 409
+
+    def __init__(self, variant_ids):
+        super().__init__('Insufficient stock', product_variants=sorted(variant_ids))
+
+
+class IdempotencyKeyConflict(CheckoutError):
+    status_code = 409
+
+    def __init__(self):
+        super().__init__('Idempotency key already used by another cashier')
+
+
+class SaleStateError(CheckoutError):
+    """The sale is not in a state that allows the change"""
+
+    status_code = 409
+
+
+class ReturnError(CheckoutError):
+    """A return that cannot be processed; nothing has been written"""
+
+
+def _fullest_stock_row():
+    return Subquery(
+        Stock.objects.filter(product_variant=OuterRef('pk')).order_by('-quantity', 'id').values('id')[:1]
+    )
+
+
+def _variant_rows(variant_ids):
+    """Prices and the stock row each variant sells from (the fullest one), in one query"""
+    return {
+        row['id']: row for row in ProductVariant.objects.filter(id__in=variant_ids, is_active=True).annotate(
+            stock_id=_fullest_stock_row()
+        ).values('id', 'selling_price', 'purchase_price', 'stock_id')
+    }
+
+
+def _stock_rows(variant_ids):
+    """``variant -> stock row`` to restock into, whether or not the variant is still on sale"""
+    return dict(ProductVariant.objects.filter(id__in=variant_ids).annotate(
+        stock_id=_fullest_stock_row()
+    ).values_list('id', 'stock_id'))
+
+
+def _load_variants(variant_ids):
+    variants = _variant_rows(variant_ids)
+    missing = set(variant_ids) - set(variants)
+    if missing:
+        raise CheckoutError('Unknown or inactive product variants', product_variants=sorted(missing))
+
+    no_stock = [variant_id for variant_id, row in variants.items() if row['stock_id'] is None]
+    if no_stock:
+        raise InsufficientStock(no_stock)
+    return variants
+
+
+def _decrement_stock(variants, quantities, now):
+    """Take stock for every variant or raise; returns each stock row's new quantity.
+
+    Each decrement is a conditional UPDATE, so stock can never go negative
+    and no row is read before it is locked. Rows are updated in variant ID
+    order so concurrent checkouts lock them in the same order and cannot
+    deadlock.
+    """
+    short = []
+    for variant_id in sorted(quantities):
+        quantity = quantities[variant_id]
+        updated = Stock.objects.filter(id=variants[variant_id]['stock_id'], quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity, updated_at=now
+        )
+        if not updated:
+            short.append(variant_id)
+    if short:
+        raise InsufficientStock(short)
+
+    # The rows are locked by this transaction now, so these are our own results
+    return dict(Stock.objects.filter(
+        id__in=[variants[variant_id]['stock_id'] for variant_id in quantities]
+    ).values_list('product_variant_id', 'quantity'))
+
+
+def _quantities(items):
+    quantities = defaultdict(int)
+    for item in items:
+        quantities[item['product_variant']] += item['quantity']
+    return quantities
+
+
+def _price_sale(items, variants, discount_amount, amount_paid):
+    """Unsaved sale items and the sale totals, or ``CheckoutError``.
+
+    Returns ``(sale_items, subtotal, discount_amount, total, amount_paid)``.
+    """
+    sale_items = []
+    for item in items:
+        variant = variants[item['product_variant']]
+        gross = variant['selling_price'] * item['quantity']
+        line_discount = Decimal(item.get('discount_amount') or 0).quantize(CENT)
+        if line_discount > gross:
+            raise CheckoutError('Line discount exceeds the line total', product_variant=item['product_variant'])
+        sale_items.append(SaleItem(
+            product_variant_id=item['product_variant'],
+            quantity=item['quantity'],
+            unit_price=variant['selling_price'],
+            discount_amount=line_discount,
+            total_price=(gross - line_discount).quantize(CENT),
+            cost_price=variant['purchase_price'],
+        ))
+
+    subtotal = sum((line.total_price for line in sale_items), Decimal('0.00'))
+    discount_amount = Decimal(discount_amount).quantize(CENT)
+    if discount_amount > subtotal:
+        raise CheckoutError('Discount exceeds the subtotal')
+    total = subtotal - discount_amount
+    amount_paid = Decimal(amount_paid).quantize(CENT)
+    if amount_paid < total:
+        raise CheckoutError('Amount paid is less than the total', total_amount=str(total))
+    return sale_items, subtotal, discount_amount, total, amount_paid
+
+
+def _new_sale(sale_number, cashier, customer, total_items, subtotal, discount_amount, total, amount_paid,
+              payment_method, payment_reference, notes, idempotency_key=None):
+    return Sale(
+        sale_number=sale_number,
+        idempotency_key=idempotency_key,
+        customer=customer,
+        customer_type='registered' if customer else 'walk-in',
+        cashier=cashier,
+        total_items=total_items,
+        subtotal_amount=subtotal,
+        discount_amount=discount_amount,
+        discount_percentage=(discount_amount / subtotal * 100).quantize(CENT) if subtotal else Decimal('0.00'),
+        total_amount=total,
+        amount_paid=amount_paid,
+        change_amount=amount_paid - total,
+        payment_method=payment_method,
+        payment_reference=payment_reference,
+        sale_status='completed',
+        notes=notes,
+    )
+
+
+def _new_receipt(sale, receipt_number, cashier):
+    return Receipt(
+        sale=sale,
+        receipt_number=receipt_number,
+        amount_received=sale.amount_paid,
+        payment_method=sale.payment_method,
+        payment_reference=sale.payment_reference,
+        payment_date=timezone.localdate(),
+        received_by=cashier,
+    )
+
+
+def checkout(cashier, items, payment_method, amount_paid, customer=None, payment_reference='',
+             discount_amount=Decimal('0.00'), notes='', request=None):
+    """Record a completed till sale: the sale, its items, stock, movements and receipt.
+
+    ``items`` are dicts with ``product_variant`` (ID), ``quantity`` and an
+    optional line ``discount_amount``. Prices come from the variants, never
+    the client. Everything is written in one transaction; raises
+    ``CheckoutError`` (``InsufficientStock`` when a line cannot be filled)
+    with nothing written. Returns ``(sale, sale_items, receipt)``.
+    """
+    quantities = _quantities(items)
+
+    # Read before the transaction: its first statement is then a write, so
+    # SQLite takes the write lock up front instead of failing to upgrade
+    variants = _load_variants(list(quantities))
+
+    sale_items, subtotal, discount_amount, total, amount_paid = _price_sale(
+        items, variants, discount_amount, amount_paid
+    )
+
+    now = timezone.now()
+    with transaction.atomic():
+        new_quantities = _decrement_stock(variants, quantities, now)
+
+        sale = _new_sale(
+            next_document_number('sale'), cashier, customer, sum(quantities.values()), subtotal,
+            discount_amount, total, amount_paid, payment_method, payment_reference, notes
+        )
+        sale.save()
+
+        for line in sale_items:
+            line.sale = sale
+        sale_items = SaleItem.objects.bulk_create(sale_items)
+
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_variant_id=variant_id,
+                movement_type='sale',
+                quantity_change=-quantity,
+                previous_quantity=new_quantities[variant_id] + quantity,
+                new_quantity=new_quantities[variant_id],
+                reference_id=sale.id,
+                reference_type='sale',
+                moved_by=cashier,
+            )
+            for variant_id, quantity in sorted(quantities.items())
+        ])
+
+        receipt = _new_receipt(sale, next_document_number('receipt'), cashier)
+        receipt.save()
+        record_sales([sale], sale_items)
+
+        if customer:
+            Customer.objects.filter(id=customer.id).update(
+                total_spent=F('total_spent') + total, last_purchase_date=now
+            )
+
+    # Log audit
+    record_audit('create', 'sales', sale.id, user=cashier, new_values={
+        'sale_number': sale.sale_number,
+        'total_amount': str(total),
+        'payment_method': payment_method,
+        'items': len(sale_items),
+    }, request=request)
+
+    return sale, sale_items, receipt
+
+
+def _reject(result, exc):
+    result.update(
+        status='conflict' if exc.status_code == 409 else 'invalid',
+        error=exc.message,
+        **exc.detail
+    )
+
+
+def _take_batch_stock(variants, pending, now):
+    """Take the net stock of a batch; sales the stock cannot cover are left out.
+
+    ``pending`` is ``(position, quantities)`` per sale in upload order.
+    Returns ``(accepted, short, totals, new_quantities)`` where ``short``
+    maps the positions left out to the variants they were short of.
+    """
+    def net(sales):
+        totals = defaultdict(int)
+        for _, quantities in sales:
+            for variant_id, quantity in quantities.items():
+                totals[variant_id] += quantity
+        return totals
+
+    # Usual case: there is enough for everything, one UPDATE per variant
+    totals = net(pending)
+    try:
+        with transaction.atomic():
+            return pending, {}, totals, _decrement_stock(variants, totals, now)
+    except InsufficientStock:
+        pass
+
+    # Lock the rows in variant order, then accept sales in upload order
+    # while the stock still covers them
+    available = dict(Stock.objects.select_for_update().filter(
+        id__in=[variants[variant_id]['stock_id'] for variant_id in totals]
+    ).order_by('product_variant_id').values_list('product_variant_id', 'quantity'))
+    accepted, short = [], {}
+    for position, quantities in pending:
+        missing = [variant_id for variant_id, quantity in quantities.items() if quantity > available[variant_id]]
+        if missing:
+            short[position] = missing
+            continue
+        for variant_id, quantity in quantities.items():
+            available[variant_id] -= quantity
+        accepted.append((position, quantities))
+
+    totals = net(accepted)
+    return accepted, short, totals, _decrement_stock(variants, totals, now) if totals else {}
+
+
+def ingest_sales(cashier, sales, request=None):
+    """Record a batch of sales rung up offline by a till; safe to upload again.
+
+    ``sales`` are checkout payloads (see ``checkout``) with a ``customer``
+    ID and the till's ``idempotency_key``. Keys the cashier already recorded
+    come back as ``duplicate`` with their sale number, so a till can resend
+    a batch after a dropped connection; a key another cashier recorded comes
+    back as ``conflict`` without revealing that sale. Accepted sales are inserted in bulk and
+    stock is taken once per variant for the whole batch; sales the stock
+    cannot cover, in upload order, come back as ``conflict``. Returns one
+    result dict per sale, in order.
+    """
+    for attempt in range(2):
+        try:
+            return _ingest_sales(cashier, sales, request)
+        except IntegrityError:
+            # A concurrent upload recorded one of these keys first; on the
+            # retry it is reported as a duplicate
+            if attempt:
+                raise
+
+
+def _ingest_sales(cashier, sales, request):
+    results = [
+        {'idempotency_key': sale['idempotency_key'], 'status': None, 'sale_number': None}
+        for sale in sales
+    ]
+    first = {}
+    for position, sale in enumerate(sales):
+        first.setdefault(sale['idempotency_key'], position)
+
+    # Read before the transaction, as in checkout
+    recorded, foreign = {}, set()
+    for key, cashier_id, sale_number in Sale.objects.filter(idempotency_key__in=list(first)).values_list(
+        'idempotency_key', 'cashier_id', 'sale_number'
+    ):
+        if cashier_id == cashier.id:
+            recorded[key] = sale_number
+        else:
+            foreign.add(key)
+    for key in foreign - set(recorded):
+        _reject(results[first[key]], IdempotencyKeyConflict())
+    candidates = [
+        position for key, position in first.items() if key not in recorded and key not in foreign
+    ]
+    variants = _variant_rows({item['product_variant'] for position in candidates for item in sales[position]['items']})
+    customers = Customer.objects.in_bulk({sales[position]['customer'] for position in candidates} - {None})
+
+    priced, pending = {}, []
+    for position in candidates:
+        sale = sales[position]
+        quantities = _quantities(sale['items'])
+        try:
+            missing = set(quantities) - set(variants)
+            if missing:
+                raise CheckoutError('Unknown or inactive product variants', product_variants=sorted(missing))
+            if sale['customer'] is not None and sale['customer'] not in customers:
+                raise CheckoutError('Unknown customer', customer=sale['customer'])
+            no_stock = [variant_id for variant_id in quantities if variants[variant_id]['stock_id'] is None]
+            if no_stock:
+                raise InsufficientStock(no_stock)
+            priced[position] = _price_sale(sale['items'], variants, sale['discount_amount'], sale['amount_paid'])
+        except CheckoutError as exc:
+            _reject(results[position], exc)
+            continue
+        pending.append((position, quantities))
+
+    now = timezone.now()
+    created = []
+    with transaction.atomic():
+        accepted, short, totals, new_quantities = _take_batch_stock(variants, pending, now)
+        for position, variant_ids in short.items():
+            _reject(results[position], InsufficientStock(variant_ids))
+
+        if accepted:
+            sale_numbers = next_document_numbers('sale', len(accepted))
+            receipt_numbers = next_document_numbers('receipt', len(accepted))
+            created = Sale.objects.bulk_create([
+                _new_sale(
+                    sale_number, cashier, customers.get(sales[position]['customer']), sum(quantities.values()),
+                    *priced[position][1:], sales[position]['payment_method'], sales[position]['payment_reference'],
+                    sales[position]['notes'], idempotency_key=sales[position]['idempotency_key']
+                )
+                for sale_number, (position, quantities) in zip(sale_numbers, accepted)
+            ])
+
+            sale_items = []
+            for sale, (position, _) in zip(created, accepted):
+                for line in priced[position][0]:
+                    line.sale = sale
+                    sale_items.append(line)
+                results[position].update(status='created', sale_number=sale.sale_number)
+            SaleItem.objects.bulk_create(sale_items)
+            record_sales(created, sale_items)
+
+            Receipt.objects.bulk_create([
+                _new_receipt(sale, receipt_number, cashier) for sale, receipt_number in zip(created, receipt_numbers)
+            ])
+
+            # One movement per variant for the batch, naming its sales
+            reason = f"Batch upload: {', '.join(sale.sale_number for sale in created)}"
+            StockMovement.objects.bulk_create([
+                StockMovement(
+                    product_variant_id=variant_id,
+                    movement_type='sale',
+                    quantity_change=-quantity,
+                    previous_quantity=new_quantities[variant_id] + quantity,
+                    new_quantity=new_quantities[variant_id],
+                    reference_type='sale_batch',
+                    reason=reason,
+                    moved_by=cashier,
+                )
+                for variant_id, quantity in sorted(totals.items())
+            ])
+
+            spent = defaultdict(Decimal)
+            for sale in created:
+                if sale.customer_id:
+                    spent[sale.customer_id] += sale.total_amount
+            for customer_id, total in sorted(spent.items()):
+                Customer.objects.filter(id=customer_id).update(
+                    total_spent=F('total_spent') + total, last_purchase_date=now
+                )
+
+    for key, position in first.items():
+        if key in recorded:
+            results[position].update(status='duplicate', sale_number=recorded[key])
+    for position, sale in enumerate(sales):
+        original = results[first[sale['idempotency_key']]]
+        if position != first[sale['idempotency_key']]:
+            results[position].update(original, status='duplicate' if original['sale_number'] else original['status'])
+
+    # Log audit
+    audit_sink.record_many([
+        AuditSink.entry('create', 'sales', sale.id, user=cashier, new_values={
+            'sale_number': sale.sale_number,
+            'idempotency_key': sale.idempotency_key,
+            'total_amount': str(sale.total_amount),
+            'payment_method': sale.payment_method,
+        }, request=request)
+        for sale in created
+    ])
+
+    return results
+
+
+def _added(amounts):
+    """``id -> amount`` as a CASE, so one UPDATE can add a different amount to each row.
+
+    Rows are grouped by amount (returns are mostly one unit a line), which
+    keeps the CASE, and the ORM's work compiling it, small.
+    """
+    ids = defaultdict(list)
+    for row_id, amount in amounts.items():
+        ids[amount].append(row_id)
+    return Case(
+        *[When(id__in=row_ids, then=Value(amount)) for amount, row_ids in sorted(ids.items())],
+        output_field=IntegerField()
+    )
+
+
+def _restock(stock_ids, quantities, now):
+    """Put units back into each variant's stock row, in one UPDATE; returns the new quantities"""
+    additions = {}
+    for variant_id in sorted(quantities):
+        stock_id = stock_ids.get(variant_id)
+        if stock_id is None:
+            # The stock row is gone; start a new one
+            stock_id = Stock.objects.create(product_variant_id=variant_id, quantity=0).id
+        additions[stock_id] = quantities[variant_id]
+    Stock.objects.filter(id__in=list(additions)).update(quantity=F('quantity') + _added(additions), updated_at=now)
+    return dict(Stock.objects.filter(id__in=list(additions)).values_list('product_variant_id', 'quantity'))
+
+
+def cancel_sale(sale, user, reason='', request=None):
+    """Cancel a completed sale: its units go back to stock and it leaves the day's takings.
+
+    Sales with returns cannot be cancelled; raises ``SaleStateError`` for
+    those and for sales that are not completed. Returns the sale.
+    """
+    items = list(SaleItem.objects.filter(sale=sale))
+    quantities = _quantities([
+        {'product_variant': item.product_variant_id, 'quantity': item.quantity} for item in items
+    ])
+    # Read before the transaction, as in checkout
+    stock_ids = _stock_rows(list(quantities))
+
+    now = timezone.now()
+    with transaction.atomic():
+        # The status change is the guard: a concurrent cancel finds nothing to update
+        cancelled = Sale.objects.filter(id=sale.id, sale_status='completed').exclude(
+            Exists(SaleReturn.objects.filter(original_sale=OuterRef('pk')))
+        ).update(sale_status='cancelled')
+        if not cancelled:
+            raise SaleStateError('Only completed sales without returns can be cancelled')
+        sale.sale_status = 'cancelled'
+
+        new_quantities = _restock(stock_ids, quantities, now)
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_variant_id=variant_id,
+                movement_type='sale',
+                quantity_change=quantity,
+                previous_quantity=new_quantities[variant_id] - quantity,
+                new_quantity=new_quantities[variant_id],
+                reference_id=sale.id,
+                reference_type='sale_cancellation',
+                reason=reason,
+                moved_by=user,
+            )
+            for variant_id, quantity in sorted(quantities.items())
+        ])
+
+        if sale.customer_id:
+            Customer.objects.filter(id=sale.customer_id).update(total_spent=F('total_spent') - sale.total_amount)
+        record_sales([sale], items, sign=-1)
+
+    # Log audit
+    record_audit('update', 'sales', sale.id, user=user, old_values={
+        'sale_status': 'completed'
+    }, new_values={
+        'sale_status': 'cancelled',
+        'reason': reason,
+    }, request=request)
+
+    return sale
+
+
+def _load_returnable(sale, lines):
+    """The sale items being returned, with what is left to return on each, in one query"""
+    items = {
+        row['id']: row for row in SaleItem.objects.filter(
+            sale=sale, id__in=[line['sale_item'] for line in lines]
+        ).values('id', 'product_variant_id', 'quantity', 'returned_quantity', 'total_price', 'cost_price')
+    }
+    missing = {line['sale_item'] for line in lines} - set(items)
+    if missing:
+        raise ReturnError('Items are not part of this sale', sale_items=sorted(missing))
+
+    requested = defaultdict(int)
+    for line in lines:
+        requested[line['sale_item']] += line['quantity']
+    over = [
+        item_id for item_id, quantity in requested.items()
+        if quantity > items[item_id]['quantity'] - items[item_id]['returned_quantity']
+    ]
+    if over:
+        raise ReturnError('More units than were sold and not yet returned', sale_items=sorted(over))
+    return items, requested
+
+
+def process_return(sale, lines, reason, cashier, request=None):
+    """Take back units of a completed sale, refund them and restock them.
+
+    ``lines`` are dicts with ``sale_item`` (ID) and ``quantity``. Units go
+    back into ``Stock`` only: checkout never takes units out of a particular
+    ``ExpiryTracking`` batch, so none is credited either. Each sale item
+    keeps a ``returned_quantity`` counter, so
+    the whole return is validated with one read and claimed with one
+    guarded UPDATE; a concurrent return of the same units makes it fail.
+    Refunds are the lines' share of what was paid, after the sale
+    discount. Raises ``ReturnError`` (or ``SaleStateError``) with nothing
+    written. Returns ``(sale_return, return_items)``.
+    """
+    if sale.sale_status != 'completed':
+        raise SaleStateError('Only completed sales can take returns')
+
+    # Read before the transaction, as in checkout
+    items, requested = _load_returnable(sale, lines)
+    quantities = defaultdict(int)
+    for item_id, quantity in requested.items():
+        quantities[items[item_id]['product_variant_id']] += quantity
+    stock_ids = _stock_rows(list(quantities))
+
+    paid_share = sale.total_amount / sale.subtotal_amount if sale.subtotal_amount else Decimal('0')
+    return_items, cost = [], Decimal('0.00')
+    for line in lines:
+        item = items[line['sale_item']]
+        refund = item['total_price'] * line['quantity'] / item['quantity'] * paid_share
+        return_items.append(ReturnItem(
+            sale_item_id=item['id'], quantity_returned=line['quantity'], refund_amount=refund.quantize(CENT)
+        ))
+        cost += (item['cost_price'] or Decimal('0.00')) * line['quantity']
+    refund_total = sum((line.refund_amount for line in return_items), Decimal('0.00'))
+
+    now = timezone.now()
+    with transaction.atomic():
+        # One guarded UPDATE claims every line; it matches fewer rows if a
+        # concurrent return or cancellation got there first
+        claimed = _added(requested)
+        updated = SaleItem.objects.filter(
+            id__in=list(requested), sale__sale_status='completed', returned_quantity__lte=F('quantity') - claimed
+        ).update(returned_quantity=F('returned_quantity') + claimed)
+        if updated != len(requested):
+            raise ReturnError('The sale changed meanwhile; reload it')
+
+        sale_return = SaleReturn.objects.create(
+            original_sale=sale,
+            return_number=next_document_number('sale_return'),
+            cashier=cashier,
+            total_refund_amount=refund_total,
+            reason=reason,
+            return_status='completed',
+        )
+        for line in return_items:
+            line.return_record = sale_return
+        return_items = ReturnItem.objects.bulk_create(return_items)
+
+        new_quantities = _restock(stock_ids, quantities, now)
+
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_variant_id=variant_id,
+                movement_type='return',
+                quantity_change=quantity,
+                previous_quantity=new_quantities[variant_id] - quantity,
+                new_quantity=new_quantities[variant_id],
+                reference_id=sale_return.id,
+                reference_type='sale_return',
+                reason=reason,
+                moved_by=cashier,
+            )
+            for variant_id, quantity in sorted(quantities.items())
+        ])
+
+        if sale.customer_id:
+            Customer.objects.filter(id=sale.customer_id).update(total_spent=F('total_spent') - refund_total)
+        record_return(sale_return.created_at, sale.payment_method, refund_total, cost)
+
+    # Log audit
+    record_audit('create', 'sale_returns', sale_return.id, user=cashier, new_values={
+        'return_number': sale_return.return_number,
+        'sale_number': sale.sale_number,
+        'total_refund_amount': str(refund_total),
+        'items': len(return_items),
+    }, request=request)
+
+    return sale_return, return_items
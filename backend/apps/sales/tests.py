@@ -1,3 +1,489 @@
-from django.test import TestCase
+import threading
+from unittest import skipUnless
+from datetime import datetime
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend.apps.administration.sequences import sequence_allocator
+from backend.apps.customers.models import Customer
+from backend.apps.reports.models import DailySalesSummary
+from backend.apps.inventory.models import ExpiryTracking, Stock, StockMovement
+from backend.apps.products.models import Product, ProductVariant
+from backend.apps.users.models import User, Role
+from backend.apps.users.permissions import clear_compiled_permissions
+from backend.apps.users.views import JWTAuthentication
+from .models import Sale, SaleItem, Receipt, SaleReturn, ReturnItem
+from .serializers import SaleSerializer
+from .services import checkout, ingest_sales, process_return, InsufficientStock, ReturnError, SaleStateError
+
+
+def create_variant(barcode, price='100.00', stock=10):
+    product = Product.objects.create(
+        sku=f'SKU-{barcode}', name=f'Product {barcode}', manufacturer='Cosmos', unit_of_measure='tablet'
+    )
+    variant = ProductVariant.objects.create(
+        product=product, strength='500mg', pack_size='10', barcode=barcode,
+        purchase_price=Decimal(price) / 2, selling_price=Decimal(price), wholesale_price=Decimal(price),
+        min_stock_level=1, max_stock_level=100
+    )
+    Stock.objects.create(product_variant=variant, quantity=stock)
+    return variant
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        sequence_allocator.reset()
+        self.cashier = User.objects.create(
+            first_name='Cate', last_name='Cashier', email='cate@pharmerp.com',
+            role=Role.objects.create(name='Cashier', permissions={'sales': ['view', 'create']}), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.cashier)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.panadol = create_variant('1001', price='50.00', stock=10)
+        self.amoxil = create_variant('1002', price='120.00', stock=3)
+
+    def post(self, items, amount_paid='1000.00', **extra):
+        return self.client.post('/api/sales/checkout/', {
+            'items': items, 'payment_method': 'cash', 'amount_paid': amount_paid, **extra
+        }, format='json')
+
+    def test_checkout_writes_sale_items_stock_movements_and_receipt(self):
+        response = self.post([
+            {'product_variant': self.panadol.id, 'quantity': 2},
+            {'product_variant': self.amoxil.id, 'quantity': 1, 'discount_amount': '20.00'},
+            {'product_variant': self.panadol.id, 'quantity': 1},
+        ], amount_paid='300.00', discount_amount='5.00')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        sale = Sale.objects.get()
+        self.assertEqual(sale.subtotal_amount, Decimal('250.00'))
+        self.assertEqual(sale.total_amount, Decimal('245.00'))
+        self.assertEqual(sale.change_amount, Decimal('55.00'))
+        self.assertEqual(sale.total_items, 4)
+        self.assertEqual(SaleItem.objects.filter(sale=sale).count(), 3)
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 7)
+        self.assertEqual(Stock.objects.get(product_variant=self.amoxil).quantity, 2)
+
+        movement = StockMovement.objects.get(product_variant=self.panadol)
+        self.assertEqual((movement.previous_quantity, movement.quantity_change, movement.new_quantity), (10, -3, 7))
+        self.assertEqual(movement.reference_id, sale.id)
+        self.assertEqual(Receipt.objects.get(sale=sale).amount_received, Decimal('300.00'))
+        self.assertEqual(response.data['receipt']['receipt_number'], Receipt.objects.get().receipt_number)
+
+    def test_lines_are_bulk_inserted(self):
+        more = [create_variant(str(2000 + i)) for i in range(5)]
+        checkout(self.cashier, [{'product_variant': self.panadol.id, 'quantity': 1}], 'cash', Decimal('100'))
+
+        with CaptureQueriesContext(connection) as queries:
+            checkout(self.cashier, [
+                {'product_variant': variant.id, 'quantity': 1} for variant in more
+            ], 'cash', Decimal('1000'))
+
+        statements = [q['sql'] for q in queries.captured_queries]
+        self.assertEqual(sum(sql.startswith('INSERT INTO "sale_items"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('INSERT INTO "inventory_stockmovement"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('UPDATE "inventory_stock"') for sql in statements), 5)
+
+    def test_insufficient_stock_writes_nothing(self):
+        response = self.post([
+            {'product_variant': self.panadol.id, 'quantity': 2},
+            {'product_variant': self.amoxil.id, 'quantity': 4},
+        ])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['product_variants'], [self.amoxil.id])
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 10)
+
+    def test_rejects_underpayment_and_unknown_variants(self):
+        response = self.post([{'product_variant': self.amoxil.id, 'quantity': 1}], amount_paid='100.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['total_amount'], '120.00')
+
+        response = self.post([{'product_variant': 999999, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_variants'], [999999])
+
+        self.assertEqual(Stock.objects.get(product_variant=self.amoxil).quantity, 3)
+
+    def test_requires_sales_create_permission(self):
+        self.cashier.role.permissions = {'sales': ['view']}
+        self.cashier.role.save()
+
+        response = self.post([{'product_variant': self.panadol.id, 'quantity': 1}])
+
+        self.assertEqual(response.status_code, 403)
+
+
+class BatchUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        sequence_allocator.reset()
+        self.cashier = User.objects.create(
+            first_name='Cate', last_name='Cashier', email='cate@pharmerp.com',
+            role=Role.objects.create(name='Cashier', permissions={'sales': ['view', 'create']}), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.cashier)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.panadol = create_variant('1001', price='50.00', stock=10)
+        self.amoxil = create_variant('1002', price='120.00', stock=3)
+
+    def sale(self, key, *lines, amount_paid='1000.00'):
+        return {
+            'idempotency_key': key,
+            'items': [{'product_variant': variant.id, 'quantity': quantity} for variant, quantity in lines],
+            'payment_method': 'cash',
+            'amount_paid': amount_paid,
+        }
+
+    def upload(self, *sales):
+        return self.client.post('/api/sales/batch/', {'sales': list(sales)}, format='json')
+
+    def test_upload_is_idempotent(self):
+        batch = [
+            self.sale('till-1:1', (self.panadol, 2), (self.amoxil, 1)),
+            self.sale('till-1:2', (self.panadol, 3)),
+        ]
+
+        response = self.upload(*batch)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['created'], 2)
+        numbers = [result['sale_number'] for result in response.data['results']]
+        self.assertEqual(
+            numbers, list(Sale.objects.order_by('id').values_list('sale_number', flat=True))
+        )
+        self.assertEqual(Receipt.objects.count(), 2)
+        self.assertEqual(SaleItem.objects.count(), 3)
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 5)
+        movement = StockMovement.objects.get(product_variant=self.panadol)
+        self.assertEqual((movement.previous_quantity, movement.quantity_change, movement.new_quantity), (10, -5, 5))
+
+        response = self.upload(*batch, self.sale('till-1:3', (self.panadol, 1)))
+
+        statuses = [(result['status'], result['sale_number']) for result in response.data['results']]
+        self.assertEqual(statuses[:2], [('duplicate', numbers[0]), ('duplicate', numbers[1])])
+        self.assertEqual(statuses[2][0], 'created')
+        self.assertEqual(Sale.objects.count(), 3)
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 4)
+
+    def test_keys_are_scoped_to_the_cashier(self):
+        first = self.upload(self.sale('till:1', (self.panadol, 1))).data['results'][0]
+
+        other = User.objects.create(
+            first_name='Otto', last_name='Other', email='otto@pharmerp.com', role=self.cashier.role, password_hash='x'
+        )
+        token = JWTAuthentication.generate_tokens(other)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        results = self.upload(self.sale('till:1', (self.panadol, 2)), self.sale('till:1', (self.panadol, 2)))
+
+        statuses = [(result['status'], result['sale_number']) for result in results.data['results']]
+        self.assertEqual(statuses, [('conflict', None), ('conflict', None)])
+        self.assertNotIn(first['sale_number'], str(results.data))
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 9)
+
+        # The same key from two cashiers is not a constraint violation
+        sale = Sale.objects.get()
+        sale.pk, sale.sale_number, sale.cashier = None, 'S-OTHER', other
+        sale.save()
+
+    def test_reports_conflicts_and_invalid_sales_per_sale(self):
+        response = self.upload(
+            self.sale('a', (self.amoxil, 2)),
+            self.sale('b', (self.amoxil, 2), (self.panadol, 1)),
+            self.sale('c', (self.amoxil, 1), (self.panadol, 1)),
+            self.sale('a', (self.amoxil, 2)),
+            self.sale('d', (self.panadol, 1), amount_paid='10.00'),
+            {'idempotency_key': 'e', 'items': []},
+        )
+
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [
+            'created', 'conflict', 'created', 'duplicate', 'invalid', 'invalid'
+        ])
+        self.assertEqual(results[1]['product_variants'], [self.amoxil.id])
+        self.assertEqual(results[3]['sale_number'], results[0]['sale_number'])
+        self.assertEqual(results[4]['total_amount'], '50.00')
+        self.assertIn('items', results[5]['errors'])
+        self.assertEqual(
+            response.data['summary'], {'created': 2, 'duplicate': 1, 'conflict': 1, 'invalid': 2}
+        )
+        self.assertEqual(Stock.objects.get(product_variant=self.amoxil).quantity, 0)
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 9)
+
+    def test_batch_is_written_in_bulk(self):
+        sales = [self.sale('till-2:0', (self.panadol, 1), (self.amoxil, 1))]
+        sales += [self.sale(f'till-2:{n}', (self.panadol, 1)) for n in range(1, 8)]
+
+        with CaptureQueriesContext(connection) as queries:
+            results = ingest_sales(self.cashier, [
+                {**sale, 'customer': None, 'payment_reference': '', 'notes': '', 'discount_amount': Decimal('0')}
+                for sale in sales
+            ])
+
+        self.assertEqual({result['status'] for result in results}, {'created'})
+        statements = [q['sql'] for q in queries.captured_queries]
+        for table in ('sales', 'sale_items', 'receipts', 'inventory_stockmovement'):
+            self.assertEqual(sum(sql.startswith(f'INSERT INTO "{table}"') for sql in statements), 1, table)
+        self.assertEqual(sum(sql.startswith('UPDATE "inventory_stock"') for sql in statements), 2)
+
+    def test_rejects_oversized_batches(self):
+        with self.settings(SALES_BATCH_MAX_SIZE=1):
+            response = self.upload(self.sale('a', (self.panadol, 1)), self.sale('b', (self.panadol, 1)))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Sale.objects.exists())
+
+
+class SaleHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        role = Role.objects.create(name='Cashier', permissions={'sales': ['view']})
+        self.cate = User.objects.create(
+            first_name='Cate', last_name='Cashier', email='cate@pharmerp.com', role=role, password_hash='x'
+        )
+        self.tom = User.objects.create(
+            first_name='Tom', last_name='Till', email='tom@pharmerp.com', role=role, password_hash='x'
+        )
+        self.customer = Customer.objects.create(first_name='Paul', last_name='Patient', phone='0700000001')
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.cate)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        # Two sales a day from 1 to 10 March, local time; ties on created_at at noon
+        tz = timezone.get_default_timezone()
+        for day in range(1, 11):
+            for n, cashier in enumerate((self.cate, self.tom)):
+                sale = Sale.objects.create(
+                    sale_number=f'S-2026-{day:03d}{n}', cashier=cashier,
+                    customer=self.customer if day % 2 else None,
+                    subtotal_amount=Decimal('10.00'), total_amount=Decimal('10.00'), amount_paid=Decimal('10.00'),
+                    payment_method='cash' if n else 'mpesa', sale_status='cancelled' if day == 5 else 'completed'
+                )
+                Sale.objects.filter(id=sale.id).update(
+                    created_at=timezone.make_aware(datetime(2026, 3, day, 12), tz)
+                )
+
+    def numbers(self, response):
+        return [sale['sale_number'] for sale in response.data['results']]
+
+    def test_cursor_pages_cover_every_sale_once(self):
+        seen = []
+        url = '/api/sales/history/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += self.numbers(response)
+            url = response.data['next']
+
+        expected = list(Sale.objects.order_by('-created_at', '-id').values_list('sale_number', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_filters(self):
+        def numbers(**params):
+            return self.numbers(self.client.get('/api/sales/history/', params))
+
+        self.assertEqual(len(numbers(cashier=self.tom.id)), 10)
+        self.assertEqual(len(numbers(customer=self.customer.id)), 10)
+        self.assertEqual(numbers(status='cancelled'), ['S-2026-0051', 'S-2026-0050'])
+        self.assertEqual(numbers(payment_method='cash', start_date='2026-03-09'), ['S-2026-0101', 'S-2026-0091'])
+        self.assertEqual(len(numbers(start_date='2026-03-02', end_date='2026-03-03')), 4)
+        self.assertEqual(numbers(sale_number='S-2026-0070'), ['S-2026-0070'])
+        self.assertEqual(self.client.get('/api/sales/history/', {'cashier': 'tom'}).status_code, 400)
+
+    def test_list_matches_serializer(self):
+        response = self.client.get('/api/sales/history/')
+
+        expected = SaleSerializer(Sale.objects.order_by('-created_at', '-id')[:50], many=True).data
+        self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan text is SQLite specific')
+    def test_filtered_pages_use_composite_indexes(self):
+        plan = Sale.objects.filter(cashier=self.tom).order_by('-created_at', '-id')[:51].explain()
+
+        self.assertIn('sales_cashier_d2bce2_idx', plan)
+
+
+class ReturnTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        sequence_allocator.reset()
+        self.cashier = User.objects.create(
+            first_name='Cate', last_name='Cashier', email='cate@pharmerp.com',
+            role=Role.objects.create(name='Cashier', permissions={'sales': ['view', 'create']}), password_hash='x'
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.cashier)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.panadol = create_variant('1001', price='50.00', stock=10)
+        self.amoxil = create_variant('1002', price='120.00', stock=10)
+        self.batch = ExpiryTracking.objects.create(
+            product_variant=self.panadol, batch_number='PN-24', expiry_date='2027-06-30', quantity=4, status='active'
+        )
+        # 4 x 50 + 2 x 120 = 440, less a 44.00 sale discount: 90% of each line is refunded
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sale, items, _ = checkout(self.cashier, [
+                {'product_variant': self.panadol.id, 'quantity': 4},
+                {'product_variant': self.amoxil.id, 'quantity': 2},
+            ], 'cash', Decimal('396.00'), discount_amount=Decimal('44.00'))
+        self.panadol_line, self.amoxil_line = items
+
+    def post(self, items, reason='Damaged packs'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f'/api/sales/history/{self.sale.id}/returns/', {'items': items, 'reason': reason}, format='json'
+            )
+
+    def test_return_refunds_counts_and_restocks(self):
+        response = self.post([
+            {'sale_item': self.panadol_line.id, 'quantity': 2},
+            {'sale_item': self.amoxil_line.id, 'quantity': 1},
+        ])
+
+        self.assertEqual(response.status_code, 201, response.data)
+        sale_return = SaleReturn.objects.get()
+        self.assertEqual(sale_return.total_refund_amount, Decimal('198.00'))
+        self.assertEqual(response.data['return']['return_number'], sale_return.return_number)
+        self.assertEqual(
+            sorted(ReturnItem.objects.values_list('refund_amount', flat=True)),
+            [Decimal('90.00'), Decimal('108.00')]
+        )
+        self.assertEqual(
+            dict(SaleItem.objects.values_list('id', 'returned_quantity')),
+            {self.panadol_line.id: 2, self.amoxil_line.id: 1}
+        )
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 8)
+        self.assertEqual(Stock.objects.get(product_variant=self.amoxil).quantity, 9)
+        # Checkout took nothing out of the batch, so the return puts nothing back
+        self.assertEqual(ExpiryTracking.objects.get().quantity, 4)
+
+        movement = StockMovement.objects.get(movement_type='return', product_variant=self.panadol)
+        self.assertEqual((movement.previous_quantity, movement.quantity_change, movement.new_quantity), (6, 2, 8))
+        self.assertEqual(movement.reference_id, sale_return.id)
+
+        summary = DailySalesSummary.objects.get()
+        self.assertEqual(summary.total_sales, Decimal('198.00'))
+        # Cost of the units still out: 2 x 25 + 1 x 60
+        self.assertEqual(summary.total_cost, Decimal('110.00'))
+
+    def test_deactivated_variants_restock_into_their_existing_row(self):
+        ProductVariant.objects.filter(id=self.panadol.id).update(is_active=False)
+
+        self.assertEqual(self.post([{'sale_item': self.panadol_line.id, 'quantity': 1}]).status_code, 201)
+        self.assertEqual(self.post([{'sale_item': self.panadol_line.id, 'quantity': 1}]).status_code, 201)
+
+        stock = Stock.objects.filter(product_variant=self.panadol)
+        self.assertEqual(list(stock.values_list('quantity', flat=True)), [8])
+
+    def test_cannot_return_more_than_is_left(self):
+        self.assertEqual(self.post([{'sale_item': self.panadol_line.id, 'quantity': 3}]).status_code, 201)
+
+        response = self.post([
+            {'sale_item': self.panadol_line.id, 'quantity': 1},
+            {'sale_item': self.panadol_line.id, 'quantity': 1},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['sale_items'], [self.panadol_line.id])
+        self.assertEqual(self.post([{'sale_item': self.panadol_line.id, 'quantity': 1}]).status_code, 201)
+        self.assertEqual(SaleItem.objects.get(id=self.panadol_line.id).returned_quantity, 4)
+
+    def test_rejects_items_from_other_sales(self):
+        other, _, _ = checkout(
+            self.cashier, [{'product_variant': self.amoxil.id, 'quantity': 1}], 'cash', Decimal('120')
+        )
+        other_line = SaleItem.objects.get(sale=other)
+
+        response = self.post([{'sale_item': other_line.id, 'quantity': 1}])
+        self.assertEqual((response.status_code, response.data['sale_items']), (400, [other_line.id]))
+
+        self.assertFalse(SaleReturn.objects.exists())
+        self.assertEqual(Stock.objects.get(product_variant=self.panadol).quantity, 6)
+
+    def test_validation_and_claim_do_not_grow_with_lines(self):
+        variants = [create_variant(str(4000 + i)) for i in range(20)]
+        sale, items, _ = checkout(self.cashier, [
+            {'product_variant': variant.id, 'quantity': 2} for variant in variants
+        ], 'cash', Decimal('10000'))
+
+        with CaptureQueriesContext(connection) as queries:
+            process_return(sale, [{'sale_item': item.id, 'quantity': 1} for item in items], 'Recall', self.cashier)
+
+        statements = [q['sql'] for q in queries.captured_queries]
+        self.assertEqual(sum(sql.startswith('SELECT') and 'FROM "sale_items"' in sql for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('UPDATE "sale_items"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('INSERT INTO "return_items"') for sql in statements), 1)
+
+    def test_returned_sales_cannot_be_cancelled_and_cancelled_ones_take_no_returns(self):
+        self.post([{'sale_item': self.amoxil_line.id, 'quantity': 1}])
+        self.cashier.role.permissions = {'sales': ['view', 'create', 'edit']}
+        self.cashier.role.save()
+
+        self.assertEqual(self.client.post(f'/api/sales/history/{self.sale.id}/cancel/').status_code, 409)
+
+        # Cancelled after this copy of the sale was read: the claim finds nothing
+        Sale.objects.filter(id=self.sale.id).update(sale_status='cancelled')
+        with self.assertRaises(ReturnError):
+            process_return(self.sale, [{'sale_item': self.amoxil_line.id, 'quantity': 1}], 'Late', self.cashier)
+        self.assertEqual(SaleReturn.objects.count(), 1)
+
+        self.sale.sale_status = 'cancelled'
+        with self.assertRaises(SaleStateError):
+            process_return(self.sale, [{'sale_item': self.amoxil_line.id, 'quantity': 1}], 'Late', self.cashier)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CheckoutConcurrencyTests(TransactionTestCase):
+    """Concurrent tills never oversell. Needs real row locking (PostgreSQL)."""
+
+    tills = 8
+    per_till = 10
+
+    def test_stock_never_goes_negative(self):
+        sequence_allocator.reset()
+        cashier = User.objects.create(first_name='C', last_name='C', email='c@pharmerp.com', password_hash='x')
+        variants = [create_variant(str(3000 + i), stock=30) for i in range(3)]
+        sold, refused, errors = [], [], []
+
+        def till(offset):
+            try:
+                for n in range(self.per_till):
+                    # Alternate line order; the service sorts before locking
+                    lines = variants[(offset + n) % 3:] + variants[:(offset + n) % 3]
+                    try:
+                        checkout(cashier, [{'product_variant': v.id, 'quantity': 1} for v in lines],
+                                 'cash', Decimal('1000'))
+                        sold.append(1)
+                    except InsufficientStock:
+                        refused.append(1)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=till, args=(i,)) for i in range(self.tills)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(sold), 30)
+        self.assertEqual(len(refused), self.tills * self.per_till - 30)
+        self.assertEqual(set(Stock.objects.values_list('quantity', flat=True)), {0})
@@ -0,0 +1,14 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
+
+
+router = DefaultRouter()
+router.register(r'history', views.SaleViewSet, basename='sales')
+
+
+urlpatterns = [
+    path('checkout/', views.checkout, name='sales-checkout'),
+    path('batch/', views.upload_batch, name='sales-batch'),
+    path('', include(router.urls)),
+]
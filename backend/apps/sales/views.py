@@ -1,3 +1,152 @@
-from django.shortcuts import render
+from django.conf import settings
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
-# Create your views here.
+from .serializers import (
+    BatchSaleSerializer, CheckoutSerializer, SaleBatchSerializer, SaleSerializer, SaleItemSerializer,
+    ReceiptSerializer, ReturnSerializer, SaleReturnSerializer, ReturnItemSerializer
+)
+from .models import Sale
+from .readers import SaleReader
+from .services import cancel_sale, checkout as checkout_sale, ingest_sales, process_return, CheckoutError
+from backend.apps.administration.pagination import KeysetPagination, local_date_bounds
+from backend.apps.users.permissions import HasModulePermission
+
+
+class SaleViewSet(viewsets.ReadOnlyModelViewSet):
+    """Sales history, newest first, in cursor pages"""
+    queryset = Sale.objects.all()
+    serializer_class = SaleSerializer
+    permission_classes = [HasModulePermission('sales', 'view')]
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        queryset = Sale.objects.all()
+        params = self.request.query_params
+        
+        # Equality filters; each pairs with created_at in a composite index
+        for param, lookup in (('cashier', 'cashier_id'), ('customer', 'customer_id')):
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{lookup: int(params[param])})
+                except ValueError:
+                    raise ValidationError({'error': f'{param} must be an ID'})
+        if params.get('status'):
+            queryset = queryset.filter(sale_status=params['status'])
+        if params.get('payment_method'):
+            queryset = queryset.filter(payment_method=params['payment_method'])
+        if params.get('sale_number'):
+            queryset = queryset.filter(sale_number=params['sale_number'])
+        
+        # Filter by date range, as half-open local-day bounds on the bare column
+        start, end = local_date_bounds(params.get('start_date'), params.get('end_date'))
+        if start:
+            queryset = queryset.filter(created_at__gte=start)
+        if end:
+            queryset = queryset.filter(created_at__lt=end)
+        
+        return queryset.order_by('-created_at', '-id')
+    
+    def list(self, request):
+        """One page of sales from a single values() query"""
+        reader = SaleReader()
+        rows = self.paginator.paginate_queryset(self.get_queryset().values(*reader.lookups), request, view=self)
+        return self.paginator.get_paginated_response(reader.represent(rows))
+    
+    @action(detail=True, methods=['post'], permission_classes=[HasModulePermission('sales', 'edit')])
+    def cancel(self, request, pk=None):
+        """Cancel a completed sale and put its items back into stock"""
+        try:
+            sale = cancel_sale(self.get_object(), request.user, reason=request.data.get('reason', ''), request=request)
+        except CheckoutError as exc:
+            return Response({
+                'error': exc.message,
+                **exc.detail
+            }, status=exc.status_code)
+        
+        return Response(SaleSerializer(sale).data)
+    
+    @action(detail=True, methods=['post'], permission_classes=[HasModulePermission('sales', 'create')])
+    def returns(self, request, pk=None):
+        """Take back items of a sale, refund them and put them back into stock"""
+        serializer = ReturnSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            sale_return, items = process_return(
+                self.get_object(), serializer.validated_data['items'], serializer.validated_data['reason'],
+                request.user, request=request
+            )
+        except CheckoutError as exc:
+            return Response({
+                'error': exc.message,
+                **exc.detail
+            }, status=exc.status_code)
+        
+        return Response({
+            'return': SaleReturnSerializer(sale_return).data,
+            'items': ReturnItemSerializer(items, many=True).data
+        }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([HasModulePermission('sales', 'create')])
+def checkout(request):
+    """Complete a till sale in one transaction"""
+    serializer = CheckoutSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    try:
+        sale, items, receipt = checkout_sale(request.user, request=request, **serializer.validated_data)
+    except CheckoutError as exc:
+        return Response({
+            'error': exc.message,
+            **exc.detail
+        }, status=exc.status_code)
+    
+    return Response({
+        'sale': SaleSerializer(sale).data,
+        'items': SaleItemSerializer(items, many=True).data,
+        'receipt': ReceiptSerializer(receipt).data
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([HasModulePermission('sales', 'create')])
+def upload_batch(request):
+    """Record sales rung up offline; each sale carries the till's idempotency key"""
+    serializer = SaleBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    entries = serializer.validated_data['sales']
+    if len(entries) > settings.SALES_BATCH_MAX_SIZE:
+        return Response({
+            'error': f'A batch holds at most {settings.SALES_BATCH_MAX_SIZE} sales'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Invalid sales are reported alongside the rest instead of failing the batch
+    results = [None] * len(entries)
+    valid = []
+    for position, entry in enumerate(entries):
+        sale = BatchSaleSerializer(data=entry)
+        if sale.is_valid():
+            valid.append((position, sale.validated_data))
+        else:
+            results[position] = {
+                'idempotency_key': entry.get('idempotency_key'),
+                'status': 'invalid',
+                'sale_number': None,
+                'errors': sale.errors
+            }
+    
+    if valid:
+        ingested = ingest_sales(request.user, [data for _, data in valid], request=request)
+        for (position, _), result in zip(valid, ingested):
+            results[position] = result
+    
+    summary = {outcome: 0 for outcome in ('created', 'duplicate', 'conflict', 'invalid')}
+    for result in results:
+        summary[result['status']] += 1
+    
+    return Response({'summary': summary, 'results': results})
@@ -1,8 +1,8 @@
-import os
 import jwt
-from datetime import datetime, timedelta
 from rest_framework import authentication, exceptions
 from .models import User
+from .principals import decode_token, get_principal, token_id_for
+from .revocation import revocation_filter
 
 class JWTAuthentication(authentication.BaseAuthentication):
     """Custom JWT authentication for DRF"""
@@ -12,17 +12,19 @@ class JWTAuthentication(authentication.BaseAuthentication):
             return None
 
         token = auth_header.split(' ')[1]
-        secret_key = os.getenv('SECRET_KEY')
 
         try:
-            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+            payload = decode_token(token)
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed('Token has expired')
         except jwt.InvalidTokenError:
             raise exceptions.AuthenticationFailed('Invalid token')
 
+        if revocation_filter.is_revoked(token_id_for(token, payload)):
+            raise exceptions.AuthenticationFailed('Token has been revoked')
+
         try:
-            user = User.objects.get(id=payload['user_id'], is_active=True)
+            user = get_principal(payload['user_id'])
         except User.DoesNotExist:
             raise exceptions.AuthenticationFailed('User not found')
 
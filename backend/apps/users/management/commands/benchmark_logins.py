@@ -0,0 +1,83 @@
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from backend.apps.administration.audit import audit_sink
+from backend.apps.administration.models import AuditLog, AuditLogRollup
+from backend.apps.users.models import User
+from backend.apps.users.views import login
+
+
+EMAIL_DOMAIN = 'bench.pharmerp.local'
+
+
+class Command(BaseCommand):
+    help = 'Seed a user table and report login throughput (logins/sec) and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Number of users to seed')
+        parser.add_argument('--logins', type=int, default=500, help='Total logins to perform')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent login threads')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded users afterwards')
+
+    def handle(self, *args, **options):
+        password = 'bench-password'
+        self._seed(options['users'], password)
+
+        factory = APIRequestFactory()
+        emails = [self._email(i) for i in range(options['users'])]
+
+        def timed_login(index):
+            request = factory.post('/api/users/auth/login/', {
+                'email': emails[index % len(emails)],
+                'password': password,
+            }, format='json', REMOTE_ADDR='127.0.0.1')
+            started = time.perf_counter()
+            response = login(request)
+            elapsed = time.perf_counter() - started
+            connection.close()
+            return elapsed, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(timed_login, range(options['logins'])))
+        wall_time = time.perf_counter() - started
+        audit_sink.flush(timeout=30)
+
+        latencies = sorted(elapsed for elapsed, _ in results)
+        failures = sum(1 for _, code in results if code != 200)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+        self.stdout.write(f"Logins:       {len(results)} ({failures} failed)")
+        self.stdout.write(f"Concurrency:  {options['concurrency']}")
+        self.stdout.write(f"Logins/sec:   {len(results) / wall_time:.1f}")
+        self.stdout.write(f"p50 latency:  {statistics.median(latencies) * 1000:.1f} ms")
+        self.stdout.write(f"p99 latency:  {p99 * 1000:.1f} ms")
+
+        if not options['keep']:
+            self._cleanup()
+
+    def _email(self, index):
+        return f'bench-{index}@{EMAIL_DOMAIN}'
+
+    def _seed(self, count, password):
+        self._cleanup()
+        password_hash = make_password(password)
+        User.objects.bulk_create([
+            User(
+                first_name='Bench', last_name=str(i), email=self._email(i),
+                password_hash=password_hash
+            ) for i in range(count)
+        ], batch_size=500)
+
+    def _cleanup(self):
+        users = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+        AuditLog.objects.filter(user__in=users).delete()
+        # Deleting the users would otherwise fold their rollups into the system rows
+        AuditLogRollup.objects.filter(user__in=users).delete()
+        users.delete()
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.apps.users.models import UserSession, RevokedToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired user sessions and token revocations in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        for model in (UserSession, RevokedToken):
+            deleted = self._purge(model, now, options['chunk_size'])
+            self.stdout.write(f'{model._meta.db_table}: deleted {deleted} expired rows')
+
+    def _purge(self, model, now, chunk_size):
+        # Short per-chunk deletes keep locks brief on a live table
+        deleted = 0
+        while True:
+            ids = list(
+                model.objects.filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if not ids:
+                return deleted
+            deleted += model.objects.filter(id__in=ids).delete()[0]
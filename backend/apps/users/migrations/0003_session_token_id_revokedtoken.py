@@ -0,0 +1,54 @@
+import hashlib
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def hash_session_tokens(apps, schema_editor):
+    UserSession = apps.get_model('users', 'UserSession')
+    for session in UserSession.objects.only('id', 'session_token').iterator():
+        session.token_id = hashlib.sha256(session.session_token.encode()).hexdigest()
+        session.save(update_fields=['token_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_permissions_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='token_id',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(hash_session_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usersession',
+            name='token_id',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.RemoveField(
+            model_name='usersession',
+            name='session_token',
+        ),
+        migrations.AlterField(
+            model_name='usersession',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_id', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('revoked_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'revoked_tokens',
+                'ordering': ['-revoked_at'],
+            },
+        ),
+    ]
@@ -25,6 +25,7 @@ class User(models.Model):
     password_hash = models.CharField(max_length=255)
     profile_image_url = models.URLField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    permissions_version = models.PositiveIntegerField(default=0)
     last_login = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -59,10 +60,10 @@ class UserPermission(models.Model):
 
 class UserSession(models.Model):
     user = models.ForeignKey('User', on_delete=models.CASCADE, related_name="user_sessions")
-    session_token = models.CharField(max_length=255, unique=True)
+    token_id = models.CharField(max_length=64, unique=True)
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField()
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
@@ -70,4 +71,16 @@ class UserSession(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"Session for {self.user.email} - {self.created_at}"
\ No newline at end of file
+        return f"Session for {self.user.email} - {self.created_at}"
+
+class RevokedToken(models.Model):
+    token_id = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = "revoked_tokens"
+        ordering = ["-revoked_at"]
+
+    def __str__(self):
+        return f"Revoked {self.token_id}"
\ No newline at end of file
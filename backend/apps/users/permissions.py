@@ -0,0 +1,183 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.permissions import IsAuthenticated
+
+from .models import UserPermission
+
+
+# Roles with unrestricted access to every module
+FULL_ACCESS_ROLES = ('Admin', 'Manager', 'Pharmacist')
+
+ACTIONS = ('view', 'create', 'edit', 'delete')
+MODULES = [
+    'company', 'products', 'inventory', 'suppliers', 'customers',
+    'sales', 'finance', 'reports', 'users', 'administration',
+]
+
+_action_index = {action: index for index, action in enumerate(ACTIONS)}
+_module_index = {module: index for index, module in enumerate(MODULES)}
+_module_lock = threading.Lock()
+
+
+class CompiledPermissions:
+    """Per-user permission bitset, four bits (view/create/edit/delete) per module"""
+
+    __slots__ = ('stamp', 'bits', 'full_access')
+
+    def __init__(self, stamp, bits, full_access=False):
+        self.stamp = stamp
+        self.bits = bits
+        self.full_access = full_access
+
+    def allows(self, module, action):
+        """Unknown modules and actions are denied, never indexed"""
+        action_index = _action_index.get(action)
+        if action_index is None:
+            return False
+        if self.full_access:
+            return True
+        index = _module_index.get(module)
+        if index is None:
+            return False
+        return bool(self.bits >> (index * len(ACTIONS) + action_index) & 1)
+
+
+class CompiledPermissionsCache:
+    """Bounded LRU of compiled permissions keyed by user ID"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            compiled = self._entries.get(user_id)
+            if compiled is not None:
+                self._entries.move_to_end(user_id)
+            return compiled
+
+    def set(self, user_id, compiled):
+        with self._lock:
+            self._entries[user_id] = compiled
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_compiled = CompiledPermissionsCache(getattr(settings, 'COMPILED_PERMISSIONS_CACHE_SIZE', 4096))
+
+
+def _bit(module, action):
+    # Modules granted in role JSON but missing from MODULES get an index at compile time
+    index = _module_index.get(module)
+    if index is None:
+        with _module_lock:
+            index = _module_index.setdefault(module, len(_module_index))
+    return 1 << (index * len(ACTIONS) + _action_index[action])
+
+
+def _module_bits(module, grants):
+    """Bits for one module from a Role.permissions entry.
+
+    Accepts a list of actions (``["view", "create"]``), a dict of flags
+    (``{"can_view": true}`` or ``{"view": true}``) or ``true`` for all actions.
+    """
+    if grants is True:
+        actions = ACTIONS
+    elif isinstance(grants, dict):
+        actions = [
+            action for action in ACTIONS
+            if grants.get(action) or grants.get(f'can_{action}')
+        ]
+    elif isinstance(grants, (list, tuple)):
+        actions = [action for action in grants if action in ACTIONS]
+    else:
+        actions = []
+
+    bits = 0
+    for action in actions:
+        bits |= _bit(module, action)
+    return bits
+
+
+def compile_permissions(user):
+    """Compile Role.permissions and UserPermission rows into a bitset"""
+    stamp = (user.permissions_version, user.role_id)
+    role = user.role
+
+    if role and role.name in FULL_ACCESS_ROLES:
+        return CompiledPermissions(stamp, 0, full_access=True)
+
+    module_bits = {}
+    role_permissions = role.permissions if role and isinstance(role.permissions, dict) else {}
+    if role_permissions.get('*') is True:
+        return CompiledPermissions(stamp, 0, full_access=True)
+    for module, grants in role_permissions.items():
+        module_bits[module] = _module_bits(module, grants)
+
+    # Per-user rows override the role's grants for their module
+    rows = UserPermission.objects.filter(user_id=user.id).values_list(
+        'module', 'can_view', 'can_create', 'can_edit', 'can_delete'
+    )
+    for module, *flags in rows:
+        module_bits[module] = _module_bits(
+            module, [action for action, flag in zip(ACTIONS, flags) if flag]
+        )
+
+    bits = 0
+    for value in module_bits.values():
+        bits |= value
+    return CompiledPermissions(stamp, bits)
+
+
+def get_permissions(user):
+    """Return the user's compiled permissions, recompiling only on a stamp change"""
+    compiled = _compiled.get(user.id)
+    if compiled is None or compiled.stamp != (user.permissions_version, user.role_id):
+        compiled = compile_permissions(user)
+        _compiled.set(user.id, compiled)
+    return compiled
+
+
+def clear_compiled_permissions():
+    _compiled.clear()
+
+
+def has_module_permission(user, module, action='view'):
+    return bool(user) and get_permissions(user).allows(module, action)
+
+
+def has_full_access(user):
+    return bool(user) and get_permissions(user).full_access
+
+
+class HasModulePermission(IsAuthenticated):
+    """DRF permission for a module/action pair.
+
+    Used as an instance, e.g. ``permission_classes = [HasModulePermission('sales', 'create')]``.
+    """
+
+    def __init__(self, module, action='view'):
+        if action not in ACTIONS:
+            raise ValueError(f'Unknown permission action: {action}')
+        self.module = module
+        self.action = action
+
+    def __call__(self):
+        # DRF instantiates permission_classes; an instance stands in for its class
+        return self
+
+    def has_permission(self, request, view):
+        if not super().has_permission(request, view):
+            return False
+        return has_module_permission(request.user, self.module, self.action)
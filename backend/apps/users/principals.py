@@ -0,0 +1,101 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+
+
+PRINCIPAL_CACHE_PREFIX = 'principal:'
+
+
+class ClaimsCache:
+    """Bounded LRU of decoded JWT claims keyed by token hash"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                return None
+
+            # Claims are only trusted until the token's own expiry
+            exp = payload.get('exp')
+            if exp is not None and exp <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload):
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+claims_cache = ClaimsCache(getattr(settings, 'JWT_CLAIMS_CACHE_SIZE', 4096))
+
+
+def token_hash(token):
+    """Stable hash used to key anything derived from a raw token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_token(token):
+    """Decode a JWT, reusing previously verified claims when possible.
+
+    Raises the same ``jwt`` exceptions as ``jwt.decode``.
+    """
+    key = token_hash(token)
+    payload = claims_cache.get(key)
+    if payload is not None:
+        return payload
+
+    secret_key = os.getenv('SECRET_KEY')
+    payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+    claims_cache.set(key, payload)
+    return payload
+
+
+def token_id_for(token, payload=None):
+    """Short identifier for a token: its ``jti`` claim, or its hash for older tokens"""
+    if payload is None:
+        payload = decode_token(token)
+    return payload.get('jti') or token_hash(token)
+
+
+def get_principal(user_id):
+    """Return the active user (with role) for ``user_id``.
+
+    Served from the cache when warm; raises ``User.DoesNotExist`` when the
+    user is missing or inactive.
+    """
+    key = f'{PRINCIPAL_CACHE_PREFIX}{user_id}'
+    user = cache.get(key)
+    if user is not None:
+        return user
+
+    user = User.objects.select_related('role').get(id=user_id, is_active=True)
+    cache.set(key, user, getattr(settings, 'PRINCIPAL_CACHE_TTL', 60))
+    return user
+
+
+def invalidate_principal(*user_ids):
+    """Drop cached principals so the next request reloads them"""
+    cache.delete_many([f'{PRINCIPAL_CACHE_PREFIX}{user_id}' for user_id in user_ids])
@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from .models import UserPermission
+from .serializers import UserSerializer, UserPermissionSerializer, UserSessionSerializer
+from backend.apps.administration.readers import ValuesReader
+
+
+class UserPermissionReader(ValuesReader):
+    serializer_class = UserPermissionSerializer
+
+
+class UserReader(ValuesReader):
+    """Users with role name and permissions: one query for users, one for all their permissions"""
+    serializer_class = UserSerializer
+
+    def prefetch(self, rows):
+        self.permissions = defaultdict(list)
+        permissions = UserPermission.objects.filter(
+            user_id__in=[row['id'] for row in rows]
+        ).order_by('user', 'module')
+        for permission in UserPermissionReader().serialize(permissions):
+            self.permissions[permission['user']].append(permission)
+
+    def get_full_name(self, row):
+        return f"{row['first_name']} {row['last_name']}"
+
+    def get_permissions(self, row):
+        return self.permissions[row['id']]
+
+
+class UserSessionReader(ValuesReader):
+    serializer_class = UserSessionSerializer
+    extra_lookups = ('user__first_name', 'user__last_name')
+
+    def get_user_name(self, row):
+        return f"{row['user__first_name']} {row['user__last_name']}"
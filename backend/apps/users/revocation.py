@@ -0,0 +1,70 @@
+import time
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RevokedToken
+
+
+class RevocationFilter:
+    """In-memory set of revoked token IDs.
+
+    Loaded once per process, then refreshed incrementally at most every
+    ``TOKEN_REVOCATION_REFRESH_INTERVAL`` seconds, so checking a token costs
+    no query on the request path. Each refresh re-reads rows revoked within
+    the interval plus ``TOKEN_REVOCATION_REFRESH_MARGIN`` seconds before the
+    previous refresh: a row can commit after a later one, or carry a
+    timestamp from a server whose clock lags, and still be picked up. Only
+    unexpired revocations are kept, which keeps the set small enough that an
+    exact set is preferable to a probabilistic filter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._watermark = None
+        self._next_refresh = 0
+
+    def is_revoked(self, token_id):
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        return token_id in self._revoked
+
+    def refresh(self):
+        with self._lock:
+            now = timezone.now()
+            queryset = RevokedToken.objects.filter(expires_at__gt=now)
+            interval = getattr(settings, 'TOKEN_REVOCATION_REFRESH_INTERVAL', 5)
+            if self._watermark is not None:
+                lookback = timedelta(seconds=interval + getattr(settings, 'TOKEN_REVOCATION_REFRESH_MARGIN', 60))
+                queryset = queryset.filter(revoked_at__gte=self._watermark - lookback)
+
+            for token_id, expires_at in queryset.values_list('token_id', 'expires_at').iterator():
+                self._revoked[token_id] = expires_at
+            self._watermark = now
+
+            for token_id in [key for key, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[token_id]
+
+            self._next_refresh = time.monotonic() + interval
+
+    def revoke(self, token_id, expires_at):
+        """Persist a revocation and apply it to this process immediately"""
+        RevokedToken.objects.get_or_create(token_id=token_id, defaults={'expires_at': expires_at})
+        with self._lock:
+            self._revoked[token_id] = expires_at
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._watermark = None
+            self._next_refresh = 0
+
+
+revocation_filter = RevocationFilter()
+
+
+def expiry_from_claims(payload):
+    return datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc)
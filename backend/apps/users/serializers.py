@@ -50,10 +50,42 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop('password')
-        validated_data['password_hash'] = make_password(password)
+        if 'password_hash' not in validated_data:
+            validated_data['password_hash'] = make_password(password)
         return User.objects.create(**validated_data)
 
 
+class UserImportSerializer(UserCreateSerializer):
+    """Row validation for bulk import.
+    
+    Roles are resolved by ID or name from ``context['roles']`` and uniqueness
+    is checked per batch by the importer, so validating a row runs no queries.
+    """
+    role = serializers.CharField(required=False, allow_null=True)
+    permissions = serializers.ListField(child=serializers.DictField(), required=False)
+    
+    class Meta(UserCreateSerializer.Meta):
+        fields = UserCreateSerializer.Meta.fields + ['permissions']
+        extra_kwargs = {
+            'email': {'validators': []},
+            'employee_id': {'validators': []},
+        }
+    
+    def validate_role(self, value):
+        if value in (None, ''):
+            return None
+        role = self.context['roles'].get(str(value).lower())
+        if role is None:
+            raise serializers.ValidationError(f'Unknown role "{value}".')
+        return role
+    
+    def validate_permissions(self, value):
+        for perm in value:
+            if not perm.get('module'):
+                raise serializers.ValidationError('Each permission needs a module.')
+        return value
+
+
 class PasswordChangeSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True, write_only=True)
     new_password = serializers.CharField(required=True, write_only=True, min_length=8)
@@ -0,0 +1,226 @@
+import io
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F
+
+from .models import User, Role, UserPermission
+from .principals import invalidate_principal
+from .serializers import UserImportSerializer
+from backend.apps.administration.outbox import enqueue_emails
+from backend.apps.administration.sequences import advance_document_sequence, next_document_numbers
+from backend.apps.administration.search import search_index
+
+
+PERMISSION_FLAGS = ('can_view', 'can_create', 'can_edit', 'can_delete')
+
+
+def _flags(perm):
+    return {flag: bool(perm.get(flag, False)) for flag in PERMISSION_FLAGS}
+
+
+def sync_user_permissions(users_permissions):
+    """Diff desired permissions against existing rows and apply only the changes.
+
+    ``users_permissions`` maps user ID to a list of ``{'module', 'can_*'}``
+    dicts. Modules missing from a user's list are removed. Returns
+    ``{user_id: {'created': [...], 'updated': [...], 'deleted': [...]}}``
+    for users whose permissions changed.
+    """
+    existing = {}
+    for perm in UserPermission.objects.filter(user_id__in=list(users_permissions)):
+        existing.setdefault(perm.user_id, {})[perm.module] = perm
+
+    to_create, to_update, to_delete = [], [], []
+    changes = {}
+    for user_id, permissions in users_permissions.items():
+        current = existing.get(user_id, {})
+        desired = {perm['module']: _flags(perm) for perm in permissions}
+        change = {'created': [], 'updated': [], 'deleted': []}
+
+        for module, flags in desired.items():
+            row = current.get(module)
+            if row is None:
+                to_create.append(UserPermission(user_id=user_id, module=module, **flags))
+                change['created'].append(module)
+            elif any(getattr(row, flag) != value for flag, value in flags.items()):
+                for flag, value in flags.items():
+                    setattr(row, flag, value)
+                to_update.append(row)
+                change['updated'].append(module)
+
+        for module, row in current.items():
+            if module not in desired:
+                to_delete.append(row.id)
+                change['deleted'].append(module)
+
+        if any(change.values()):
+            changes[user_id] = change
+
+    if to_create:
+        UserPermission.objects.bulk_create(to_create)
+    if to_update:
+        UserPermission.objects.bulk_update(to_update, PERMISSION_FLAGS)
+    if to_delete:
+        UserPermission.objects.filter(id__in=to_delete).delete()
+
+    if changes:
+        # Force a recompile of the affected permission matrices
+        User.objects.filter(id__in=list(changes)).update(
+            permissions_version=F('permissions_version') + 1
+        )
+        invalidate_principal(*changes)
+    return changes
+
+
+def _parse_row(row, file_format):
+    if file_format == 'ndjson':
+        return json.loads(row)
+    row = {key: value for key, value in row.items() if value not in (None, '')}
+    if 'permissions' in row:
+        row['permissions'] = json.loads(row['permissions'])
+    return row
+
+
+def iter_import_rows(upload, file_format):
+    """Yield row dicts from an uploaded CSV or NDJSON file without loading it whole.
+
+    A row that cannot be parsed is yielded as the ``ValueError`` describing
+    it, so the importer reports it against its line and carries on; bytes
+    that are not UTF-8 end the file there.
+    """
+    stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    rows = csv.DictReader(stream) if file_format == 'csv' else (line for line in stream if line.strip())
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except UnicodeDecodeError as e:
+            yield e
+            return
+        except csv.Error as e:
+            yield ValueError(str(e))
+            continue
+        try:
+            yield _parse_row(row, file_format)
+        except ValueError as e:
+            yield e
+
+
+def welcome_email(user):
+    """``(recipient_email, subject, body)`` of the email a new account gets"""
+    return (user.email, 'Welcome to PharmERP', f"""
+            Hello {user.first_name},
+            
+            Your account has been created successfully.
+            
+            Employee ID: {user.employee_id}
+            Email: {user.email}
+            Role: {user.role.name if user.role else 'Not assigned'}
+            
+            Please change your password after first login.
+            
+            Best regards,
+            PharmERP Team
+            """)
+
+
+class UserImporter:
+    """Validates and inserts users in batches, queueing each a welcome email"""
+
+    def __init__(self, batch_size=200, hash_workers=4, sender=None):
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers
+        self.sender = sender
+        self.created = []
+        self.errors = []
+        self.roles = {}
+        for role in Role.objects.all():
+            self.roles[str(role.id)] = role
+            self.roles[role.name.lower()] = role
+
+    def run(self, rows):
+        batch = []
+        for line_number, row in enumerate(rows, start=1):
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return self
+
+    def _import_batch(self, batch):
+        valid = []
+        for line_number, row in batch:
+            if isinstance(row, ValueError):
+                error = f'Could not parse row: {row}'
+                self.errors.append({'row': line_number, 'errors': {'non_field_errors': [error]}})
+                continue
+            serializer = UserImportSerializer(data=row, context={'roles': self.roles})
+            if serializer.is_valid():
+                valid.append((line_number, serializer.validated_data))
+            else:
+                self.errors.append({'row': line_number, 'errors': serializer.errors})
+
+        valid = self._drop_duplicates(valid)
+        if not valid:
+            return
+
+        # PBKDF2 releases the GIL, so hashing a batch parallelizes across threads
+        with ThreadPoolExecutor(max_workers=self.hash_workers) as pool:
+            hashes = list(pool.map(make_password, [data['password'] for _, data in valid]))
+
+        with transaction.atomic():
+            advance_document_sequence('employee', [data['employee_id'] for _, data in valid if data.get('employee_id')])
+            missing_ids = sum(1 for _, data in valid if not data.get('employee_id'))
+            employee_ids = iter(next_document_numbers('employee', missing_ids) if missing_ids else [])
+
+            users = []
+            for (_, data), password_hash in zip(valid, hashes):
+                users.append(User(
+                    employee_id=data.get('employee_id') or next(employee_ids),
+                    first_name=data['first_name'],
+                    last_name=data['last_name'],
+                    email=data['email'],
+                    phone=data.get('phone'),
+                    role=data.get('role'),
+                    profile_image_url=data.get('profile_image_url'),
+                    password_hash=password_hash,
+                ))
+            users = User.objects.bulk_create(users)
+            # bulk_create skips post_save, which indexes single saves
+            search_index.index_objects('users', users)
+
+            sync_user_permissions({
+                user.id: data['permissions']
+                for user, (_, data) in zip(users, valid) if data.get('permissions')
+            })
+            enqueue_emails([welcome_email(user) for user in users], sender=self.sender, email_type='welcome')
+
+        self.created.extend(users)
+
+    def _drop_duplicates(self, valid):
+        """Reject rows whose email or employee ID is already taken, in one query each"""
+        emails = [data['email'] for _, data in valid]
+        employee_ids = [data['employee_id'] for _, data in valid if data.get('employee_id')]
+        taken_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        taken_ids = set(User.objects.filter(employee_id__in=employee_ids).values_list('employee_id', flat=True))
+
+        accepted = []
+        for line_number, data in valid:
+            if data['email'] in taken_emails:
+                self.errors.append({'row': line_number, 'errors': {'email': ['user with this email already exists.']}})
+            elif data.get('employee_id') and data['employee_id'] in taken_ids:
+                self.errors.append({'row': line_number, 'errors': {'employee_id': ['user with this employee id already exists.']}})
+            else:
+                # Later duplicates within the file are rejected too
+                taken_emails.add(data['email'])
+                if data.get('employee_id'):
+                    taken_ids.add(data['employee_id'])
+                accepted.append((line_number, data))
+        return accepted
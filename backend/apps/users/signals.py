@@ -0,0 +1,31 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import User, Role, UserPermission
+from .principals import invalidate_principal
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_principal(sender, instance, **kwargs):
+    invalidate_principal(instance.id)
+
+
+@receiver(post_save, sender=Role)
+@receiver(pre_delete, sender=Role)
+def invalidate_role_principals(sender, instance, **kwargs):
+    # Cached principals carry their role, so every holder must reload
+    users = User.objects.filter(role=instance)
+    user_ids = list(users.values_list('id', flat=True))
+    if user_ids:
+        users.update(permissions_version=F('permissions_version') + 1)
+        invalidate_principal(*user_ids)
+
+
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def recompile_user_permissions(sender, instance, **kwargs):
+    # Compiled matrices are keyed on the version, so bumping it drops them
+    User.objects.filter(id=instance.user_id).update(permissions_version=F('permissions_version') + 1)
+    invalidate_principal(instance.user_id)
@@ -1,3 +1,484 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend.apps.administration.models import AuditLog, EmailMessage
+from .models import User, Role, UserPermission, UserSession, RevokedToken
+from .permissions import (
+    CompiledPermissionsCache, HasModulePermission, clear_compiled_permissions, get_permissions,
+    has_module_permission
+)
+from .readers import UserReader, UserSessionReader
+from .serializers import UserSerializer, UserSessionSerializer
+from .principals import claims_cache, decode_token, get_principal, token_id_for
+from .revocation import revocation_filter, expiry_from_claims
+from .views import JWTAuthentication
+
+
+class PrincipalCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        claims_cache.clear()
+        self.role = Role.objects.create(name='Admin')
+        self.user = User.objects.create(
+            first_name='Jane', last_name='Doe', email='jane@pharmerp.com',
+            role=self.role, password_hash=make_password('secret123')
+        )
+        self.token = JWTAuthentication.generate_tokens(self.user)['access_token']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_warm_cache_resolves_user_without_queries(self):
+        self.client.get('/api/users/users/profile/')
+
+        # Only the nested permissions of the profile itself hit the database
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/users/profile/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'jane@pharmerp.com')
+
+    def test_deactivation_invalidates_cached_principal(self):
+        self.client.get('/api/users/users/profile/')
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/api/users/users/profile/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_password_change_does_not_write_back_a_stale_principal(self):
+        self.client.get('/api/users/users/profile/')
+        # Another process changes the role without touching this process's cache
+        other_role = Role.objects.create(name='Cashier')
+        User.objects.filter(id=self.user.id).update(role=other_role)
+
+        response = self.client.post('/api/users/auth/password-change/', {
+            'old_password': 'secret123', 'new_password': 'newsecret123'
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(id=self.user.id)
+        self.assertEqual(user.role_id, other_role.id)
+        self.assertTrue(check_password('newsecret123', user.password_hash))
+
+    def test_role_rename_is_visible_to_cached_principal(self):
+        self.client.get('/api/users/users/profile/')
+
+        self.role.name = 'Manager'
+        self.role.save()
+
+        response = self.client.get('/api/users/users/profile/')
+        self.assertEqual(response.data['role_name'], 'Manager')
+
+
+class ModulePermissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.role = Role.objects.create(name='Cashier', permissions={'sales': ['view', 'create']})
+        self.user = User.objects.create(
+            first_name='Sam', last_name='Till', email='sam@pharmerp.com',
+            role=self.role, password_hash=make_password('secret123')
+        )
+
+    def test_role_grants_are_compiled(self):
+        user = get_principal(self.user.id)
+        self.assertTrue(has_module_permission(user, 'sales', 'create'))
+        self.assertFalse(has_module_permission(user, 'sales', 'delete'))
+        self.assertFalse(has_module_permission(user, 'suppliers', 'view'))
+
+    def test_warm_check_runs_no_queries(self):
+        user = get_principal(self.user.id)
+        get_permissions(user)
+
+        permission = HasModulePermission('sales', 'create')
+        request = type('Request', (), {'user': user})()
+        with self.assertNumQueries(0):
+            self.assertTrue(permission().has_permission(request, None))
+
+    def test_unknown_modules_and_actions_are_denied(self):
+        user = get_principal(self.user.id)
+        self.assertFalse(has_module_permission(user, 'sales', 'update'))
+        self.assertFalse(has_module_permission(user, 'no_such_module', 'view'))
+
+        admin = User(id=self.user.id, role=Role(name='Admin'), permissions_version=1)
+        self.assertFalse(has_module_permission(admin, 'sales', 'update'))
+
+    def test_compiled_cache_is_bounded(self):
+        cache_ = CompiledPermissionsCache(max_size=2)
+        for user_id in range(3):
+            cache_.set(user_id, get_permissions(self.user))
+        self.assertIsNone(cache_.get(0))
+        self.assertEqual(len(cache_), 2)
+
+    def test_user_permission_rows_override_role_after_version_bump(self):
+        admin_role = Role.objects.create(name='Admin')
+        admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=admin_role, password_hash=make_password('secret123')
+        )
+        token = JWTAuthentication.generate_tokens(admin)['access_token']
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.assertTrue(has_module_permission(get_principal(self.user.id), 'sales', 'create'))
+
+        client.post('/api/users/permissions/update_user_permissions/', {
+            'user_id': self.user.id,
+            'permissions': [{'module': 'sales', 'can_view': True}],
+        }, format='json')
+
+        user = get_principal(self.user.id)
+        self.assertEqual(UserPermission.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(has_module_permission(user, 'sales', 'view'))
+        self.assertFalse(has_module_permission(user, 'sales', 'create'))
+
+    def test_revoking_a_grant_takes_effect_immediately(self):
+        Role.objects.filter(id=self.role.id).update(permissions={})
+        grant = UserPermission.objects.create(user=self.user, module='sales', can_view=True)
+        cashier = APIClient()
+        cashier.credentials(HTTP_AUTHORIZATION=f"Bearer {JWTAuthentication.generate_tokens(self.user)['access_token']}")
+        self.assertEqual(cashier.get('/api/sales/history/').status_code, 200)
+
+        admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x'
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {JWTAuthentication.generate_tokens(admin)['access_token']}")
+        self.assertEqual(client.delete(f'/api/users/permissions/{grant.id}/').status_code, 204)
+
+        self.assertEqual(cashier.get('/api/sales/history/').status_code, 403)
+
+    def test_role_edit_recompiles_matrix(self):
+        self.assertFalse(has_module_permission(get_principal(self.user.id), 'inventory', 'view'))
+
+        self.role.permissions = {'inventory': {'can_view': True}}
+        self.role.save()
+
+        self.assertTrue(has_module_permission(get_principal(self.user.id), 'inventory', 'view'))
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.role = Role.objects.create(name='Cashier')
+        self.user = User.objects.create(
+            first_name='Sam', last_name='Till', email='sam@pharmerp.com',
+            role=self.role, password_hash=make_password('secret123')
+        )
+        UserPermission.objects.create(user=self.user, module='sales', can_view=True, can_create=True)
+
+    def test_login_returns_permissions_and_records_session(self):
+        client = APIClient()
+        response = client.post('/api/users/auth/login/', {
+            'email': 'sam@pharmerp.com', 'password': 'secret123'
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['role'], 'Cashier')
+        self.assertEqual(response.data['user']['permissions'], [{
+            'module': 'sales', 'can_view': True, 'can_create': True,
+            'can_edit': False, 'can_delete': False
+        }])
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertEqual(self.user.user_sessions.count(), 1)
+
+    def test_login_query_budget(self):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            client.post('/api/users/auth/login/', {
+                'email': 'sam@pharmerp.com', 'password': 'secret123'
+            }, format='json')
+
+        # user+role, permissions, last_login update, session insert, audit insert
+        # (audit rollups are the audit writer's cost, not the login's)
+        statements = [
+            q['sql'] for q in queries.captured_queries
+            if 'SAVEPOINT' not in q['sql'] and 'audit_log_rollups' not in q['sql']
+        ]
+        self.assertEqual(len(statements), 5)
+
+    def test_async_login_rejects_bad_password(self):
+        response = self.client.post(
+            '/api/users/auth/login/async/',
+            data='{"email": "sam@pharmerp.com", "password": "wrong-pass"}',
+            content_type='application/json', SERVER_NAME='localhost'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class SessionRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        revocation_filter.clear()
+        self.user = User.objects.create(
+            first_name='Sam', last_name='Till', email='sam@pharmerp.com',
+            password_hash=make_password('secret123')
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/users/auth/login/', {
+            'email': 'sam@pharmerp.com', 'password': 'secret123'
+        }, format='json')
+        self.token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_session_is_keyed_by_jti(self):
+        session = UserSession.objects.get(user=self.user)
+        self.assertEqual(session.token_id, token_id_for(self.token))
+        self.assertLessEqual(len(session.token_id), 64)
+
+    def test_logged_out_token_is_rejected_without_query(self):
+        self.assertEqual(self.client.get('/api/users/users/profile/').status_code, 200)
+        self.client.post('/api/users/auth/logout/')
+
+        self.assertFalse(UserSession.objects.filter(user=self.user).exists())
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/users/profile/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_revocations_from_other_processes_are_picked_up_on_refresh(self):
+        payload = decode_token(self.token)
+        RevokedToken.objects.create(token_id=payload['jti'], expires_at=expiry_from_claims(payload))
+
+        revocation_filter.refresh()
+        self.assertEqual(self.client.get('/api/users/users/profile/').status_code, 403)
+
+    def test_late_committed_revocations_older_than_the_last_refresh_are_picked_up(self):
+        revocation_filter.refresh()
+        payload = decode_token(self.token)
+        # Committed after the refresh, but stamped earlier (a slow transaction or a lagging clock)
+        RevokedToken.objects.create(
+            token_id=payload['jti'], expires_at=expiry_from_claims(payload),
+            revoked_at=timezone.now() - timedelta(seconds=30)
+        )
+
+        revocation_filter.refresh()
+        self.assertTrue(revocation_filter.is_revoked(payload['jti']))
+
+    def test_purge_expired_sessions_command(self):
+        UserSession.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        call_command('purge_expired_sessions', chunk_size=1, stdout=StringIO())
+        self.assertFalse(UserSession.objects.exists())
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin_role = Role.objects.create(name='Admin')
+        Role.objects.create(name='Cashier')
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            employee_id='EMP-00001', role=self.admin_role, password_hash=make_password('secret123')
+        )
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def _upload(self, name, content):
+        return self.client.post('/api/users/users/bulk_import/', {
+            'file': SimpleUploadedFile(name, content.encode())
+        }, format='multipart')
+
+    def test_ndjson_import_creates_users_permissions_and_one_audit_entry(self):
+        rows = [
+            {'first_name': 'Till', 'last_name': str(i), 'email': f'till{i}@pharmerp.com',
+             'password': 'password123', 'role': 'cashier',
+             'permissions': [{'module': 'sales', 'can_view': True, 'can_create': True}]}
+            for i in range(3)
+        ]
+        rows.append({'first_name': 'Dup', 'last_name': 'Row', 'email': 'ann@pharmerp.com', 'password': 'password123'})
+        response = self._upload('staff.ndjson', '\n'.join(json.dumps(row) for row in rows))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+        imported = User.objects.filter(email__startswith='till').order_by('employee_id')
+        self.assertEqual([user.employee_id for user in imported], ['EMP-00002', 'EMP-00003', 'EMP-00004'])
+        self.assertEqual(UserPermission.objects.filter(user__in=imported, module='sales').count(), 3)
+        self.assertEqual(AuditLog.objects.filter(action='bulk_import').count(), 1)
+
+    def test_csv_import(self):
+        content = 'first_name,last_name,email,password,role\nMary,Jones,mary@pharmerp.com,password123,Cashier\n'
+        response = self._upload('staff.csv', content)
+
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(User.objects.get(email='mary@pharmerp.com').role.name, 'Cashier')
+
+    def test_imported_users_are_queued_welcome_emails(self):
+        content = 'first_name,last_name,email,password,role\n' + ''.join(
+            f'Till,{i},till{i}@pharmerp.com,password123,Cashier\n' for i in range(3)
+        )
+        self._upload('staff.csv', content)
+
+        emails = EmailMessage.objects.filter(email_type='welcome').order_by('recipient_email')
+        self.assertEqual([email.recipient_email for email in emails], [f'till{i}@pharmerp.com' for i in range(3)])
+        self.assertTrue(all(email.sender_id == self.admin.id and email.status == 'queued' for email in emails))
+        self.assertIn('Role: Cashier', emails[0].body)
+
+    def test_unparseable_rows_are_row_errors_and_the_import_is_still_audited(self):
+        rows = [
+            json.dumps({'first_name': 'Till', 'last_name': '1', 'email': 'till1@pharmerp.com',
+                        'password': 'password123'}),
+            '{"first_name": "Broken"',
+            json.dumps({'first_name': 'No', 'last_name': 'Module', 'email': 'nomod@pharmerp.com',
+                        'password': 'password123', 'permissions': [{'can_view': True}]}),
+            json.dumps({'first_name': 'Till', 'last_name': '2', 'email': 'till2@pharmerp.com',
+                        'password': 'password123'}),
+        ]
+        response = self._upload('staff.ndjson', '\n'.join(rows))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertIn('Could not parse row', response.data['errors'][0]['errors']['non_field_errors'][0])
+        self.assertIn('permissions', response.data['errors'][1]['errors'])
+        audit = AuditLog.objects.get(action='bulk_import')
+        self.assertEqual((audit.new_values['created'], audit.new_values['failed']), (2, 2))
+
+    def test_csv_row_with_bad_permissions_json_is_a_row_error(self):
+        content = (
+            'first_name,last_name,email,password,permissions\n'
+            'Mary,Jones,mary@pharmerp.com,password123,not-json\n'
+            'Tom,Smith,tom@pharmerp.com,password123,\n'
+        )
+        response = self._upload('staff.csv', content)
+
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+        self.assertTrue(User.objects.filter(email='tom@pharmerp.com').exists())
+
+    def test_manual_employee_ids_move_the_counter(self):
+        def create(email, **extra):
+            return self.client.post('/api/users/users/', {
+                'first_name': 'New', 'last_name': 'Hire', 'email': email, 'password': 'password123', **extra
+            }, format='json')
+
+        self.assertEqual(create('first@pharmerp.com').data['employee_id'], 'EMP-00002')
+        self.assertEqual(create('manual@pharmerp.com', employee_id='EMP-00005').status_code, 201)
+        response = create('next@pharmerp.com')
+        self.assertEqual((response.status_code, response.data['employee_id']), (201, 'EMP-00006'))
+
+        rows = [
+            {'first_name': 'Im', 'last_name': 'Port', 'email': 'import1@pharmerp.com', 'password': 'password123',
+             'employee_id': 'EMP-00009'},
+            {'first_name': 'Im', 'last_name': 'Port', 'email': 'import2@pharmerp.com', 'password': 'password123'},
+        ]
+        self._upload('staff.ndjson', '\n'.join(json.dumps(row) for row in rows))
+        self.assertEqual(User.objects.get(email='import2@pharmerp.com').employee_id, 'EMP-00010')
+        self.assertEqual(create('last@pharmerp.com').data['employee_id'], 'EMP-00011')
+
+    def test_permission_update_only_touches_changed_modules(self):
+        UserPermission.objects.create(user=self.admin, module='sales', can_view=True)
+        unchanged = UserPermission.objects.create(user=self.admin, module='reports', can_view=True)
+        UserPermission.objects.create(user=self.admin, module='finance', can_view=True)
+
+        self.client.post('/api/users/permissions/update_user_permissions/', {
+            'user_id': self.admin.id,
+            'permissions': [
+                {'module': 'sales', 'can_view': True, 'can_create': True},
+                {'module': 'reports', 'can_view': True},
+                {'module': 'inventory', 'can_view': True},
+            ],
+        }, format='json')
+
+        modules = dict(UserPermission.objects.filter(user=self.admin).values_list('module', 'can_create'))
+        self.assertEqual(modules, {'sales': True, 'reports': False, 'inventory': False})
+        self.assertEqual(UserPermission.objects.get(module='reports').id, unchanged.id)
+        changes = AuditLog.objects.get(action='update_permissions').new_values['changes']
+        self.assertEqual(changes, {'created': ['inventory'], 'updated': ['sales'], 'deleted': ['finance']})
+
+
+class ListReaderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_compiled_permissions()
+        self.admin = User.objects.create(
+            first_name='Ann', last_name='Admin', email='ann@pharmerp.com',
+            role=Role.objects.create(name='Admin'), password_hash='x', last_login=timezone.now()
+        )
+        self.client = APIClient()
+        token = JWTAuthentication.generate_tokens(self.admin)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        for i in range(5):
+            user = User.objects.create(
+                first_name='U', last_name=str(i), email=f'u{i}@pharmerp.com', password_hash='x',
+                role=self.admin.role if i % 2 else None
+            )
+            UserPermission.objects.create(user=user, module='sales', can_view=True)
+            UserPermission.objects.create(user=user, module='inventory', can_edit=True)
+            UserSession.objects.create(
+                user=user, token_id=f't{i}', ip_address='10.0.0.1', user_agent='test',
+                expires_at=timezone.now() + timedelta(hours=1)
+            )
+
+    def assertSameJson(self, reader_data, serializer_data):
+        self.assertEqual(JSONRenderer().render(reader_data), JSONRenderer().render(serializer_data))
+
+    def test_user_list_matches_model_serializer(self):
+        queryset = User.objects.order_by('-created_at')
+        self.assertSameJson(UserReader().serialize(queryset), UserSerializer(queryset, many=True).data)
+
+        self.client.get('/api/users/users/')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/users/users/')
+        self.assertEqual(len(response.data), 6)
+
+    def test_session_list_matches_model_serializer(self):
+        queryset = UserSession.objects.order_by('-created_at')
+        self.assertSameJson(UserSessionReader().serialize(queryset), UserSessionSerializer(queryset, many=True).data)
+
+        self.client.get('/api/users/sessions/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/sessions/')
+        self.assertEqual(len(response.data), 5)
+
+    def test_only_admins_and_managers_see_other_users_sessions(self):
+        viewer = User.objects.create(
+            first_name='Vic', last_name='Viewer', email='vic@pharmerp.com', password_hash='x',
+            role=Role.objects.create(name='Pharmacist')
+        )
+        UserPermission.objects.create(user=viewer, module='users', can_view=True)
+        UserSession.objects.create(
+            user=viewer, token_id='own', ip_address='10.0.0.2', user_agent='test',
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+        token = JWTAuthentication.generate_tokens(viewer)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.get('/api/users/sessions/')
+        self.assertEqual([session['user'] for session in response.data], [viewer.id])
+
+        viewer.role = Role.objects.create(name='Manager')
+        viewer.save()
+        cache.clear()
+        self.assertEqual(len(self.client.get('/api/users/sessions/').data), 6)
+
+    def test_search_goes_through_the_index_in_pages(self):
+        User.objects.filter(email='u3@pharmerp.com').update(is_active=False)
+
+        response = self.client.get('/api/users/users/', {'search': 'pharmerp u', 'page_size': 2, 'is_active': 'true'})
 
-# Create your tests here.
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('offset=2', response.data['next'])
+        rest = self.client.get(response.data['next']).data
+        emails = [user['email'] for user in response.data['results'] + rest['results']]
+        self.assertEqual(sorted(emails), ['u0@pharmerp.com', 'u1@pharmerp.com', 'u2@pharmerp.com', 'u4@pharmerp.com'])
+        self.assertIsNone(rest['next'])
@@ -10,6 +10,7 @@ router.register(r'sessions', views.UserSessionViewSet, basename='sessions')
 
 urlpatterns = [
     path('auth/login/', views.login, name='login'),
+    path('auth/login/async/', views.login_async, name='login-async'),
     path('auth/logout/', views.logout, name='logout'),
     path('auth/password-reset/', views.request_password_reset, name='request-password-reset'),
     path('auth/password-change/', views.change_password, name='password-change'),
@@ -1,14 +1,18 @@
 import os
+import json
+import uuid
 import jwt
 from datetime import datetime, timedelta
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
-from django.db.models import Q
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from asgiref.sync import sync_to_async
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
@@ -17,7 +21,17 @@ from .serializers import (
     UserSerializer, RoleSerializer, UserPermissionSerializer,
     UserSessionSerializer, UserCreateSerializer, PasswordChangeSerializer
 )
+from .principals import decode_token, get_principal, token_id_for
+from .revocation import revocation_filter, expiry_from_claims
+from .services import UserImporter, iter_import_rows, sync_user_permissions, welcome_email
+from .permissions import has_full_access
+from .readers import UserReader, UserSessionReader
 from backend.apps.administration.models import AuditLog
+from backend.apps.administration.audit import record_audit
+from backend.apps.administration.sequences import advance_document_sequence, next_document_number
+from backend.apps.administration.outbox import enqueue_email
+from backend.apps.administration.pagination import KeysetPagination, RankedPagination
+from backend.apps.administration.search import search_index
 
 
 
@@ -36,6 +50,7 @@ class JWTAuthentication:
             'role': user.role.name if user.role else None,
             'exp': datetime.utcnow() + timedelta(hours=1),
             'iat': datetime.utcnow(),
+            'jti': uuid.uuid4().hex,
             'type': 'access'
         }
         access_token = jwt.encode(access_payload, secret_key, algorithm='HS256')
@@ -46,6 +61,7 @@ class JWTAuthentication:
             'email': user.email,
             'exp': datetime.utcnow() + timedelta(days=7),
             'iat': datetime.utcnow(),
+            'jti': uuid.uuid4().hex,
             'type': 'refresh'
         }
         refresh_token = jwt.encode(refresh_payload, secret_key, algorithm='HS256')
@@ -61,9 +77,7 @@ class JWTAuthentication:
     def verify_token(token):
         """Verify and decode JWT token"""
         try:
-            secret_key = os.getenv('SECRET_KEY')
-            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-            return payload
+            return decode_token(token)
         except jwt.ExpiredSignatureError:
             return {'error': 'Token has expired'}
         except jwt.InvalidTokenError:
@@ -72,20 +86,28 @@ class JWTAuthentication:
     @staticmethod
     def get_user_from_token(request):
         """Extract user from request token"""
+        # DRF has already authenticated the request; reuse its principal
+        user = getattr(request, 'user', None)
+        if isinstance(user, User):
+            return user
+        
         auth_header = request.headers.get('Authorization')
         
         if not auth_header or not auth_header.startswith('Bearer '):
             return None
         
-        token = auth_header.split(' ')[1]
+        return JWTAuthentication.get_user_for_token(auth_header.split(' ')[1])
+    
+    @staticmethod
+    def get_user_for_token(token):
+        """Active user for a raw access token, or None if it is invalid or revoked"""
         payload = JWTAuthentication.verify_token(token)
         
-        if 'error' in payload:
+        if 'error' in payload or revocation_filter.is_revoked(token_id_for(token, payload)):
             return None
         
         try:
-            user = User.objects.get(id=payload['user_id'], is_active=True)
-            return user
+            return get_principal(payload['user_id'])
         except User.DoesNotExist:
             return None
 
@@ -102,7 +124,67 @@ class IsAdmin(IsAuthenticated):
             return False
         
         # Admin, Manager, and Pharmacist have full access
-        return user.role and user.role.name in ['Admin', 'Manager', 'Pharmacist']
+        return has_full_access(user)
+
+
+def _load_login_user(email):
+    """Single read for login: user, role and permissions together"""
+    try:
+        return User.objects.select_related('role').prefetch_related(
+            Prefetch('user_permissions', queryset=UserPermission.objects.order_by('module'))
+        ).get(email=email, is_active=True)
+    except User.DoesNotExist:
+        return None
+
+
+def _complete_login(user, request):
+    """Issue tokens and record the login in one transaction"""
+    tokens = JWTAuthentication.generate_tokens(user)
+    now = timezone.now()
+    
+    with transaction.atomic():
+        # Update last login
+        user.last_login = now
+        user.save(update_fields=['last_login'])
+        
+        # Create user session
+        UserSession.objects.create(
+            user=user,
+            token_id=token_id_for(tokens['access_token']),
+            ip_address=request.META.get('REMOTE_ADDR', ''),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            expires_at=now + timedelta(hours=1)
+        )
+        
+        # Log audit
+        record_audit(
+            user=user,
+            action='login',
+            table_name='users',
+            record_id=user.id,
+            request=request
+        )
+    
+    return {
+        'success': True,
+        'message': 'Login successful',
+        'tokens': tokens,
+        'user': {
+            'id': user.id,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'role': user.role.name if user.role else None,
+            'employee_id': user.employee_id,
+            'permissions': [{
+                'module': perm.module,
+                'can_view': perm.can_view,
+                'can_create': perm.can_create,
+                'can_edit': perm.can_edit,
+                'can_delete': perm.can_delete
+            } for perm in user.user_permissions.all()]
+        }
+    }
 
 
 @api_view(['POST'])
@@ -117,59 +199,50 @@ def login(request):
             'error': 'Email and password are required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        user = User.objects.get(email=email, is_active=True)
-    except User.DoesNotExist:
-        return Response({
-            'error': 'Invalid credentials'
-        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = _load_login_user(email)
     
     # Verify password
-    if not check_password(password, user.password_hash):
+    if not user or not check_password(password, user.password_hash):
         return Response({
             'error': 'Invalid credentials'
         }, status=status.HTTP_401_UNAUTHORIZED)
     
-    # Generate tokens
-    tokens = JWTAuthentication.generate_tokens(user)
+    return Response(_complete_login(user, request))
+
+
+async def login_async(request):
+    """Login endpoint for ASGI deployments.
     
-    # Update last login
-    user.last_login = timezone.now()
-    user.save()
+    Password hashing runs on a worker thread outside the shared sync thread,
+    so concurrent logins do not serialize behind one another.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
     
-    # Create user session
-    UserSession.objects.create(
-        user=user,
-        session_token=tokens['access_token'],
-        ip_address=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-        expires_at=timezone.now() + timedelta(hours=1)
-    )
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = {}
+    email = data.get('email')
+    password = data.get('password')
     
-    # Log audit
-    AuditLog.objects.create(
-        user=user,
-        action='login',
-        table_name='users',
-        record_id=user.id,
-        ip_address=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
-    )
+    if not email or not password:
+        return JsonResponse({
+            'error': 'Email and password are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response({
-        'success': True,
-        'message': 'Login successful',
-        'tokens': tokens,
-        'user': {
-            'id': user.id,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'role': user.role.name if user.role else None,
-            'employee_id': user.employee_id,
-            'permissions': list(user.user_permissions.values('module', 'can_view', 'can_create', 'can_edit', 'can_delete'))
-        }
-    })
+    user = await sync_to_async(_load_login_user)(email)
+    
+    # Verify password
+    if not user or not await sync_to_async(check_password, thread_sensitive=False)(password, user.password_hash):
+        return JsonResponse({
+            'error': 'Invalid credentials'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    return JsonResponse(await sync_to_async(_complete_login)(user, request))
+
+# Token-authenticated JSON API, same as the DRF views
+login_async.csrf_exempt = True
 
 
 @api_view(['POST'])
@@ -226,18 +299,20 @@ def logout(request):
     auth_header = request.headers.get('Authorization', '')
     token = auth_header.split(' ')[1] if auth_header.startswith('Bearer ') else None
     
-    # Delete user session
+    # Delete user session and reject the token from now on
     if token:
-        UserSession.objects.filter(user=user, session_token=token).delete()
+        payload = decode_token(token)
+        token_id = token_id_for(token, payload)
+        UserSession.objects.filter(user=user, token_id=token_id).delete()
+        revocation_filter.revoke(token_id, expiry_from_claims(payload))
     
     # Log audit
-    AuditLog.objects.create(
+    record_audit(
         user=user,
         action='logout',
         table_name='users',
         record_id=user.id,
-        ip_address=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
+        request=request
     )
     
     return Response({
@@ -273,16 +348,15 @@ def change_password(request):
     
     # Update password
     user.password_hash = make_password(new_password)
-    user.save()
+    user.save(update_fields=['password_hash', 'updated_at'])
     
     # Log audit
-    AuditLog.objects.create(
+    record_audit(
         user=user,
         action='change_password',
         table_name='users',
         record_id=user.id,
-        ip_address=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
+        request=request
     )
     
     return Response({
@@ -324,9 +398,11 @@ def request_password_reset(request):
     # Send email
     reset_url = f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/reset-password?token={reset_token}"
     
-    send_mail(
+    # Queued; the outbox worker delivers it off the request path
+    enqueue_email(
+        recipient_email=user.email,
         subject='Password Reset Request',
-        message=f"""
+        body=f"""
         Hello {user.first_name},
         
         You requested a password reset for your PharmERP account.
@@ -341,9 +417,7 @@ def request_password_reset(request):
         Best regards,
         PharmERP Team
         """,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        fail_silently=True,
+        email_type='password_reset'
     )
     
     return Response({
@@ -388,13 +462,12 @@ def reset_password(request):
     user.save()
     
     # Log audit
-    AuditLog.objects.create(
+    record_audit(
         user=user,
         action='reset_password',
         table_name='users',
         record_id=user.id,
-        ip_address=request.META.get('REMOTE_ADDR', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
+        request=request
     )
     
     return Response({
@@ -418,14 +491,13 @@ class RoleViewSet(viewsets.ModelViewSet):
         role = serializer.save()
         
         # Log audit
-        AuditLog.objects.create(
+        record_audit(
             user=user,
             action='create',
             table_name='roles',
             record_id=role.id,
             new_values=serializer.data,
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            request=request
         )
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -439,7 +511,7 @@ class UserViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         """Admin-only for create, update, delete"""
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_import']:
             return [IsAdmin()]
         return [IsAuthenticated()]
     
@@ -451,16 +523,6 @@ class UserViewSet(viewsets.ModelViewSet):
         if user and user.role and user.role.name in ['Cashier', 'Accountant']:
             queryset = queryset.filter(id=user.id)
         
-        # Search
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(employee_id__icontains=search)
-            )
-        
         # Filter by role
         role_id = self.request.query_params.get('role')
         if role_id:
@@ -473,6 +535,25 @@ class UserViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-created_at')
     
+    def list(self, request):
+        """List users from one values() query plus one for their permissions.
+        
+        With ``search``, users come from the search index, best match first,
+        in ``offset``/``page_size`` pages.
+        """
+        search = request.query_params.get('search')
+        if not search:
+            return Response(UserReader().serialize(self.get_queryset()))
+        
+        # Ranked IDs from the index, narrowed by the role/status filters
+        hits = search_index.search('users', search)
+        allowed = set(self.get_queryset().filter(id__in=hits).values_list('id', flat=True))
+        paginator = RankedPagination()
+        page = paginator.paginate_list([user_id for user_id in hits if user_id in allowed], request)
+        
+        users = {row['id']: row for row in UserReader().serialize(User.objects.filter(id__in=page))}
+        return paginator.get_paginated_response([users[user_id] for user_id in page])
+    
     def create(self, request):
         """Create new user - Admin only"""
         admin_user = JWTAuthentication.get_user_from_token(request)
@@ -480,55 +561,97 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = UserCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Hash password
-        password = request.data.get('password')
+        # Hash password before taking the employee ID counter lock
+        password_hash = make_password(request.data.get('password'))
         
-        # Generate employee ID if not provided
-        employee_id = request.data.get('employee_id')
-        if not employee_id:
-            last_user = User.objects.order_by('-id').first()
-            employee_id = f"EMP-{(last_user.id + 1):05d}" if last_user else "EMP-00001"
-        
-        user = serializer.save(
-            password_hash=make_password(password),
-            employee_id=employee_id
-        )
+        try:
+            with transaction.atomic():
+                # Generate employee ID if not provided; a manual one moves the
+                # counter past it, so it is never generated for someone else
+                employee_id = serializer.validated_data.get('employee_id')
+                if employee_id:
+                    advance_document_sequence('employee', [employee_id])
+                else:
+                    employee_id = next_document_number('employee')
+                
+                user = serializer.save(
+                    password_hash=password_hash,
+                    employee_id=employee_id
+                )
+        except IntegrityError:
+            # Lost a race with another request for the same email or employee ID
+            return Response({
+                'error': 'A user with this email or employee ID already exists'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         # Log audit
-        AuditLog.objects.create(
+        record_audit(
             user=admin_user,
             action='create',
             table_name='users',
             record_id=user.id,
             new_values={'email': user.email, 'role': user.role.name if user.role else None},
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            request=request
         )
         
-        # Send welcome email
-        send_mail(
-            subject='Welcome to PharmERP',
-            message=f"""
-            Hello {user.first_name},
-            
-            Your account has been created successfully.
-            
-            Employee ID: {user.employee_id}
-            Email: {user.email}
-            Role: {user.role.name if user.role else 'Not assigned'}
-            
-            Please change your password after first login.
-            
-            Best regards,
-            PharmERP Team
-            """,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=True,
-        )
+        # Queue welcome email
+        recipient_email, subject, body = welcome_email(user)
+        enqueue_email(recipient_email, subject, body, sender=admin_user, email_type='welcome')
         
         return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """Import users from an uploaded CSV or NDJSON file - Admin only"""
+        admin_user = JWTAuthentication.get_user_from_token(request)
+        upload = request.FILES.get('file')
+        
+        if not upload:
+            return Response({
+                'error': 'A CSV or NDJSON file is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = request.data.get('format') or ('csv' if upload.name.lower().endswith('.csv') else 'ndjson')
+        if file_format not in ('csv', 'ndjson'):
+            return Response({
+                'error': 'Format must be csv or ndjson'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            batch_size = int(request.data.get('batch_size', 200))
+        except ValueError:
+            return Response({
+                'error': 'batch_size must be an integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Batches commit as they go, so unparseable rows are reported as row
+        # errors and the audit entry is written even if the import fails
+        importer = UserImporter(batch_size=batch_size, sender=admin_user)
+        try:
+            importer.run(iter_import_rows(upload, file_format))
+        finally:
+            # Log one audit entry for the whole import
+            record_audit(
+                user=admin_user,
+                action='bulk_import',
+                table_name='users',
+                record_id=0,
+                new_values={
+                    'created': len(importer.created),
+                    'failed': len(importer.errors),
+                    'employee_ids': [user.employee_id for user in importer.created]
+                },
+                request=request
+            )
+        
+        return Response({
+            'success': True,
+            'message': f'{len(importer.created)} users imported, {len(importer.errors)} failed',
+            'created': len(importer.created),
+            'failed': len(importer.errors),
+            'errors': importer.errors
+        }, status=status.HTTP_201_CREATED if importer.created else status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
         """Activate/deactivate user - Admin only"""
@@ -541,15 +664,14 @@ class UserViewSet(viewsets.ModelViewSet):
         user.save()
         
         # Log audit
-        AuditLog.objects.create(
+        record_audit(
             user=admin_user,
             action='update_status',
             table_name='users',
             record_id=user.id,
             old_values={'is_active': old_status},
             new_values={'is_active': is_active},
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            request=request
         )
         
         return Response({
@@ -573,9 +695,17 @@ class UserViewSet(viewsets.ModelViewSet):
     def activity_logs(self, request, pk=None):
         """Get user activity logs"""
         user = self.get_object()
-        logs = AuditLog.objects.filter(user=user).order_by('-created_at')[:50]
         
-        return Response([{
+        # Served by the (user, created_at) index, one page per cursor
+        paginator = KeysetPagination()
+        logs = paginator.paginate_queryset(
+            AuditLog.objects.filter(user=user).only(
+                'id', 'action', 'table_name', 'record_id', 'created_at', 'ip_address'
+            ),
+            request
+        )
+        
+        return paginator.get_paginated_response([{
             'action': log.action,
             'table_name': log.table_name,
             'record_id': log.record_id,
@@ -614,29 +744,18 @@ class UserPermissionViewSet(viewsets.ModelViewSet):
                 'error': 'User not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Delete existing permissions
-        UserPermission.objects.filter(user=user).delete()
-        
-        # Create new permissions
-        for perm in permissions:
-            UserPermission.objects.create(
-                user=user,
-                module=perm['module'],
-                can_view=perm.get('can_view', False),
-                can_create=perm.get('can_create', False),
-                can_edit=perm.get('can_edit', False),
-                can_delete=perm.get('can_delete', False)
-            )
+        # Insert, update or delete only the modules that changed
+        with transaction.atomic():
+            changes = sync_user_permissions({user.id: permissions}).get(user.id)
         
         # Log audit
-        AuditLog.objects.create(
+        record_audit(
             user=admin_user,
             action='update_permissions',
             table_name='user_permissions',
             record_id=user.id,
-            new_values={'permissions': permissions},
-            ip_address=request.META.get('REMOTE_ADDR', ''),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            new_values={'permissions': permissions, 'changes': changes},
+            request=request
         )
         
         return Response({
@@ -657,7 +776,7 @@ class UserSessionViewSet(viewsets.ReadOnlyModelViewSet):
         # Users can only see their own sessions
         queryset = UserSession.objects.filter(user=user)
         
-        # Admins can see all sessions
+        # Admins and Managers can see all sessions; users:view alone is not enough
         if user.role and user.role.name in ['Admin', 'Manager']:
             user_id = self.request.query_params.get('user_id')
             if user_id:
@@ -665,4 +784,8 @@ class UserSessionViewSet(viewsets.ReadOnlyModelViewSet):
             else:
                 queryset = UserSession.objects.all()
         
-        return queryset.order_by('-created_at')
\ No newline at end of file
+        return queryset.order_by('-created_at')
+    
+    def list(self, request):
+        """List sessions with user names in a single query"""
+        return Response(UserSessionReader().serialize(self.get_queryset()))
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -126,6 +127,20 @@ REST_FRAMEWORK = {
 
 
 
+# JWT principal caching
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv('JWT_CLAIMS_CACHE_SIZE', 4096))
+COMPILED_PERMISSIONS_CACHE_SIZE = int(os.getenv('COMPILED_PERMISSIONS_CACHE_SIZE', 4096))
+PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+TOKEN_REVOCATION_REFRESH_INTERVAL = int(os.getenv('TOKEN_REVOCATION_REFRESH_INTERVAL', 5))
+TOKEN_REVOCATION_REFRESH_MARGIN = int(os.getenv('TOKEN_REVOCATION_REFRESH_MARGIN', 60))
+
+# Audit log writer: 'async' buffers entries and bulk inserts them, 'sync' writes inline.
+# Test runs default to 'sync' so assertions see entries without flushing the sink.
+AUDIT_LOG_MODE = os.getenv('AUDIT_LOG_MODE', 'sync' if 'test' in sys.argv[1:2] else 'async')
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', 100))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', 2.0))
+AUDIT_LOG_SPOOL_PATH = os.getenv('AUDIT_LOG_SPOOL_PATH', BASE_DIR / 'var' / 'audit_spool.ndjson')
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 # Email settings
@@ -136,4 +151,41 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS') == 'True'
 EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
-DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
\ No newline at end of file
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
+# Outbox worker defaults (send_queued_emails)
+EMAIL_OUTBOX_CONNECTIONS = int(os.getenv('EMAIL_OUTBOX_CONNECTIONS', 2))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))
+
+# How often each process checks whether system settings changed elsewhere
+SYSTEM_SETTINGS_POLL_INTERVAL = float(os.getenv('SYSTEM_SETTINGS_POLL_INTERVAL', 5.0))
+
+# Audit log retention: rows older than this are moved to gzip archives
+AUDIT_LOG_RETENTION_DAYS = int(os.getenv('AUDIT_LOG_RETENTION_DAYS', 180))
+AUDIT_LOG_ARCHIVE_DIR = os.getenv('AUDIT_LOG_ARCHIVE_DIR', BASE_DIR / 'var' / 'audit_archive')
+
+# Notifications: cached unread counters and the /notifications/stream/ endpoint (ASGI)
+NOTIFICATION_UNREAD_CACHE_TTL = int(os.getenv('NOTIFICATION_UNREAD_CACHE_TTL', 300))
+NOTIFICATION_STREAM_TIMEOUT = float(os.getenv('NOTIFICATION_STREAM_TIMEOUT', 300))
+NOTIFICATION_LONG_POLL_TIMEOUT = float(os.getenv('NOTIFICATION_LONG_POLL_TIMEOUT', 25))
+NOTIFICATION_STREAM_POLL_INTERVAL = float(os.getenv('NOTIFICATION_STREAM_POLL_INTERVAL', 1.0))
+# Streams also read the database this often, for writes their cache did not see
+NOTIFICATION_STREAM_DB_INTERVAL = float(os.getenv('NOTIFICATION_STREAM_DB_INTERVAL', 10.0))
+
+# Unread counters, change markers and the dashboard snapshot live in the
+# cache; with several worker processes it must be shared between them
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
+# System dashboard snapshot: recomputed at most this often (seconds)
+DASHBOARD_REFRESH_INTERVAL = float(os.getenv('DASHBOARD_REFRESH_INTERVAL', 30))
+
+# Search (users, customers, products): most ranked hits considered per query
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', 500))
+
+# Offline till uploads: most sales accepted in one batch request
+SALES_BATCH_MAX_SIZE = int(os.getenv('SALES_BATCH_MAX_SIZE', 500))
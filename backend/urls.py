@@ -21,4 +21,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('backend.apps.users.urls')),
     path('api/administration/', include('backend.apps.administration.urls')),
+    path('api/sales/', include('backend.apps.sales.urls')),
 ]
\ No newline at end of file